@@ -2,22 +2,35 @@ import os
 import re
 import json
 import csv
+import time
 from datetime import datetime, timedelta
 from io import StringIO
-from flask import Blueprint, request, jsonify, current_app, Response, stream_template, abort
+from flask import Blueprint, request, jsonify, current_app, Response, stream_template, stream_with_context, abort
 from flask_login import login_required, current_user
 from functools import wraps
 from werkzeug.utils import secure_filename
 from PIL import Image
 
-from models import FoodLog, FoodItem, CoachMessage, Photo, WeighIn, WaterIntake, Settings, User, NotificationTemplate, Notification
+from models import FoodLog, FoodItem, CoachMessage, CoachMemory, Photo, WeighIn, WaterIntake, Settings, User, NotificationTemplate, Notification
 from extensions import db
-from services.ollama_client import OllamaClient
+from services.ollama_client import OllamaClient, OllamaBusyError, admission_stats, pull_stats
+from services.ollama_metrics import timing_stats
+from services.ollama_health import OllamaHealth
 from services.nutrition_search import NutritionSearch
 from services.food_parser import FoodParser
-from services.recommendations import RecommendationService
 from services.analytics import AnalyticsService
+from services.dashboard import DashboardService
+from services.nutrition_rollup import NutritionRollup
+from services.time_window import on_day
 from services.vision_classifier import VisionClassifier
+from services.photo_jobs import PhotoAnalysisJobs
+from services.model_pulls import ModelPulls, overall_status
+from services.sse import sse_event, sse_response
+from services.coach_streams import CoachStreams
+from services.coach_context import CoachContext, SECTIONS
+from services.coach_memory import build_prompt
+from services.coach_prompt_cache import CoachPromptCache
+from services.coach_tools import CoachTools, CONTEXT_SECTIONS, TOOLS_PROMPT
 
 api_bp = Blueprint('api', __name__)
 
@@ -29,6 +42,16 @@ def health_check():
     return jsonify({'status': 'healthy', 'timestamp': datetime.utcnow().isoformat()})
 
 
+def _busy_response(retry_after: int, **extra):
+    """429 with Retry-After for a saturated Ollama host"""
+    body = {
+        'error': 'AI service is busy, please try again shortly',
+        'retry_after': retry_after
+    }
+    body.update(extra)
+    return jsonify(body), 429, {'Retry-After': str(retry_after)}
+
+
 @api_bp.route('/search_nutrition')
 @login_required
 def search_nutrition():
@@ -79,10 +102,10 @@ def search_barcode():
 @api_bp.route('/models/list')
 @login_required
 def list_models():
-    """List available Ollama models"""
+    """List available Ollama models (cached; pass refresh=1 to bypass)"""
     try:
         client = OllamaClient.from_user_settings()
-        models = client.list_models()
+        models = client.list_models(refresh=request.args.get('refresh', '').lower() in ('1', 'true'))
         
         return jsonify({
             'models': models,
@@ -97,7 +120,7 @@ def list_models():
 @api_bp.route('/models/pull', methods=['POST'])
 @login_required
 def pull_model():
-    """Pull a model from Ollama"""
+    """Start pulling a model in the background; poll status_url for progress"""
     data = request.get_json()
     model_name = data.get('model')
     
@@ -105,19 +128,56 @@ def pull_model():
         return jsonify({'error': 'Model name is required'}), 400
     
     try:
-        client = OllamaClient.from_user_settings()
-        success = client.pull_model(model_name)
+        hosts = OllamaClient.from_user_settings().pull_hosts()
+        if not hosts:
+            return jsonify({'error': 'No Ollama host is available'}), 503
         
-        if success:
-            return jsonify({'status': 'success', 'message': f'Model {model_name} pulled successfully'})
-        else:
-            return jsonify({'error': 'Failed to pull model'}), 500
+        # A pull already running for the same host and model is joined, not repeated
+        pulls = [ModelPulls.start(host, model_name)[0] for host in hosts]
+        
+        return jsonify({
+            'status': overall_status(pulls),
+            'model': model_name,
+            'pulls': pulls,
+            'status_url': f'/api/models/pull/{model_name}'
+        }), 202
     
     except Exception as e:
         current_app.logger.error(f"Error pulling model: {e}")
         return jsonify({'error': 'Model pull failed'}), 500
 
 
+@api_bp.route('/models/pull/<path:model_name>')
+@login_required
+def pull_model_status(model_name):
+    """Progress of a model pull; pass stream=1 for server-sent events until it finishes"""
+    try:
+        hosts = OllamaClient.from_user_settings().pull_hosts()
+        
+        if request.args.get('stream', '').lower() not in ('1', 'true'):
+            pulls = ModelPulls.get_all(hosts, model_name)
+            if not pulls:
+                return jsonify({'error': 'No pull found for this model'}), 404
+            return jsonify({'status': overall_status(pulls), 'model': model_name, 'pulls': pulls})
+        
+        interval = current_app.config.get('OLLAMA_PULL_PROGRESS_INTERVAL', 1.0)
+        
+        def generate():
+            while True:
+                pulls = ModelPulls.get_all(hosts, model_name)
+                status = overall_status(pulls)
+                yield sse_event({'status': status, 'model': model_name, 'pulls': pulls})
+                if status not in ('pending', 'pulling'):
+                    break
+                time.sleep(interval)
+        
+        return sse_response(stream_with_context(generate()))
+    
+    except Exception as e:
+        current_app.logger.error(f"Error getting model pull status: {e}")
+        return jsonify({'error': 'Failed to get model pull status'}), 500
+
+
 @api_bp.route('/settings/test_ollama', methods=['POST'])
 @login_required
 def test_ollama_connection():
@@ -155,7 +215,7 @@ def get_food_logs():
     if date_str:
         try:
             date = datetime.strptime(date_str, '%Y-%m-%d').date()
-            query = query.filter(db.func.date(FoodLog.logged_at) == date)
+            query = query.filter(on_day(FoodLog.logged_at, date))
         except ValueError:
             return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
     
@@ -234,6 +294,7 @@ def create_food_log():
         )
         
         db.session.add(log)
+        NutritionRollup.add(log)
         db.session.commit()
         
         # Create notification for successful food logging
@@ -310,6 +371,7 @@ def delete_food_log(log_id):
         return jsonify({'error': 'Food log not found'}), 404
     
     try:
+        NutritionRollup.remove(log)
         db.session.delete(log)
         db.session.commit()
         return jsonify({'message': 'Food log deleted successfully'})
@@ -357,8 +419,21 @@ def upload_photo():
         db.session.add(photo)
         db.session.commit()
         
-        # Analyze the photo
-        candidates, meta = _analyze_food_photo(filepath, photo.id)
+        # Analyze in the background unless the client asks to wait (sync=1)
+        if request.values.get('sync', '').lower() not in ('1', 'true', 'yes'):
+            PhotoAnalysisJobs.submit(photo, _analyze_food_photo)
+            return jsonify({
+                'photo_id': photo.id,
+                'job_id': photo.id,
+                'filename': filename,
+                'status': 'pending',
+                'status_url': f'/api/photo/{photo.id}/status'
+            }), 202
+        
+        candidates, meta = _analyze_food_photo(filepath, photo.id, current_user.id)
+        
+        if not candidates and meta.get('retry_after'):
+            return _busy_response(meta['retry_after'], photo_id=photo.id, filename=filename)
         
         # If analysis failed entirely, surface error to client
         if not candidates:
@@ -392,15 +467,30 @@ def upload_photo():
         return jsonify({'error': 'Photo upload failed'}), 500
 
 
+@api_bp.route('/photo/<int:photo_id>/status')
+@login_required
+def photo_analysis_status(photo_id):
+    """Get the status (and, when complete, the results) of a photo analysis job"""
+    photo = Photo.query.filter_by(id=photo_id, user_id=current_user.id).first()
+    if not photo:
+        return jsonify({'error': 'Photo not found'}), 404
+    
+    return jsonify(PhotoAnalysisJobs.get_status(photo))
+
+
 @api_bp.route('/coach/chat', methods=['POST'])
 @login_required
 def coach_chat():
     """Chat with AI coach"""
     data = request.get_json()
     message = data.get('message', '').strip()
+    # The client's own id for this message, so it can resume the reply before it has seen any frame
+    request_id = data.get('request_id')
     
     if not message:
         return jsonify({'error': 'Message is required'}), 400
+    if request_id is not None and not (isinstance(request_id, str) and re.fullmatch(r'[A-Za-z0-9_-]{1,64}', request_id)):
+        return jsonify({'error': 'request_id must be 1-64 letters, digits, _ or -'}), 400
     
     try:
         # Get user settings using helper function
@@ -415,6 +505,22 @@ def coach_chat():
         if not chat_model:
             return jsonify({'error': 'No chat model configured. Please configure a model in settings.'}), 400
         
+        # With tool calling the model looks up food and weight data itself, so the prompt only
+        # carries the profile and conversation summary
+        use_tools = CoachTools.available(client, chat_model)
+        
+        # Build context
+        context = _build_coach_context(current_user.id, CONTEXT_SECTIONS if use_tools else SECTIONS)
+        
+        # Get response from Ollama using user settings
+        system_prompt = user_models['system_prompt'] or _get_default_system_prompt()
+        if use_tools:
+            system_prompt += TOOLS_PROMPT
+        
+        # Context plus the newest unsummarized turns, within COACH_PROMPT_TOKEN_BUDGET
+        enhanced_prompt, messages, prompt_stats = build_prompt(current_user.id, system_prompt, context, message)
+        current_app.logger.debug(f"Coach prompt: {prompt_stats}")
+        
         # Save user message
         user_msg = CoachMessage(
             user_id=current_user.id,
@@ -423,75 +529,28 @@ def coach_chat():
         )
         db.session.add(user_msg)
         
-        # Get recent chat history
-        recent_messages = CoachMessage.query.filter_by(user_id=current_user.id)\
-            .order_by(CoachMessage.created_at.desc())\
-            .limit(10).all()
-        
-        # Build context
-        context = _build_coach_context(current_user.id)
-        
-        # Prepare messages for Ollama
-        messages = []
-        for msg in reversed(recent_messages[-5:]):  # Last 5 messages
-            if msg.role != 'system':
-                messages.append({
-                    'role': msg.role,
-                    'content': msg.content
-                })
-        
-        messages.append({'role': 'user', 'content': message})
-        
-        # Get response from Ollama using user settings
-        system_prompt = user_models['system_prompt'] or _get_default_system_prompt()
-        
-        # Add context to system prompt
-        enhanced_prompt = f"{system_prompt}\n\nUser Context:\n{context}"
-        
-        # Capture user_id outside the generator to avoid context issues
         user_id = current_user.id
         
-        # Create a shared variable to store the response
-        response_data = {'content': ''}
-        
-        def generate():
-            try:
-                for chunk in client.chat(messages, chat_model, enhanced_prompt, stream=True):
-                    response_data['content'] += chunk
-                    yield f"data: {json.dumps({'content': chunk})}\n\n"
-                
-                yield f"data: {json.dumps({'done': True})}\n\n"
-            except Exception as e:
-                yield f"data: {json.dumps({'error': 'Chat stream failed'})}\n\n"
-        
-        # Create the response with a callback
-        from flask import Response
-        response = Response(generate(), mimetype='text/plain')
-        app_obj = current_app._get_current_object()
-        
-        # Use response.call_on_close to save message after streaming
-        def save_assistant_message():
-            if response_data['content']:
-                with app_obj.app_context():
-                    try:
-                        assistant_msg = CoachMessage(
-                            user_id=user_id,
-                            role='assistant',
-                            content=response_data['content']
-                        )
-                        db.session.add(assistant_msg)
-                        db.session.commit()
-                    except Exception:
-                        try:
-                            db.session.rollback()
-                        except Exception:
-                            # Silently handle rollback errors
-                            pass
-        
-        response.call_on_close(save_assistant_message)
+        # Admission happens here so a saturated host is a 429, not a broken stream
+        try:
+            if use_tools:
+                chunks = CoachTools.chat(client, user_id, chat_model, enhanced_prompt, messages)
+            elif current_app.config.get('COACH_KV_REUSE') == 'context':
+                chunks = CoachPromptCache.chat(client, user_id, chat_model, enhanced_prompt, messages)
+            else:
+                chunks = client.chat(messages, chat_model, enhanced_prompt, stream=True)
+        except OllamaBusyError as e:
+            db.session.rollback()
+            return _busy_response(e.retry_after)
         
         db.session.commit()  # Commit user message
         
+        # Generation runs on a worker and is saved when it finishes, even if this client disconnects;
+        # GET /api/coach/chat/stream resumes it
+        generation_id = CoachStreams.start(user_id, chunks, request_id)
+        
+        response = sse_response(stream_with_context(CoachStreams.events(user_id, generation_id)))
+        response.headers['X-Coach-Generation'] = generation_id
         return response
     
     except Exception as e:
@@ -500,14 +559,43 @@ def coach_chat():
         return jsonify({'error': 'Chat failed'}), 500
 
 
+@api_bp.route('/coach/chat/stream')
+@login_required
+def coach_chat_resume():
+    """Resume a coach reply after a dropped connection.
+    
+    Send the last received event id as the Last-Event-ID header (or the
+    last_event_id query parameter) to continue after it. With only
+    generation_id (the X-Coach-Generation header), or the request_id the
+    message was sent with, the stream is replayed from the start. There is
+    no default: guessing the reply could hand back an earlier one.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    generation_id, after = CoachStreams.parse_event_id(last_event_id)
+    generation_id = generation_id or request.args.get('generation_id')
+    if not generation_id and request.args.get('request_id'):
+        generation_id = CoachStreams.generation_for_request(current_user.id, request.args['request_id'])
+    
+    if not generation_id or not CoachStreams.exists(current_user.id, generation_id):
+        return jsonify({'error': 'No chat stream to resume'}), 404
+    
+    response = sse_response(stream_with_context(CoachStreams.events(current_user.id, generation_id, after)))
+    response.headers['X-Coach-Generation'] = generation_id
+    return response
+
+
 @api_bp.route('/coach/clear-history', methods=['DELETE'])
 @login_required
 def clear_coach_history():
     """Clear all coach chat history for the current user"""
     try:
-        # Delete all coach messages for the current user
+        # Delete all coach messages for the current user, and the summary of them
         deleted_count = CoachMessage.query.filter_by(user_id=current_user.id).delete()
+        CoachMemory.query.filter_by(user_id=current_user.id).delete()
         db.session.commit()
+        # Bulk deletes bypass the context write hooks
+        CoachContext.invalidate(current_user.id, 'memory')
+        CoachPromptCache.invalidate(current_user.id)
         
         return jsonify({
             'message': f'Successfully cleared {deleted_count} chat messages',
@@ -643,32 +731,7 @@ def get_weight_trends():
 def get_dashboard_data():
     """Get dashboard analytics data"""
     try:
-        # Get today's summary
-        today_summary = RecommendationService.get_daily_summary(current_user.id)
-        
-        # Get weekly summary  
-        weekly_summary = RecommendationService.get_weekly_summary(current_user.id)
-        
-        # Get meal distribution
-        meal_distribution = AnalyticsService.get_meal_distribution(current_user.id, 7)
-        
-        # Get macro distribution
-        macro_distribution = AnalyticsService.get_macro_distribution(current_user.id, 7)
-        
-        # Get logging streaks
-        streaks = AnalyticsService.get_logging_streaks(current_user.id)
-        
-        # Get top foods
-        top_foods = AnalyticsService.get_top_foods(current_user.id, 7, 5)
-        
-        return jsonify({
-            'today': today_summary,
-            'weekly': weekly_summary,
-            'meal_distribution': meal_distribution,
-            'macro_distribution': macro_distribution,
-            'streaks': streaks,
-            'top_foods': top_foods
-        })
+        return jsonify(DashboardService.build(current_user.id, days=7, top_foods=5))
     
     except Exception as e:
         current_app.logger.error(f"Error getting dashboard data: {e}")
@@ -683,16 +746,16 @@ def export_logs():
     end_date = request.args.get('to')
     
     try:
-        # Parse dates
+        # Parse dates; both days are included in full
         if start_date:
-            start_date = datetime.strptime(start_date, '%Y-%m-%d')
+            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
         else:
-            start_date = datetime.utcnow() - timedelta(days=30)
+            start_date = datetime.utcnow().date() - timedelta(days=30)
         
         if end_date:
-            end_date = datetime.strptime(end_date, '%Y-%m-%d')
+            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
         else:
-            end_date = datetime.utcnow()
+            end_date = datetime.utcnow().date()
         
         # Get export data
         data = AnalyticsService.export_data(current_user.id, start_date, end_date)
@@ -749,24 +812,28 @@ def _process_image(filepath):
         current_app.logger.error(f"Error processing image: {e}")
 
 
-def _analyze_food_photo(filepath, photo_id):
-    """Analyze food photo and return (candidates, meta) with enhanced food identification"""
+def _analyze_food_photo(filepath, photo_id, user_id=None):
+    """Analyze food photo and return (candidates, meta) with enhanced food identification.
+    
+    Runs on a background worker as well, so the user is passed in explicitly
+    rather than taken from current_user.
+    """
     try:
         meta = {'source': None, 'warning': None, 'errors': []}
         vision_items = []
         
         # Try Ollama vision first using user settings
         try:
-            client = OllamaClient.from_user_settings()
+            client = OllamaClient.from_user_settings(user_id)
             current_app.logger.info(f"Connecting to Ollama at: {client.base_url}")
             
-            # Test connection first
-            if not client.test_connection():
+            # Check the cached health status rather than probing per photo
+            if not client.is_available():
                 current_app.logger.warning("Ollama is not available, check if Ollama is running")
                 meta['warning'] = 'AI vision service unavailable - ensure Ollama is running and accessible'
                 raise Exception("Ollama connection failed")
             
-            user_models = OllamaClient.get_user_models()
+            user_models = OllamaClient.get_user_models(user_id)
             vision_model = user_models['vision_model']
             
             if vision_model:
@@ -790,7 +857,12 @@ Output must be ONLY a JSON array (no prose, no markdown), for example:
 If nothing is clearly identifiable, return []."""
 
                 # Use the vision analysis method
-                analysis_result = client.vision_analyze(filepath, vision_model, food_prompt)
+                try:
+                    analysis_result = client.vision_analyze(filepath, vision_model, food_prompt)
+                except OllamaBusyError as e:
+                    meta['warning'] = 'AI vision service is busy, please try again shortly'
+                    meta['retry_after'] = e.retry_after
+                    raise
                 current_app.logger.info(f"Raw vision analysis result: {analysis_result}")
                 current_app.logger.info(f"Vision analysis result type: {type(analysis_result)}")
                 if analysis_result:
@@ -866,7 +938,7 @@ If nothing is clearly identifiable, return []."""
             current_app.logger.error(f"Vision items is not a list: {type(vision_items)}")
             return [], meta
         
-        # Parse results with enhanced nutrition lookup
+        # Parse results; each item is searched once and its portion nutrition scaled from that result
         parser = FoodParser()
         try:
             candidates = parser.parse_vision_results(vision_items)
@@ -880,45 +952,12 @@ If nothing is clearly identifiable, return []."""
             current_app.logger.error(f"Error parsing vision results: {e}")
             candidates = []
         
-        # Enhance candidates with nutrition search results
-        for candidate in candidates:
-            if candidate and isinstance(candidate, dict) and candidate.get('name'):
-                # Search for nutrition data
-                nutrition_results = parser.nutrition_search.search_food(candidate['name'])
-                if nutrition_results:
-                    candidate['search_results'] = nutrition_results[:3]
-                    
-                    # Use the best nutrition result if available
-                    for result in nutrition_results:
-                        if result.get('nutrition') and result['source'] == 'openfoodfacts':
-                            # Scale nutrition to portion size
-                            nutrition = result['nutrition']
-                            portion_grams = candidate.get('portion_grams', 100)
-                            scale_factor = portion_grams / 100
-                            
-                            candidate['nutrition'] = {
-                                'calories': nutrition.get('calories_per_100g', 0) * scale_factor,
-                                'protein_g': nutrition.get('protein_per_100g', 0) * scale_factor,
-                                'carbs_g': nutrition.get('carbs_per_100g', 0) * scale_factor,
-                                'fat_g': nutrition.get('fat_per_100g', 0) * scale_factor,
-                                'fiber_g': nutrition.get('fiber_per_100g', 0) * scale_factor,
-                                'sugar_g': nutrition.get('sugar_per_100g', 0) * scale_factor,
-                                'sodium_mg': nutrition.get('sodium_per_100g', 0) * scale_factor * 1000,
-                                'source': result['title']
-                            }
-                            break
-                    
-                    # If no nutrition found in search, use estimates
-                    if not candidate.get('nutrition'):
-                        candidate['nutrition'] = parser.nutrition_search.get_nutrition_estimate(
-                            candidate['name'], 
-                            candidate.get('portion_grams', 100)
-                        )
-        
         # Update photo with analysis
         photo = Photo.query.get(photo_id)
         if photo:
-            photo.set_analysis({'candidates': candidates, 'vision_items': vision_items, 'meta': meta})
+            analysis = photo.get_analysis()
+            analysis.update({'candidates': candidates, 'vision_items': vision_items, 'meta': meta})
+            photo.set_analysis(analysis)
             db.session.commit()
         
         current_app.logger.info(f"Analysis complete. Found {len(candidates)} food candidates")
@@ -1012,85 +1051,10 @@ def _parse_vision_text_response(text_response):
     return items[:5]  # Limit to 5 items max
 
 
-def _build_coach_context(user_id):
-    """Build comprehensive context for AI coach with all user data"""
+def _build_coach_context(user_id, sections=SECTIONS):
+    """Build comprehensive context for AI coach with all user data (cached per section)"""
     try:
-        from models import Profile, WeighIn, WaterIntake
-        from datetime import datetime, timedelta
-        
-        # Get user profile
-        profile = Profile.query.filter_by(user_id=user_id).first()
-        
-        # Get recent food logs (last 7 days)
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        recent_food_logs = FoodLog.query.filter_by(user_id=user_id)\
-            .filter(FoodLog.logged_at >= week_ago)\
-            .order_by(FoodLog.logged_at.desc())\
-            .limit(20).all()
-        
-        # Get recent weight entries  
-        recent_weigh_ins = WeighIn.query.filter_by(user_id=user_id)\
-            .order_by(WeighIn.recorded_at.desc())\
-            .limit(5).all()
-        
-        # Get conversation history for memory
-        recent_messages = CoachMessage.query.filter_by(user_id=user_id)\
-            .order_by(CoachMessage.created_at.desc())\
-            .limit(20).all()
-        
-        # Build context with available data
-        context = f"""
-=== USER PROFILE ===
-Name: {profile.name if profile else 'Unknown'}
-Age: {profile.age if profile else 'Unknown'}
-Sex: {profile.sex if profile else 'Unknown'}  
-Height: {profile.height_cm if profile else 'Unknown'}cm
-Current Weight: {profile.weight_kg if profile else 'Unknown'}kg
-Target Weight: {profile.target_weight_kg if profile else 'Not set'}kg
-Goal: {profile.goal_type if profile else 'Unknown'} ({profile.timeframe_weeks if profile else 'Unknown'} weeks)
-Activity Level: {profile.activity_level if profile else 'Unknown'}
-
-Dietary Preferences: {', '.join(profile.get_preferences()) if profile and hasattr(profile, 'get_preferences') and profile.get_preferences() else 'None specified'}
-Food Allergies: {', '.join(profile.get_allergies()) if profile and hasattr(profile, 'get_allergies') and profile.get_allergies() else 'None specified'}
-Kitchen Equipment: {', '.join(profile.get_equipment()) if profile and hasattr(profile, 'get_equipment') and profile.get_equipment() else 'None specified'}
-
-=== RECENT WEIGHT PROGRESS ==="""
-        
-        if recent_weigh_ins:
-            for weigh_in in recent_weigh_ins:
-                context += f"\n{weigh_in.recorded_at.strftime('%Y-%m-%d')}: {weigh_in.weight_kg:.1f}kg"
-            
-            if len(recent_weigh_ins) >= 2:
-                weight_change = recent_weigh_ins[0].weight_kg - recent_weigh_ins[-1].weight_kg
-                context += f"\nRecent Weight Change: {weight_change:+.1f}kg"
-        else:
-            context += "\nNo recent weight entries"
-            
-        context += f"""
-
-=== RECENT FOOD LOGS (Last 7 days) ==="""
-        
-        if recent_food_logs:
-            for log in recent_food_logs:
-                food_name = log.custom_name or (log.food_item.canonical_name if log.food_item else 'Unknown')
-                context += f"\n{log.logged_at.strftime('%Y-%m-%d %H:%M')} - {log.meal}: {food_name} ({log.grams}g, {log.calories:.0f}cal)"
-        else:
-            context += "\nNo recent food logs"
-            
-        context += f"""
-
-=== CONVERSATION MEMORY (Recent exchanges) ==="""
-        
-        if recent_messages:
-            context += "\nRecent conversations:"
-            # Reverse to show oldest first for context
-            for msg in reversed(recent_messages[:10]):  # Last 10 messages
-                role_label = "User" if msg.role == 'user' else "Assistant"
-                context += f"\n{role_label}: {msg.content[:100]}{'...' if len(msg.content) > 100 else ''}"
-        else:
-            context += "\nNo previous conversations"
-        
-        return context
+        return CoachContext.build(user_id, sections)
         
     except Exception as e:
         current_app.logger.error(f"Error building coach context: {e}")
@@ -1259,6 +1223,95 @@ def admin_notification_templates():
         return jsonify({'error': 'Failed to get notification templates'}), 500
 
 
+@api_bp.route('/admin/search-cache/stats')
+@login_required
+@admin_required
+def admin_search_cache_stats():
+    """API endpoint for nutrition search cache counters"""
+    try:
+        from services.search_cache import SearchCache
+        
+        return jsonify({'stats': SearchCache.get_instance().stats()})
+        
+    except Exception as e:
+        current_app.logger.error(f"Error getting search cache stats: {e}")
+        return jsonify({'error': 'Failed to get search cache stats'}), 500
+
+
+@api_bp.route('/admin/ollama/health')
+@login_required
+@admin_required
+def admin_ollama_health():
+    """API endpoint for the last probed status of each configured Ollama host"""
+    try:
+        hosts = OllamaHealth.configured_hosts()
+        return jsonify({'hosts': {host: OllamaHealth.get_status(host) for host in hosts}})
+        
+    except Exception as e:
+        current_app.logger.error(f"Error getting Ollama health: {e}")
+        return jsonify({'error': 'Failed to get Ollama health'}), 500
+
+
+@api_bp.route('/admin/ollama/queue')
+@login_required
+@admin_required
+def admin_ollama_queue():
+    """API endpoint for Ollama admission queue depth and counters per host, and running model pulls"""
+    try:
+        return jsonify({'hosts': admission_stats(), 'pulls': pull_stats()})
+        
+    except Exception as e:
+        current_app.logger.error(f"Error getting Ollama queue stats: {e}")
+        return jsonify({'error': 'Failed to get Ollama queue stats'}), 500
+
+
+@api_bp.route('/admin/ollama/timings')
+@login_required
+@admin_required
+def admin_ollama_timings():
+    """API endpoint for prompt-eval vs. eval timings per host, model and request kind"""
+    try:
+        return jsonify({'timings': timing_stats()})
+        
+    except Exception as e:
+        current_app.logger.error(f"Error getting Ollama timings: {e}")
+        return jsonify({'error': 'Failed to get Ollama timings'}), 500
+
+
+@api_bp.route('/admin/ollama/pool-stats')
+@login_required
+@admin_required
+def admin_ollama_pool_stats():
+    """API endpoint for pooled Ollama connection counters"""
+    try:
+        from services.http_pool import pool_stats
+        
+        return jsonify({'pools': pool_stats()})
+        
+    except Exception as e:
+        current_app.logger.error(f"Error getting Ollama pool stats: {e}")
+        return jsonify({'error': 'Failed to get Ollama pool stats'}), 500
+
+
+@api_bp.route('/admin/ollama/hosts')
+@login_required
+@admin_required
+def admin_ollama_hosts():
+    """API endpoint for Ollama host pool routing state"""
+    try:
+        from services.ollama_pool import OllamaPool
+        
+        pool = OllamaPool.get_configured()
+        return jsonify({
+            'pooled': pool is not None,
+            'hosts': pool.stats() if pool else {}
+        })
+        
+    except Exception as e:
+        current_app.logger.error(f"Error getting Ollama host pool: {e}")
+        return jsonify({'error': 'Failed to get Ollama host pool'}), 500
+
+
 @api_bp.route('/admin/send-notification', methods=['POST'])
 @login_required
 @admin_required
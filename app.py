@@ -74,6 +74,14 @@ def create_app(config_name=None):
     from services.reminder_scheduler import init_reminder_scheduler
     init_reminder_scheduler(scheduler)
     
+    # Probe Ollama hosts in the background so requests can read cached health
+    from services.ollama_health import init_ollama_health_prober
+    init_ollama_health_prober(app, scheduler)
+    
+    # Preload chat/vision models and keep them loaded during active hours
+    from services.model_warmup import init_model_warmup
+    init_model_warmup(app, scheduler)
+    
     return app
 
 
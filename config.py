@@ -33,11 +33,69 @@ class Config:
     OLLAMA_URL = os.environ.get('OLLAMA_URL', 'http://localhost:11434')
     DEFAULT_CHAT_MODEL = os.environ.get('DEFAULT_CHAT_MODEL', 'llama2')
     DEFAULT_VISION_MODEL = os.environ.get('DEFAULT_VISION_MODEL', 'llava')
+    OLLAMA_CONNECT_TIMEOUT = float(os.environ.get('OLLAMA_CONNECT_TIMEOUT', 5))  # seconds
+    OLLAMA_READ_TIMEOUT = float(os.environ.get('OLLAMA_READ_TIMEOUT', 180))  # seconds
+    OLLAMA_POOL_MAXSIZE = int(os.environ.get('OLLAMA_POOL_MAXSIZE', 10))  # keep-alive connections per host
+    OLLAMA_CONNECT_RETRIES = int(os.environ.get('OLLAMA_CONNECT_RETRIES', 2))
+    OLLAMA_RETRY_BACKOFF = float(os.environ.get('OLLAMA_RETRY_BACKOFF', 0.5))  # seconds, doubles per retry
+    OLLAMA_HEALTH_PROBE_ENABLED = os.environ.get('OLLAMA_HEALTH_PROBE_ENABLED', 'true').lower() == 'true'
+    OLLAMA_HEALTH_INTERVAL = int(os.environ.get('OLLAMA_HEALTH_INTERVAL', 30))  # seconds between probes
+    OLLAMA_HEALTH_TIMEOUT = float(os.environ.get('OLLAMA_HEALTH_TIMEOUT', 3))  # seconds, probe read timeout
+    OLLAMA_MAX_CONCURRENT = int(os.environ.get('OLLAMA_MAX_CONCURRENT', 2))  # in-flight generations per host
+    OLLAMA_QUEUE_MAX = int(os.environ.get('OLLAMA_QUEUE_MAX', 16))  # waiting requests per host before 429
+    OLLAMA_QUEUE_TIMEOUT = float(os.environ.get('OLLAMA_QUEUE_TIMEOUT', 30))  # seconds a request may wait for a slot
+    OLLAMA_KEEP_ALIVE = os.environ.get('OLLAMA_KEEP_ALIVE', '30m')  # sent with chat/vision requests; empty = Ollama default
+    OLLAMA_WARMUP_ENABLED = os.environ.get('OLLAMA_WARMUP_ENABLED', 'true').lower() == 'true'
+    OLLAMA_WARMUP_INTERVAL = int(os.environ.get('OLLAMA_WARMUP_INTERVAL', 10))  # minutes between keep_alive pings
+    OLLAMA_WARMUP_TIMEOUT = float(os.environ.get('OLLAMA_WARMUP_TIMEOUT', 300))  # seconds, model load
+    OLLAMA_ACTIVE_HOURS = os.environ.get('OLLAMA_ACTIVE_HOURS', '6-23')  # local hours "start-end"; empty = always
+    OLLAMA_MODELS_CACHE_TTL = int(os.environ.get('OLLAMA_MODELS_CACHE_TTL', 300))  # seconds, then served stale while refreshing
+    OLLAMA_CONFIG_CACHE_TTL = int(os.environ.get('OLLAMA_CONFIG_CACHE_TTL', 60))  # seconds, resolved per-user URL/models
+    OLLAMA_POOL_COOLDOWN = float(os.environ.get('OLLAMA_POOL_COOLDOWN', 30))  # seconds a failed pool host is skipped
+    OLLAMA_PULL_WORKERS = int(os.environ.get('OLLAMA_PULL_WORKERS', 2))  # model pulls running at once per process
+    OLLAMA_PULL_MAX_CONCURRENT = int(os.environ.get('OLLAMA_PULL_MAX_CONCURRENT', 1))  # model pulls running at once per host
+    OLLAMA_PULL_PROGRESS_INTERVAL = float(os.environ.get('OLLAMA_PULL_PROGRESS_INTERVAL', 1.0))  # seconds between progress writes
+    OLLAMA_PULL_PROGRESS_TTL = int(os.environ.get('OLLAMA_PULL_PROGRESS_TTL', 3600))  # seconds progress is kept
+    OLLAMA_PULL_STALE_AFTER = int(os.environ.get('OLLAMA_PULL_STALE_AFTER', 300))  # seconds without progress before a pull counts as failed
     
     # External APIs
     OPENFOODFACTS_API_URL = os.environ.get('OPENFOODFACTS_API_URL', 'https://world.openfoodfacts.org')
     WIKIPEDIA_API_URL = os.environ.get('WIKIPEDIA_API_URL', 'https://en.wikipedia.org')
     
+    # Local nutrition catalog (FoodItem read-through cache)
+    NUTRITION_CATALOG_MAX_AGE_HOURS = int(os.environ.get('NUTRITION_CATALOG_MAX_AGE_HOURS', 24 * 7))
+    NUTRITION_CATALOG_MIN_RESULTS = int(os.environ.get('NUTRITION_CATALOG_MIN_RESULTS', 3))
+    NUTRITION_SEARCH_DEADLINE = float(os.environ.get('NUTRITION_SEARCH_DEADLINE', 8))  # seconds, all sources
+    
+    # Coach chat streaming
+    COACH_STREAM_FLUSH_INTERVAL = float(os.environ.get('COACH_STREAM_FLUSH_INTERVAL', 0.05))  # seconds tokens are batched per frame
+    COACH_STREAM_FLUSH_BYTES = int(os.environ.get('COACH_STREAM_FLUSH_BYTES', 512))  # or until this many characters are buffered
+    COACH_GENERATION_WORKERS = int(os.environ.get('COACH_GENERATION_WORKERS', 8))  # replies generating at once per process
+    COACH_STREAM_TTL = int(os.environ.get('COACH_STREAM_TTL', 600))  # seconds a reply stays resumable
+    COACH_CONTEXT_MAX_AGE = int(os.environ.get('COACH_CONTEXT_MAX_AGE', 900))  # seconds before a cached context section is rebuilt anyway
+    COACH_STREAM_POLL_TIMEOUT = float(os.environ.get('COACH_STREAM_POLL_TIMEOUT', 15))  # seconds between keep-alive comments
+    COACH_PROMPT_TOKEN_BUDGET = int(os.environ.get('COACH_PROMPT_TOKEN_BUDGET', 2048))  # estimated tokens per coach prompt
+    COACH_MEMORY_KEEP_RECENT = int(os.environ.get('COACH_MEMORY_KEEP_RECENT', 6))  # newest messages never folded into the summary
+    COACH_MEMORY_BATCH = int(os.environ.get('COACH_MEMORY_BATCH', 6))  # messages folded into the summary per pass
+    COACH_SUMMARY_MAX_TOKENS = int(os.environ.get('COACH_SUMMARY_MAX_TOKENS', 300))  # length cap of the stored summary
+    COACH_MEMORY_WORKERS = int(os.environ.get('COACH_MEMORY_WORKERS', 1))  # summary passes running at once per process
+    COACH_KV_REUSE = os.environ.get('COACH_KV_REUSE', 'prefix').lower()  # 'prefix' (/api/chat) or 'context' (/api/generate context arrays)
+    COACH_KV_CONTEXT_TTL = int(os.environ.get('COACH_KV_CONTEXT_TTL', 1800))  # seconds a user's Ollama context array is kept
+    COACH_TOOLS_ENABLED = os.environ.get('COACH_TOOLS_ENABLED', 'true').lower() == 'true'  # let tool-capable models look up data
+    COACH_TOOL_MAX_ROUNDS = int(os.environ.get('COACH_TOOL_MAX_ROUNDS', 3))  # tool-call rounds before the model must answer
+    COACH_TOOL_CACHE_TTL = int(os.environ.get('COACH_TOOL_CACHE_TTL', 300))  # seconds a tool result is reused
+    
+    # Photo analysis
+    PHOTO_ANALYSIS_WORKERS = int(os.environ.get('PHOTO_ANALYSIS_WORKERS', 2))  # background analysis jobs
+    PHOTO_ANALYSIS_TIMEOUT = int(os.environ.get('PHOTO_ANALYSIS_TIMEOUT', 600))  # seconds before a job is reported failed
+    PHOTO_ENRICHMENT_WORKERS = int(os.environ.get('PHOTO_ENRICHMENT_WORKERS', 4))
+    PHOTO_ENRICHMENT_DEADLINE = float(os.environ.get('PHOTO_ENRICHMENT_DEADLINE', 12))  # seconds, per photo
+    
+    # External search cache (Redis, in-process fallback)
+    SEARCH_CACHE_TTL = int(os.environ.get('SEARCH_CACHE_TTL', 24 * 3600))  # seconds, found results
+    SEARCH_CACHE_NEGATIVE_TTL = int(os.environ.get('SEARCH_CACHE_NEGATIVE_TTL', 15 * 60))  # seconds, not found
+    SEARCH_CACHE_MAX_ENTRIES = int(os.environ.get('SEARCH_CACHE_MAX_ENTRIES', 10000))
+    
     # Security
     OFFLINE_MODE = os.environ.get('OFFLINE_MODE', 'false').lower() == 'true'
     DISABLE_EXTERNAL_CALLS = os.environ.get('DISABLE_EXTERNAL_CALLS', 'false').lower() == 'true'
@@ -58,6 +116,8 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    OLLAMA_HEALTH_PROBE_ENABLED = False
+    OLLAMA_WARMUP_ENABLED = False
 
 
 config = {
@@ -25,6 +25,23 @@ with app.app_context():
     try:
         db.create_all()
         print('Database tables created successfully')
+        
+        # create_all skips existing tables, so add indexes declared on them since
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(db.engine, checkfirst=True)
+        
+        # Existing installs: fill the nutrition rollup from food logs once
+        from models import DailyNutrition, FoodLog
+        from services.nutrition_rollup import NutritionRollup
+        if FoodLog.query.first() and not DailyNutrition.query.first():
+            print(f'Backfilled {NutritionRollup.rebuild()} nutrition rollup rows')
+        
+        # Existing installs: record the current targets of profiles without history
+        from services.recommendations import RecommendationService
+        backfilled = RecommendationService.backfill_targets()
+        if backfilled:
+            print(f'Recorded daily targets for {backfilled} profiles')
     except Exception as e:
         print(f'Error creating tables: {e}')
         exit(1)
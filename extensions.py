@@ -16,4 +16,12 @@ redis_client = None
 
 login_manager.login_view = 'auth.login'
 login_manager.login_message = 'Please log in to access this page.'
-login_manager.login_message_category = 'info'
\ No newline at end of file
+login_manager.login_message_category = 'info'
+
+
+def get_redis():
+    """Return the Redis client configured by create_app (None outside an app context)"""
+    from flask import current_app, has_app_context
+    if not has_app_context():
+        return None
+    return current_app.config.get('SESSION_REDIS')
@@ -35,6 +35,7 @@ class EditUserForm(FlaskForm):
 class OllamaSettingsForm(FlaskForm):
     ollama_url = StringField('Ollama URL', validators=[DataRequired(), URL()], 
                            default='http://localhost:11434')
+    ollama_pool = TextAreaField('Ollama Host Pool', validators=[Optional()])
     default_chat_model = StringField('Default Chat Model', validators=[DataRequired()],
                                    default='llama3.1')
     default_vision_model = StringField('Default Vision Model', validators=[DataRequired()],
@@ -17,9 +17,12 @@ class User(UserMixin, db.Model):
     
     # Relationships
     profile = db.relationship('Profile', backref='user', uselist=False, cascade='all, delete-orphan')
+    target_history = db.relationship('TargetHistory', backref='user', cascade='all, delete-orphan')
     settings = db.relationship('Settings', backref='user', uselist=False, cascade='all, delete-orphan')
     food_logs = db.relationship('FoodLog', backref='user', cascade='all, delete-orphan')
+    daily_nutrition = db.relationship('DailyNutrition', backref='user', cascade='all, delete-orphan')
     coach_messages = db.relationship('CoachMessage', backref='user', cascade='all, delete-orphan')
+    coach_memory = db.relationship('CoachMemory', backref='user', uselist=False, cascade='all, delete-orphan')
     photos = db.relationship('Photo', backref='user', cascade='all, delete-orphan')
     weigh_ins = db.relationship('WeighIn', backref='user', cascade='all, delete-orphan')
     water_intakes = db.relationship('WaterIntake', backref='user', cascade='all, delete-orphan')
@@ -94,6 +97,32 @@ class Profile(db.Model):
         self.equipment = json.dumps(equipment)
 
 
+class TargetHistory(db.Model):
+    """Daily targets computed from one version of a user's profile"""
+    __table_args__ = (db.Index('ix_target_history_user_effective_from', 'user_id', 'effective_from'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    effective_from = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # in effect until the next row
+    
+    calories = db.Column(db.Integer, nullable=False)
+    protein_g = db.Column(db.Integer, nullable=False)
+    carbs_g = db.Column(db.Integer, nullable=False)
+    fat_g = db.Column(db.Integer, nullable=False)
+    bmr = db.Column(db.Integer, nullable=False)
+    tdee = db.Column(db.Integer, nullable=False)
+    
+    def to_dict(self):
+        return {
+            'calories': self.calories,
+            'protein_g': self.protein_g,
+            'carbs_g': self.carbs_g,
+            'fat_g': self.fat_g,
+            'bmr': self.bmr,
+            'tdee': self.tdee
+        }
+
+
 class Settings(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -117,9 +146,14 @@ class FoodItem(db.Model):
     canonical_name = db.Column(db.String(200), nullable=False)
     source = db.Column(db.String(50), nullable=False)  # openfoodfacts, wikipedia, manual
     brand = db.Column(db.String(100))
-    barcode = db.Column(db.String(50))
+    barcode = db.Column(db.String(50), index=True)
     nutrition = db.Column(db.Text)  # JSON nutrition data
+    url = db.Column(db.String(500))  # source page for the product/article
+    image_url = db.Column(db.String(500))
+    description = db.Column(db.Text)  # summary text (wikipedia extract)
+    search_key = db.Column(db.String(200), index=True)  # normalized query that produced this entry
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow)  # last sync with the source
     
     # Relationship
     food_logs = db.relationship('FoodLog', backref='food_item')
@@ -129,9 +163,34 @@ class FoodItem(db.Model):
     
     def set_nutrition(self, nutrition_data):
         self.nutrition = json.dumps(nutrition_data)
+    
+    def to_search_result(self):
+        """Convert catalog entry to the NutritionSearch result format"""
+        if self.source == 'wikipedia':
+            return {
+                'source': 'wikipedia',
+                'title': self.canonical_name,
+                'url': self.url or '',
+                'snippet': self.description or '',
+                'nutrition': None
+            }
+        
+        return {
+            'source': self.source,
+            'title': f"{self.canonical_name} {self.brand or ''}".strip(),
+            'name': self.canonical_name,
+            'brand': self.brand or '',
+            'url': self.url or '',
+            'snippet': f"Brand: {self.brand}" if self.brand else "",
+            'nutrition': self.get_nutrition() or None,
+            'barcode': self.barcode,
+            'image_url': self.image_url or ''
+        }
 
 
 class FoodLog(db.Model):
+    __table_args__ = (db.Index('ix_food_log_user_logged_at', 'user_id', 'logged_at'),)
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     food_item_id = db.Column(db.Integer, db.ForeignKey('food_item.id'))
@@ -162,7 +221,30 @@ class FoodLog(db.Model):
         self.micros = json.dumps(micros_data)
 
 
+class DailyNutrition(db.Model):
+    """FoodLog totals per user, day and meal, kept in step with FoodLog writes"""
+    __table_args__ = (db.UniqueConstraint('user_id', 'date', 'meal', name='uq_daily_nutrition_user_date_meal'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)  # UTC day of FoodLog.logged_at
+    meal = db.Column(db.String(20), nullable=False)
+    
+    log_count = db.Column(db.Integer, nullable=False, default=0)
+    calories = db.Column(db.Float, nullable=False, default=0)
+    protein_g = db.Column(db.Float, nullable=False, default=0)
+    carbs_g = db.Column(db.Float, nullable=False, default=0)
+    fat_g = db.Column(db.Float, nullable=False, default=0)
+    fiber_g = db.Column(db.Float, nullable=False, default=0)
+    sugar_g = db.Column(db.Float, nullable=False, default=0)
+    sodium_mg = db.Column(db.Float, nullable=False, default=0)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class CoachMessage(db.Model):
+    __table_args__ = (db.Index('ix_coach_message_user_created_at', 'user_id', 'created_at'),)
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     role = db.Column(db.String(20), nullable=False)  # system, user, assistant
@@ -177,7 +259,19 @@ class CoachMessage(db.Model):
         self.refs = json.dumps(refs_data)
 
 
+class CoachMemory(db.Model):
+    """Rolling summary of a user's older coach messages"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, unique=True)
+    summary = db.Column(db.Text, nullable=False, default='')
+    summarized_through_id = db.Column(db.Integer, nullable=False, default=0)  # last CoachMessage.id folded in
+    message_count = db.Column(db.Integer, nullable=False, default=0)  # messages folded in so far
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class Photo(db.Model):
+    __table_args__ = (db.Index('ix_photo_user_created_at', 'user_id', 'created_at'),)
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     filepath = db.Column(db.String(255), nullable=False)
@@ -192,6 +286,8 @@ class Photo(db.Model):
 
 
 class WeighIn(db.Model):
+    __table_args__ = (db.Index('ix_weigh_in_user_recorded_at', 'user_id', 'recorded_at'),)
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     weight_kg = db.Column(db.Float, nullable=False)
@@ -199,6 +295,8 @@ class WeighIn(db.Model):
 
 
 class WaterIntake(db.Model):
+    __table_args__ = (db.Index('ix_water_intake_user_recorded_at', 'user_id', 'recorded_at'),)
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     ml = db.Column(db.Integer, nullable=False)
@@ -247,6 +345,8 @@ class GlobalSettings(db.Model):
 
 
 class Notification(db.Model):
+    __table_args__ = (db.Index('ix_notification_user_created_at', 'user_id', 'created_at'),)
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     
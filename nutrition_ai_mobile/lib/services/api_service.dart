@@ -1,5 +1,7 @@
+import 'dart:async';
 import 'dart:convert';
 import 'dart:io';
+import 'dart:math' show Random;
 import 'package:http/http.dart' as http;
 import '../models/food_log.dart';
 import '../models/food_item.dart';
@@ -559,61 +561,43 @@ class ApiService {
       throw Exception('Not authenticated. Please login first.');
     }
 
+    // Names this message, so its reply can be found again even if the
+    // connection drops before the first frame arrives
+    final requestId = _newRequestId();
+    final reply = _ChatReply();
+    final client = http.Client();
+
     try {
       print('Sending chat message: $message');
 
-      final response = await http.post(
-        Uri.parse('$_baseUrl/api/coach/chat'),
-        headers: _headers,
-        body: json.encode({'message': message}),
-      ).timeout(const Duration(seconds: 60));
+      final request = http.Request('POST', Uri.parse('$_baseUrl/api/coach/chat'))
+        ..headers.addAll(_headers)
+        ..body = json.encode({'message': message, 'request_id': requestId});
+
+      final http.StreamedResponse response;
+      try {
+        response = await client.send(request).timeout(const Duration(seconds: 60));
+      } on TimeoutException {
+        return await _resumeChat(requestId, reply);
+      } on SocketException {
+        return await _resumeChat(requestId, reply);
+      } on http.ClientException {
+        return await _resumeChat(requestId, reply);
+      }
 
       print('Chat response: ${response.statusCode}');
 
       if (response.statusCode == 200) {
-        // Handle streaming response from Flask API
-        final responseBody = response.body;
-        print('Raw response body: ${responseBody.substring(0, responseBody.length > 200 ? 200 : responseBody.length)}...');
-        
-        String content = '';
-        
-        // Parse Server-Sent Events format
-        final lines = responseBody.split('\n');
-        for (final line in lines) {
-          if (line.startsWith('data: ')) {
-            final jsonStr = line.substring(6); // Remove 'data: ' prefix
-            if (jsonStr.trim().isNotEmpty) {
-              try {
-                final data = json.decode(jsonStr);
-                if (data['content'] != null) {
-                  content += data['content'];
-                }
-                if (data['done'] == true) {
-                  break;
-                }
-                if (data['error'] != null) {
-                  throw Exception(data['error']);
-                }
-              } catch (parseError) {
-                print('JSON parse error: $parseError for line: $jsonStr');
-                // Continue processing other lines
-              }
-            }
-          }
+        reply.generationId = response.headers['x-coach-generation'];
+        if (await _readChatReply(reply, response.stream)) {
+          return reply.result();
         }
-        
-        print('Received chat response: ${content.length} characters');
-        
-        if (content.isEmpty) {
-          throw Exception('No content received from chat');
-        }
-        
-        return content;
+        return await _resumeChat(requestId, reply);
       } else if (response.statusCode == 401) {
         clearSession();
         throw Exception('Session expired. Please login again.');
       } else {
-        final errorData = json.decode(response.body);
+        final errorData = json.decode(await response.stream.bytesToString());
         final errorMessage = errorData['error'] ?? 'Chat failed';
         throw Exception(errorMessage);
       }
@@ -623,7 +607,79 @@ class ApiService {
         rethrow;
       }
       throw Exception('Chat failed: $e');
+    } finally {
+      client.close();
+    }
+  }
+
+  static String _newRequestId() {
+    final random = Random.secure();
+    return List.generate(16, (_) => random.nextInt(256).toRadixString(16).padLeft(2, '0')).join();
+  }
+
+  // Reads frames into reply; false if the connection dropped before the reply finished
+  static Future<bool> _readChatReply(_ChatReply reply, Stream<List<int>> body) async {
+    try {
+      await reply.read(body);
+    } on TimeoutException {
+      return false;
+    } on SocketException {
+      return false;
+    } on http.ClientException {
+      return false;
     }
+    return reply.finished;
+  }
+
+  // The reply keeps generating on the server after a dropped connection.
+  // Pick up this message's reply after the last frame received, or from the
+  // start by its generation or request id, instead of asking the coach a
+  // second time. Never fall back to "the latest reply": it may be an
+  // earlier one.
+  static Future<String> _resumeChat(String requestId, _ChatReply reply) async {
+    for (var attempt = 1; attempt <= 3; attempt++) {
+      print('Chat connection dropped, resuming reply (attempt $attempt)');
+      await Future.delayed(Duration(seconds: attempt));
+
+      final headers = Map<String, String>.from(_headers);
+      final query = <String, String>{};
+      if (reply.lastEventId != null) {
+        headers['Last-Event-ID'] = reply.lastEventId!;
+      } else if (reply.generationId != null) {
+        query['generation_id'] = reply.generationId!;
+      } else {
+        query['request_id'] = requestId;
+      }
+
+      final client = http.Client();
+      try {
+        final uri = Uri.parse('$_baseUrl/api/coach/chat/stream').replace(queryParameters: query.isEmpty ? null : query);
+        final request = http.Request('GET', uri)..headers.addAll(headers);
+        final response = await client.send(request).timeout(const Duration(seconds: 60));
+
+        if (response.statusCode == 200) {
+          reply.generationId ??= response.headers['x-coach-generation'];
+          if (await _readChatReply(reply, response.stream)) {
+            return reply.result();
+          }
+        } else if (response.statusCode == 401) {
+          clearSession();
+          throw Exception('Session expired. Please login again.');
+        } else if (response.statusCode == 404) {
+          // The message never reached the coach, or its reply has expired
+          break;
+        }
+      } on TimeoutException {
+        continue;
+      } on SocketException {
+        continue;
+      } on http.ClientException {
+        continue;
+      } finally {
+        client.close();
+      }
+    }
+    throw Exception('Chat connection lost');
   }
 
   static Future<void> clearChatHistory() async {
@@ -692,7 +748,11 @@ class ApiService {
       print('Photo analysis response: ${response.statusCode}');
       print('Response body: ${response.body}');
 
-      if (response.statusCode == 201) {
+      if (response.statusCode == 202) {
+        // Analysis runs in the background; poll its status until it finishes
+        final data = json.decode(response.body);
+        return await _waitForPhotoAnalysis(data['status_url'] ?? '/api/photo/${data['photo_id']}/status');
+      } else if (response.statusCode == 201) {
         final data = json.decode(response.body);
         return PhotoAnalysisResult.fromJson(data);
       } else if (response.statusCode == 502) {
@@ -719,6 +779,38 @@ class ApiService {
     }
   }
 
+  static Future<PhotoAnalysisResult> _waitForPhotoAnalysis(String statusUrl) async {
+    // Matches the server's PHOTO_ANALYSIS_TIMEOUT, after which it reports the job as failed
+    final deadline = DateTime.now().add(const Duration(minutes: 10));
+    final uri = Uri.parse('$_baseUrl$statusUrl');
+
+    while (DateTime.now().isBefore(deadline)) {
+      await Future.delayed(const Duration(seconds: 2));
+
+      final response = await http.get(uri, headers: _headers).timeout(const Duration(seconds: 15));
+      if (response.statusCode == 401) {
+        clearSession();
+        throw Exception('Session expired. Please login again.');
+      } else if (response.statusCode != 200) {
+        throw Exception('Photo analysis status failed with status ${response.statusCode}');
+      }
+
+      final data = json.decode(response.body);
+      print('Photo analysis status: ${data['status']}');
+      if (data['status'] == 'complete') {
+        return PhotoAnalysisResult.fromJson(data);
+      } else if (data['status'] == 'failed') {
+        return PhotoAnalysisResult(
+          candidates: [],
+          error: data['error'] ?? 'Photo analysis failed',
+          warning: data['warning'],
+        );
+      }
+    }
+
+    throw Exception('Photo analysis timed out');
+  }
+
   // Notifications functionality
   static Future<NotificationResponse> getNotifications({
     int limit = 50,
@@ -904,4 +996,73 @@ class ApiService {
       return false;
     }
   }
+}
+
+// A coach reply read from Server-Sent Events frames. Frames are applied
+// whole, and lastEventId only moves past frames already applied, so a
+// resumed stream continues exactly where this one stopped.
+class _ChatReply {
+  String content = '';
+  String? generationId;
+  String? lastEventId;
+  bool finished = false;
+
+  Future<void> read(Stream<List<int>> body) async {
+    String? frameId;
+    final frameData = <String>[];
+
+    // The server sends a keep-alive comment every 15 seconds while the coach is thinking
+    final lines = body
+        .timeout(const Duration(seconds: 60))
+        .transform(utf8.decoder)
+        .transform(const LineSplitter());
+
+    await for (final line in lines) {
+      if (line.isEmpty) {
+        if (frameData.isNotEmpty) {
+          _apply(frameData.join('\n'));
+          if (frameId != null) {
+            lastEventId = frameId;
+            generationId ??= frameId.split(':').first;
+          }
+          if (finished) {
+            return;
+          }
+        }
+        frameId = null;
+        frameData.clear();
+      } else if (line.startsWith('id: ')) {
+        frameId = line.substring(4);
+      } else if (line.startsWith('data: ')) {
+        frameData.add(line.substring(6));
+      }
+    }
+  }
+
+  void _apply(String jsonStr) {
+    final Map<String, dynamic> data;
+    try {
+      data = json.decode(jsonStr);
+    } on FormatException catch (parseError) {
+      print('JSON parse error: $parseError for frame: $jsonStr');
+      return;
+    }
+    if (data['error'] != null) {
+      throw Exception(data['error']);
+    }
+    if (data['content'] != null) {
+      content += data['content'];
+    }
+    if (data['done'] == true) {
+      finished = true;
+    }
+  }
+
+  String result() {
+    print('Received chat response: ${content.length} characters');
+    if (content.isEmpty) {
+      throw Exception('No content received from chat');
+    }
+    return content;
+  }
 }
\ No newline at end of file
@@ -10,6 +10,8 @@ from models import User, Profile, Settings, FoodLog, SystemLog, GlobalSettings,
 from forms.admin import (AdminLoginForm, CreateUserForm, EditUserForm, OllamaSettingsForm, 
                         GlobalSettingForm, SystemMaintenanceForm, BulkUserActionForm)
 from services.ollama_client import OllamaClient
+from services.ollama_health import OllamaHealth
+from services.ollama_pool import OllamaPool, parse_hosts
 from services.notification_service import AdminNotificationService
 
 admin_bp = Blueprint('admin', __name__)
@@ -199,6 +201,7 @@ def edit_user(user_id):
         
         try:
             db.session.commit()
+            OllamaClient.invalidate_user_config()
             
             changes = {}
             for key, old_val in old_values.items():
@@ -301,6 +304,7 @@ def delete_user(user_id):
     try:
         db.session.delete(user)
         db.session.commit()
+        OllamaClient.invalidate_user_config()
         
         log_admin_action('user_deleted', f'Deleted user: {username}', user_id)
         flash(f'User {username} deleted successfully!', 'success')
@@ -408,6 +412,7 @@ def bulk_user_action():
                 message = f'Deleted {len(users)} users: {", ".join(usernames)}'
             
             db.session.commit()
+            OllamaClient.invalidate_user_config()
             log_admin_action('bulk_user_action', message, metadata={'action': action, 'user_ids': user_ids})
             flash(message, 'success')
             
@@ -444,6 +449,7 @@ def ollama_settings():
     # Load current settings
     current_settings = {
         'ollama_url': GlobalSettings.query.filter_by(key='ollama_url').first(),
+        'ollama_pool': GlobalSettings.query.filter_by(key='ollama_pool').first(),
         'default_chat_model': GlobalSettings.query.filter_by(key='default_chat_model').first(),
         'default_vision_model': GlobalSettings.query.filter_by(key='default_vision_model').first(),
         'model_timeout': GlobalSettings.query.filter_by(key='model_timeout').first(),
@@ -457,12 +463,15 @@ def ollama_settings():
             if setting and hasattr(form, key):
                 field = getattr(form, key)
                 field.data = setting.get_value()
+        if isinstance(form.ollama_pool.data, list):
+            form.ollama_pool.data = '\n'.join(form.ollama_pool.data)
     
     if form.validate_on_submit():
         try:
             # Update each setting
             settings_data = {
                 'ollama_url': (form.ollama_url.data, 'Ollama server URL'),
+                'ollama_pool': (parse_hosts(form.ollama_pool.data), 'Ollama hosts to balance requests across'),
                 'default_chat_model': (form.default_chat_model.data, 'Default chat model name'),
                 'default_vision_model': (form.default_vision_model.data, 'Default vision model name'),
                 'model_timeout': (form.model_timeout.data, 'Model request timeout in seconds'),
@@ -486,6 +495,8 @@ def ollama_settings():
                 setting.updated_at = datetime.utcnow()
             
             db.session.commit()
+            OllamaPool.invalidate()
+            OllamaClient.invalidate_user_config()
             log_admin_action('ollama_settings_updated', 'Updated Ollama configuration')
             flash('Ollama settings updated successfully!', 'success')
             
@@ -522,6 +533,7 @@ def create_setting():
             try:
                 db.session.add(setting)
                 db.session.commit()
+                OllamaPool.invalidate()
                 
                 log_admin_action('setting_created', f'Created setting: {setting.key}')
                 flash('Setting created successfully!', 'success')
@@ -626,13 +638,12 @@ def maintenance():
 
 # Helper functions
 def _check_ollama_status():
-    """Check if Ollama is accessible"""
+    """Check if Ollama is accessible (cached by the background health prober)"""
     try:
         ollama_url_setting = GlobalSettings.query.filter_by(key='ollama_url').first()
         ollama_url = ollama_url_setting.get_value() if ollama_url_setting else 'http://localhost:11434'
         
-        client = OllamaClient(ollama_url)
-        return client.test_connection()
+        return OllamaHealth.is_available(ollama_url)
     except:
         return False
 
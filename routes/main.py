@@ -4,6 +4,7 @@ from datetime import datetime
 from models import Profile
 from services.recommendations import RecommendationService
 from services.analytics import AnalyticsService
+from services.dashboard import DashboardService
 from forms.settings import FoodLogForm, WeighInForm, WaterIntakeForm
 
 main_bp = Blueprint('main', __name__)
@@ -28,29 +29,19 @@ def dashboard():
         return redirect(url_for('onboarding.step1'))
     
     try:
-        recommendations = RecommendationService()
         analytics = AnalyticsService()
         
-        # Get today's summary
-        today_summary = recommendations.get_daily_summary(current_user.id)
-        
-        # Get weekly summary
-        weekly_summary = recommendations.get_weekly_summary(current_user.id)
-        
-        # Get quick stats
-        streaks = analytics.get_logging_streaks(current_user.id)
+        # Today, this week and streaks from the shared dashboard aggregation
+        dashboard_data = DashboardService.build(current_user.id, top_foods=0)
         
         # Get recent food logs (last 5)
-        recent_logs = analytics.export_data(
-            current_user.id, 
-            datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0),
-            datetime.utcnow()
-        )[-5:]
+        today = datetime.utcnow().date()
+        recent_logs = analytics.export_data(current_user.id, today, today)[-5:]
         
         context = {
-            'today': today_summary,
-            'weekly': weekly_summary,
-            'streaks': streaks,
+            'today': dashboard_data['today'],
+            'weekly': dashboard_data['weekly'],
+            'streaks': dashboard_data['streaks'],
             'recent_logs': recent_logs,
             'user_name': current_user.profile.name if current_user.profile else current_user.username
         }
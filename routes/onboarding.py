@@ -3,6 +3,7 @@ from flask_login import login_required, current_user
 from models import Profile, Settings
 from forms.onboarding import BasicInfoForm, GoalsForm, LifestyleForm, OllamaSettingsForm
 from services.ollama_client import OllamaClient
+from services.recommendations import RecommendationService
 from extensions import db
 
 onboarding_bp = Blueprint('onboarding', __name__)
@@ -133,7 +134,7 @@ def step4():
         try:
             # During onboarding, we test the provided URL
             client = OllamaClient(form.ollama_url.data or 'http://localhost:11434')
-            if client.test_connection():
+            if client.is_available():
                 models = client.list_models()
                 available_models = [(model['name'], model['name']) for model in models]
         except:
@@ -163,6 +164,7 @@ def step4():
             profile.set_equipment(step3_data['equipment'])
             
             db.session.add(profile)
+            RecommendationService.record_targets(profile)
             
             # Update settings with Ollama configuration
             settings = Settings.query.filter_by(user_id=current_user.id).first()
@@ -181,6 +183,7 @@ def step4():
                         settings.vision_model = vision_models[0][0]
             
             db.session.commit()
+            OllamaClient.invalidate_user_config(None if current_user.is_admin else current_user.id)
             
             # Clear onboarding session data
             for key in ['onboarding_step1', 'onboarding_step2', 'onboarding_step3']:
@@ -230,6 +233,7 @@ def skip_onboarding():
         profile.set_equipment(['stove', 'oven', 'microwave'])
         
         db.session.add(profile)
+        RecommendationService.record_targets(profile)
         db.session.commit()
         
         # Clear any onboarding session data
@@ -3,6 +3,9 @@ from flask_login import login_required, current_user
 from models import Settings, Profile
 from forms.settings import OllamaSettingsForm
 from services.ollama_client import OllamaClient
+from services.ollama_health import OllamaHealth
+from services.model_pulls import ModelPulls
+from services.recommendations import RecommendationService
 from extensions import db
 
 settings_bp = Blueprint('settings', __name__)
@@ -32,6 +35,8 @@ def profile():
     
     if request.method == 'POST':
         try:
+            target_inputs = RecommendationService.target_inputs(profile)
+            
             # Update basic info
             profile.name = request.form.get('name', profile.name)
             profile.age = int(request.form.get('age', profile.age))
@@ -64,6 +69,10 @@ def profile():
             profile.set_equipment(equipment)
             profile.set_conditions([conditions] if conditions else [])
             
+            # Targets are only recomputed when what they depend on changed
+            if RecommendationService.target_inputs(profile) != target_inputs:
+                RecommendationService.record_targets(profile)
+            
             db.session.commit()
             flash('Profile updated successfully!', 'success')
             
@@ -98,15 +107,16 @@ Guidelines:
         )
         db.session.add(settings)
         db.session.commit()
+        OllamaClient.invalidate_user_config(current_user.id)
     
     # Get available models
     available_models = []
     connection_status = False
     
     try:
-        # Use the settings URL directly for testing connection
+        # Cached health and model listing keep this page fast when Ollama is slow
         client = OllamaClient(settings.ollama_url)
-        connection_status = client.test_connection()
+        connection_status = OllamaHealth.is_available(settings.ollama_url)
         
         if connection_status:
             models_data = client.list_models()
@@ -133,6 +143,8 @@ Guidelines:
             settings.safety_mode = form.safety_mode.data
             
             db.session.commit()
+            # Admin settings are the fallback for other users
+            OllamaClient.invalidate_user_config(None if current_user.is_admin else current_user.id)
             flash('Ollama settings updated successfully!', 'success')
             return redirect(url_for('settings.ollama'))
             
@@ -169,7 +181,7 @@ def test_connection():
         models = []
         if connected:
             try:
-                models = client.list_models()
+                models = client.list_models(refresh=True)
             except:
                 pass
         
@@ -196,14 +208,18 @@ def pull_model():
         return jsonify({'error': 'Model name is required'}), 400
     
     try:
-        client = OllamaClient.from_user_settings()
+        hosts = OllamaClient.from_user_settings().pull_hosts()
+        if not hosts:
+            return jsonify({'success': False, 'error': 'No Ollama host is available'}), 503
         
-        success = client.pull_model(model_name)
+        started = [ModelPulls.start(host, model_name)[1] for host in hosts]
+        message = f'Pulling {model_name}' if any(started) else f'{model_name} is already being pulled'
         
-        if success:
-            return jsonify({'success': True, 'message': f'Model {model_name} pulled successfully'})
-        else:
-            return jsonify({'success': False, 'error': 'Failed to pull model'}), 500
+        return jsonify({
+            'success': True,
+            'message': message,
+            'status_url': f'/api/models/pull/{model_name}'
+        }), 202
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the per-user time-range queries.
+Seeds a throwaway SQLite database with food logs, weigh-ins and water intake
+for many users, then prints the query plan and timing of each query with the
+old date() filter and no indexes, with the date() filter once the indexes exist
+(it still cannot use them), and with the half-open range filter and the
+(user_id, timestamp) indexes.
+"""
+
+import argparse
+import random
+import sys
+import os
+import time
+from datetime import date, datetime, timedelta
+
+# Add the parent directory to the Python path so we can import from the app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import and_, create_engine, func, select, text
+
+from extensions import db
+from models import FoodLog, WaterIntake, WeighIn
+from services.time_window import within_days
+
+# (model, timestamp column) for each time-series table seeded
+SEEDED = [(FoodLog, 'logged_at'), (WeighIn, 'recorded_at'), (WaterIntake, 'recorded_at')]
+
+
+def seed(engine, users: int, days: int, per_day: int):
+    now = datetime.utcnow()
+    rng = random.Random(0)
+    with engine.begin() as conn:
+        conn.execute(db.metadata.tables['user'].insert(), [
+            {'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': 'x',
+             'is_admin': False, 'is_active': True}
+            for i in range(1, users + 1)
+        ])
+        for user_id in range(1, users + 1):
+            stamps = [now - timedelta(days=day, minutes=rng.randrange(1440))
+                      for day in range(days) for _ in range(per_day)]
+            conn.execute(FoodLog.__table__.insert(), [
+                {'user_id': user_id, 'custom_name': rng.choice(['Oats', 'Rice', 'Apple', 'Chicken']),
+                 'meal': 'lunch', 'grams': 100, 'calories': 200, 'source': 'manual', 'logged_at': stamp}
+                for stamp in stamps
+            ])
+            conn.execute(WeighIn.__table__.insert(), [
+                {'user_id': user_id, 'weight_kg': 70 + rng.random(), 'recorded_at': now - timedelta(days=day)}
+                for day in range(days)
+            ])
+            conn.execute(WaterIntake.__table__.insert(), [
+                {'user_id': user_id, 'ml': 250, 'recorded_at': stamp} for stamp in stamps
+            ])
+
+
+def queries(user_id: int, start: date, end: date):
+    """(name, old statement, new statement) for the queries the analytics service runs"""
+    result = []
+    for model, column_name in SEEDED:
+        column = getattr(model, column_name)
+        old = select(model.id).where(and_(
+            model.user_id == user_id, func.date(column) >= start, func.date(column) <= end
+        )).order_by(column)
+        new = select(model.id).where(and_(
+            model.user_id == user_id, within_days(column, start, end)
+        )).order_by(column)
+        result.append((f"{model.__tablename__} ({(end - start).days + 1} days)", old, new))
+    return result
+
+
+def run(conn, statement, repeat: int):
+    compiled = statement.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True})
+    plan = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}")]
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        rows = conn.execute(statement).fetchall()
+    elapsed_ms = (time.perf_counter() - started) * 1000 / repeat
+    return plan, len(rows), elapsed_ms
+
+
+def set_indexes(engine, enabled: bool):
+    for model, _ in SEEDED:
+        for index in model.__table__.indexes:
+            if enabled:
+                index.create(engine, checkfirst=True)
+            else:
+                index.drop(engine, checkfirst=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare time-range query plans before and after the indexes')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--days', type=int, default=180, help='history per user')
+    parser.add_argument('--per-day', type=int, default=4, help='food logs and water entries per day')
+    parser.add_argument('--window', type=int, default=30, help='days queried')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    engine = create_engine('sqlite://')
+    db.metadata.create_all(engine)
+    print(f"Seeding {args.users} users x {args.days} days...")
+    seed(engine, args.users, args.days, args.per_day)
+
+    end = datetime.utcnow().date()
+    start = end - timedelta(days=args.window)
+    user_id = args.users // 2
+
+    print("Before: date() filter, no (user_id, timestamp) indexes")
+    set_indexes(engine, False)
+    with engine.connect() as conn:
+        before = [(name, run(conn, old, args.repeat)) for name, old, _ in queries(user_id, start, end)]
+
+    print("Indexed: date() filter and range filter with the indexes")
+    set_indexes(engine, True)
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE"))
+        indexed = [(name, run(conn, old, args.repeat)) for name, old, _ in queries(user_id, start, end)]
+        after = [(name, run(conn, new, args.repeat)) for name, _, new in queries(user_id, start, end)]
+
+    status = 0
+    for runs in zip(before, indexed, after):
+        print()
+        print(f"== {runs[0][0]}")
+        for label, (_, (plan, rows, elapsed_ms)) in zip(('before', 'date()', 'after'), runs):
+            print(f"  {label + ':':8}{elapsed_ms:8.2f} ms, {rows} rows")
+            for step in plan:
+                print(f"    {step}")
+        if len({rows for _, (_, rows, _) in runs}) != 1:
+            print("  ROW COUNTS DIFFER")
+            status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
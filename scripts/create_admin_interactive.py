@@ -17,6 +17,7 @@ from typing import Optional
 from app import create_app
 from extensions import db
 from models import User, Profile, Settings
+from services.recommendations import RecommendationService
 
 
 def prompt(text: str, default: Optional[str] = None) -> str:
@@ -149,7 +150,9 @@ def main() -> int:
                 timeframe_weeks=timeframe_weeks,
             )
             db.session.add(profile)
+            RecommendationService.record_targets(profile)
         else:
+            target_inputs = RecommendationService.target_inputs(profile)
             profile.name = name
             profile.age = age
             profile.sex = sex
@@ -159,6 +162,9 @@ def main() -> int:
             profile.goal_type = goal_type
             profile.target_weight_kg = target_weight_kg
             profile.timeframe_weeks = timeframe_weeks
+            # Targets are only recomputed when what they depend on changed
+            if RecommendationService.target_inputs(profile) != target_inputs:
+                RecommendationService.record_targets(profile)
 
         # Settings (per-user)
         ollama_default = os.environ.get("OLLAMA_URL", "http://localhost:11434")
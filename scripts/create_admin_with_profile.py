@@ -3,7 +3,27 @@
 Create admin user with profile for testing
 """
 
+import os
 import sqlite3
+import sys
+
+# Add the parent directory to the Python path so we can import from the app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def record_targets(user_id):
+    """Record the new profile's daily targets, as onboarding does"""
+    from app import create_app
+    from extensions import db
+    from models import Profile
+    from services.recommendations import RecommendationService
+
+    app = create_app()
+    with app.app_context():
+        profile = Profile.query.filter_by(user_id=user_id).first()
+        RecommendationService.record_targets(profile, profile.created_at)
+        db.session.commit()
+
 
 def create_admin_with_profile():
     """Create or update admin user with profile"""
@@ -12,6 +32,7 @@ def create_admin_with_profile():
     
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
+    profile_created = None
     
     try:
         # Make sure user is admin
@@ -41,6 +62,7 @@ def create_admin_with_profile():
                                    activity_level, goal_type, created_at, updated_at)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, datetime('now'), datetime('now'))
             """, (user_id, 'E2E Test Admin', 30, 'male', 175, 75, 'moderate', 'maintain'))
+            profile_created = user_id
             print("Profile created for admin user")
         
         # Check if settings exist
@@ -61,8 +83,13 @@ def create_admin_with_profile():
     except Exception as e:
         print(f"Error: {e}")
         conn.rollback()
+        profile_created = None
     finally:
         conn.close()
+    
+    if profile_created is not None:
+        record_targets(profile_created)
+        print("Daily targets recorded for admin user")
 
 if __name__ == '__main__':
     create_admin_with_profile()
\ No newline at end of file
@@ -37,6 +37,25 @@ def migrate_database():
             print("Adding last_login column...")
             cursor.execute("ALTER TABLE user ADD COLUMN last_login DATETIME")
         
+        # Nutrition catalog columns on food_item
+        cursor.execute("PRAGMA table_info(food_item)")
+        food_item_columns = [column[1] for column in cursor.fetchall()]
+        
+        if food_item_columns:
+            for column, ddl in [
+                ('url', 'VARCHAR(500)'),
+                ('image_url', 'VARCHAR(500)'),
+                ('description', 'TEXT'),
+                ('search_key', 'VARCHAR(200)'),
+                ('refreshed_at', 'DATETIME'),
+            ]:
+                if column not in food_item_columns:
+                    print(f"Adding food_item.{column} column...")
+                    cursor.execute(f"ALTER TABLE food_item ADD COLUMN {column} {ddl}")
+            
+            cursor.execute("CREATE INDEX IF NOT EXISTS ix_food_item_barcode ON food_item (barcode)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS ix_food_item_search_key ON food_item (search_key)")
+        
         # Create new tables
         print("Creating SystemLog table...")
         cursor.execute("""
@@ -70,6 +89,73 @@ def migrate_database():
             )
         """)
         
+        print("Creating CoachMemory table...")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS coach_memory (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL UNIQUE,
+                summary TEXT NOT NULL DEFAULT '',
+                summarized_through_id INTEGER NOT NULL DEFAULT 0,
+                message_count INTEGER NOT NULL DEFAULT 0,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES user(id)
+            )
+        """)
+        
+        print("Creating DailyNutrition table...")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS daily_nutrition (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                date DATE NOT NULL,
+                meal VARCHAR(20) NOT NULL,
+                log_count INTEGER NOT NULL DEFAULT 0,
+                calories FLOAT NOT NULL DEFAULT 0,
+                protein_g FLOAT NOT NULL DEFAULT 0,
+                carbs_g FLOAT NOT NULL DEFAULT 0,
+                fat_g FLOAT NOT NULL DEFAULT 0,
+                fiber_g FLOAT NOT NULL DEFAULT 0,
+                sugar_g FLOAT NOT NULL DEFAULT 0,
+                sodium_mg FLOAT NOT NULL DEFAULT 0,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES user(id),
+                CONSTRAINT uq_daily_nutrition_user_date_meal UNIQUE (user_id, date, meal)
+            )
+        """)
+        print("Run scripts/rollup_nutrition.py once to fill it from existing food logs.")
+        
+        print("Creating TargetHistory table...")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS target_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                effective_from DATETIME NOT NULL,
+                calories INTEGER NOT NULL,
+                protein_g INTEGER NOT NULL,
+                carbs_g INTEGER NOT NULL,
+                fat_g INTEGER NOT NULL,
+                bmr INTEGER NOT NULL,
+                tdee INTEGER NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES user(id)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_target_history_user_effective_from ON target_history (user_id, effective_from)")
+        
+        # Composite indexes for per-user time-range queries
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        tables = {row[0] for row in cursor.fetchall()}
+        for index, table, column in [
+            ('ix_food_log_user_logged_at', 'food_log', 'logged_at'),
+            ('ix_weigh_in_user_recorded_at', 'weigh_in', 'recorded_at'),
+            ('ix_water_intake_user_recorded_at', 'water_intake', 'recorded_at'),
+            ('ix_coach_message_user_created_at', 'coach_message', 'created_at'),
+            ('ix_notification_user_created_at', 'notification', 'created_at'),
+            ('ix_photo_user_created_at', 'photo', 'created_at'),
+        ]:
+            if table in tables:
+                print(f"Creating index {index}...")
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {table} (user_id, {column})")
+        
         conn.commit()
         print("Database migration completed successfully!")
         
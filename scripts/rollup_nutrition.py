@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Script to backfill and check the DailyNutrition rollup.
+Rebuilds the per-day, per-meal totals from FoodLog (all users or one), or with
+--check compares them against FoodLog and reports any day that has drifted.
+"""
+
+import argparse
+import sys
+import os
+
+# Add the parent directory to the Python path so we can import from the app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from services.nutrition_rollup import NutritionRollup
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill or check the daily nutrition rollup')
+    parser.add_argument('--user', type=int, help='only this user id')
+    parser.add_argument('--check', action='store_true', help='report drift instead of rebuilding')
+    parser.add_argument('--fix', action='store_true', help='with --check, rebuild the users that drifted')
+    args = parser.parse_args()
+    
+    app = create_app()
+    with app.app_context():
+        if not args.check:
+            rows = NutritionRollup.rebuild(args.user)
+            print(f"Rebuilt {rows} rollup rows.")
+            return 0
+        
+        mismatches = NutritionRollup.check(args.user)
+        if not mismatches:
+            print("Rollup matches the food logs.")
+            return 0
+        
+        for mismatch in mismatches:
+            print(f"User {mismatch['user_id']} {mismatch['date']} {mismatch['meal']}: "
+                  f"expected {mismatch['expected']}, found {mismatch['actual']}")
+        print(f"{len(mismatches)} rollup rows differ from the food logs.")
+        
+        if args.fix:
+            for user_id in sorted({mismatch['user_id'] for mismatch in mismatches}):
+                NutritionRollup.rebuild(user_id)
+            print("Rebuilt the affected users.")
+            return 0
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,10 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from sqlalchemy import func, and_
 from models import FoodLog, WeighIn, WaterIntake, Profile
 from extensions import db
+from services.nutrition_rollup import NutritionRollup
+from services.request_memo import request_memo
+from services.time_window import within_days
 from typing import Dict, List, Optional
 import json
 
@@ -9,29 +12,14 @@ import json
 class AnalyticsService:
     
     @staticmethod
+    @request_memo
     def get_nutrition_trends(user_id: int, days: int = 30) -> Dict:
         """Get nutrition trends over specified days"""
         end_date = datetime.utcnow().date()
         start_date = end_date - timedelta(days=days)
         
-        # Get daily nutrition totals
-        daily_data = db.session.query(
-            func.date(FoodLog.logged_at).label('date'),
-            func.sum(FoodLog.calories).label('calories'),
-            func.sum(FoodLog.protein_g).label('protein'),
-            func.sum(FoodLog.carbs_g).label('carbs'),
-            func.sum(FoodLog.fat_g).label('fat'),
-            func.sum(FoodLog.fiber_g).label('fiber'),
-            func.sum(FoodLog.sodium_mg).label('sodium')
-        ).filter(
-            and_(
-                FoodLog.user_id == user_id,
-                func.date(FoodLog.logged_at) >= start_date,
-                func.date(FoodLog.logged_at) <= end_date
-            )
-        ).group_by(
-            func.date(FoodLog.logged_at)
-        ).all()
+        # Daily totals from the rollup: one row per day and meal, however many logs
+        data_dict = NutritionRollup.daily_totals(user_id, start_date, end_date)
         
         # Convert to chart-friendly format
         chart_data = {
@@ -46,25 +34,17 @@ class AnalyticsService:
         
         # Fill in missing days with zeros
         current_date = start_date
-        data_dict = {}
-        for row in daily_data:
-            date_key = row.date
-            if isinstance(date_key, str):
-                from datetime import datetime as dt
-                date_key = dt.strptime(date_key, '%Y-%m-%d').date()
-            data_dict[date_key] = row
-        
         while current_date <= end_date:
             chart_data['dates'].append(current_date.isoformat())
             
             if current_date in data_dict:
-                row = data_dict[current_date]
-                chart_data['calories'].append(float(row.calories or 0))
-                chart_data['protein'].append(float(row.protein or 0))
-                chart_data['carbs'].append(float(row.carbs or 0))
-                chart_data['fat'].append(float(row.fat or 0))
-                chart_data['fiber'].append(float(row.fiber or 0))
-                chart_data['sodium'].append(float(row.sodium or 0))
+                day = data_dict[current_date]
+                chart_data['calories'].append(day['calories'])
+                chart_data['protein'].append(day['protein_g'])
+                chart_data['carbs'].append(day['carbs_g'])
+                chart_data['fat'].append(day['fat_g'])
+                chart_data['fiber'].append(day['fiber_g'])
+                chart_data['sodium'].append(day['sodium_mg'])
             else:
                 # No data for this day
                 for key in ['calories', 'protein', 'carbs', 'fat', 'fiber', 'sodium']:
@@ -75,6 +55,7 @@ class AnalyticsService:
         return chart_data
     
     @staticmethod
+    @request_memo
     def get_weight_trends(user_id: int, days: int = 90) -> Dict:
         """Get weight trends over specified days"""
         end_date = datetime.utcnow().date()
@@ -83,8 +64,7 @@ class AnalyticsService:
         weigh_ins = WeighIn.query.filter(
             and_(
                 WeighIn.user_id == user_id,
-                func.date(WeighIn.recorded_at) >= start_date,
-                func.date(WeighIn.recorded_at) <= end_date
+                within_days(WeighIn.recorded_at, start_date, end_date)
             )
         ).order_by(WeighIn.recorded_at).all()
         
@@ -114,37 +94,33 @@ class AnalyticsService:
         return chart_data
     
     @staticmethod
+    @request_memo
     def get_meal_distribution(user_id: int, days: int = 30) -> Dict:
         """Get distribution of calories across meals"""
         end_date = datetime.utcnow().date()
         start_date = end_date - timedelta(days=days)
         
-        meal_data = db.session.query(
-            FoodLog.meal,
-            func.sum(FoodLog.calories).label('total_calories'),
-            func.count(FoodLog.id).label('count')
-        ).filter(
-            and_(
-                FoodLog.user_id == user_id,
-                func.date(FoodLog.logged_at) >= start_date,
-                func.date(FoodLog.logged_at) <= end_date
-            )
-        ).group_by(FoodLog.meal).all()
-        
+        meal_data = NutritionRollup.meal_totals(user_id, start_date, end_date)
+        return AnalyticsService.build_meal_distribution(meal_data)
+    
+    @staticmethod
+    def build_meal_distribution(meal_data: Dict[str, Dict[str, float]]) -> Dict:
+        """Meal distribution from totals per meal"""
         result = {
             'labels': [],
             'calories': [],
             'counts': []
         }
         
-        for row in meal_data:
-            result['labels'].append(row.meal.capitalize())
-            result['calories'].append(float(row.total_calories))
-            result['counts'].append(int(row.count))
+        for meal, totals in meal_data.items():
+            result['labels'].append(meal.capitalize())
+            result['calories'].append(totals['calories'])
+            result['counts'].append(totals['log_count'])
         
         return result
     
     @staticmethod
+    @request_memo
     def get_top_foods(user_id: int, days: int = 30, limit: int = 10) -> List[Dict]:
         """Get most frequently logged foods"""
         end_date = datetime.utcnow().date()
@@ -159,8 +135,7 @@ class AnalyticsService:
         ).filter(
             and_(
                 FoodLog.user_id == user_id,
-                func.date(FoodLog.logged_at) >= start_date,
-                func.date(FoodLog.logged_at) <= end_date,
+                within_days(FoodLog.logged_at, start_date, end_date),
                 FoodLog.custom_name.isnot(None)
             )
         ).group_by(
@@ -181,24 +156,23 @@ class AnalyticsService:
         return result
     
     @staticmethod
+    @request_memo
     def get_macro_distribution(user_id: int, days: int = 30) -> Dict:
         """Get average macro distribution"""
         end_date = datetime.utcnow().date()
         start_date = end_date - timedelta(days=days)
         
-        totals = db.session.query(
-            func.sum(FoodLog.protein_g).label('total_protein'),
-            func.sum(FoodLog.carbs_g).label('total_carbs'),
-            func.sum(FoodLog.fat_g).label('total_fat')
-        ).filter(
-            and_(
-                FoodLog.user_id == user_id,
-                func.date(FoodLog.logged_at) >= start_date,
-                func.date(FoodLog.logged_at) <= end_date
-            )
-        ).first()
+        daily = NutritionRollup.daily_totals(user_id, start_date, end_date).values()
+        return AnalyticsService.build_macro_distribution(daily)
+    
+    @staticmethod
+    def build_macro_distribution(daily) -> Dict:
+        """Macro distribution from totals per day"""
+        total_protein = sum(day['protein_g'] for day in daily)
+        total_carbs = sum(day['carbs_g'] for day in daily)
+        total_fat = sum(day['fat_g'] for day in daily)
         
-        if not totals or not any([totals.total_protein, totals.total_carbs, totals.total_fat]):
+        if not any([total_protein, total_carbs, total_fat]):
             return {
                 'labels': ['Protein', 'Carbs', 'Fat'],
                 'values': [0, 0, 0],
@@ -206,9 +180,9 @@ class AnalyticsService:
             }
         
         # Convert to calories
-        protein_cal = float(totals.total_protein or 0) * 4
-        carbs_cal = float(totals.total_carbs or 0) * 4
-        fat_cal = float(totals.total_fat or 0) * 9
+        protein_cal = total_protein * 4
+        carbs_cal = total_carbs * 4
+        fat_cal = total_fat * 9
         
         total_cal = protein_cal + carbs_cal + fat_cal
         
@@ -231,35 +205,25 @@ class AnalyticsService:
         }
     
     @staticmethod
+    @request_memo
     def get_logging_streaks(user_id: int) -> Dict:
         """Get logging streak information"""
-        # Get all distinct logging dates
-        logging_dates = db.session.query(
-            func.date(FoodLog.logged_at).label('date')
-        ).filter(
-            FoodLog.user_id == user_id
-        ).distinct().order_by(
-            func.date(FoodLog.logged_at).desc()
-        ).all()
-        
-        if not logging_dates:
+        # Distinct logging dates, newest first
+        dates = NutritionRollup.logged_dates(user_id)
+        return AnalyticsService.build_logging_streaks(dates, datetime.utcnow().date())
+    
+    @staticmethod
+    def build_logging_streaks(dates: List, today) -> Dict:
+        """Streaks from the distinct logging dates, newest first"""
+        if not dates:
             return {
                 'current_streak': 0,
                 'longest_streak': 0,
                 'total_days_logged': 0
             }
         
-        dates = []
-        for row in logging_dates:
-            date_val = row.date
-            if isinstance(date_val, str):
-                from datetime import datetime as dt
-                date_val = dt.strptime(date_val, '%Y-%m-%d').date()
-            dates.append(date_val)
-        
         # Calculate current streak
         current_streak = 0
-        today = datetime.utcnow().date()
         
         # Check if logged today or yesterday
         if dates and (dates[0] == today or dates[0] == today - timedelta(days=1)):
@@ -291,6 +255,7 @@ class AnalyticsService:
         }
     
     @staticmethod
+    @request_memo
     def get_water_intake_trends(user_id: int, days: int = 30) -> Dict:
         """Get water intake trends"""
         end_date = datetime.utcnow().date()
@@ -302,8 +267,7 @@ class AnalyticsService:
         ).filter(
             and_(
                 WaterIntake.user_id == user_id,
-                func.date(WaterIntake.recorded_at) >= start_date,
-                func.date(WaterIntake.recorded_at) <= end_date
+                within_days(WaterIntake.recorded_at, start_date, end_date)
             )
         ).group_by(
             func.date(WaterIntake.recorded_at)
@@ -337,13 +301,12 @@ class AnalyticsService:
         return chart_data
     
     @staticmethod
-    def export_data(user_id: int, start_date: datetime, end_date: datetime) -> List[Dict]:
-        """Export user data for CSV download"""
+    def export_data(user_id: int, start_date: date, end_date: date) -> List[Dict]:
+        """Export user data for CSV download, for the (UTC) days start_date to end_date inclusive"""
         logs = FoodLog.query.filter(
             and_(
                 FoodLog.user_id == user_id,
-                FoodLog.logged_at >= start_date,
-                FoodLog.logged_at <= end_date
+                within_days(FoodLog.logged_at, start_date, end_date)
             )
         ).order_by(FoodLog.logged_at).all()
         
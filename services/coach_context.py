@@ -0,0 +1,237 @@
+"""
+Coach Context Service for NutriCoach
+Per-user snapshot of the coach's user context, rebuilt section by section when
+the rows behind a section change
+"""
+
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+import itertools
+import logging
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session, joinedload
+
+from extensions import get_redis
+from models import CoachMemory, FoodLog, Profile, WeighIn
+
+logger = logging.getLogger(__name__)
+
+SECTIONS = ('profile', 'weight', 'food', 'memory')
+
+# Which section a changed row invalidates
+_SECTION_BY_MODEL = {
+    Profile: 'profile',
+    WeighIn: 'weight',
+    FoodLog: 'food',
+    CoachMemory: 'memory'
+}
+
+_snapshots = {}  # user_id -> {section: (version, built_at, text)}
+_local_versions = {}  # (user_id, section) -> int, used when Redis is not reachable
+_lock = threading.Lock()
+
+
+class CoachContext:
+    """Cached coach context; write hooks bump a version per (user, section)"""
+
+    VERSION_PREFIX = 'nutricoach:coach:context:'
+    VERSION_TTL = 7 * 24 * 3600  # idle users' version stamps expire; they just rebuild once
+
+    @staticmethod
+    def build(user_id: int, sections: Iterable[str] = SECTIONS) -> str:
+        """Context text for the coach prompt; only stale sections are queried again"""
+        versions = CoachContext.versions(user_id)
+        max_age = current_app.config.get('COACH_CONTEXT_MAX_AGE', 900)
+        now = time.monotonic()
+
+        with _lock:
+            snapshot = dict(_snapshots.get(user_id, {}))
+
+        changed = False
+        for section in sections:
+            entry = snapshot.get(section)
+            # The food and memory windows move with time, so sections also age out
+            if entry and entry[0] == versions[section] and now - entry[1] < max_age:
+                continue
+            snapshot[section] = (versions[section], now, _BUILDERS[section](user_id))
+            changed = True
+
+        if changed:
+            with _lock:
+                _snapshots[user_id] = snapshot
+        return ''.join(snapshot[section][2] for section in sections)
+
+    @staticmethod
+    def versions(user_id: int) -> Dict[str, Tuple[str, int]]:
+        """Current version stamp of each section; the source is part of the stamp"""
+        redis = get_redis()
+        if redis is not None:
+            try:
+                stored = redis.hgetall(f"{CoachContext.VERSION_PREFIX}{user_id}")
+                stored = {_decode(key): int(value) for key, value in stored.items()}
+                return {section: ('redis', stored.get(section, 0)) for section in SECTIONS}
+            except Exception as e:
+                logger.debug(f"Coach context Redis read failed: {e}")
+
+        with _lock:
+            return {section: ('local', _local_versions.get((user_id, section), 0)) for section in SECTIONS}
+
+    @staticmethod
+    def bump(user_id: int, sections: Iterable[str]):
+        """Mark sections of a user's context as changed"""
+        sections = list(sections)
+        with _lock:
+            for section in sections:
+                _local_versions[(user_id, section)] = _local_versions.get((user_id, section), 0) + 1
+
+        redis = get_redis()
+        if redis is not None:
+            try:
+                key = f"{CoachContext.VERSION_PREFIX}{user_id}"
+                pipe = redis.pipeline()
+                for section in sections:
+                    pipe.hincrby(key, section, 1)
+                pipe.expire(key, CoachContext.VERSION_TTL)
+                pipe.execute()
+            except Exception as e:
+                logger.debug(f"Coach context Redis write failed: {e}")
+
+    @staticmethod
+    def invalidate(user_id: int, section: str = None):
+        """Force a rebuild; needed after bulk query deletes/updates, which bypass the write hooks"""
+        CoachContext.bump(user_id, [section] if section else SECTIONS)
+
+
+def _decode(value) -> str:
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def _build_profile(user_id: int) -> str:
+    profile = Profile.query.filter_by(user_id=user_id).first()
+
+    def listed(values) -> str:
+        return ', '.join(values) if values else 'None specified'
+
+    if not profile:
+        return (
+            "\n=== USER PROFILE ===\nName: Unknown\nAge: Unknown\nSex: Unknown\nHeight: Unknowncm\n"
+            "Current Weight: Unknownkg\nTarget Weight: Not setkg\nGoal: Unknown (Unknown weeks)\n"
+            "Activity Level: Unknown\n\nDietary Preferences: None specified\n"
+            "Food Allergies: None specified\nKitchen Equipment: None specified\n"
+        )
+
+    # Each JSON column is parsed once
+    lines = [
+        "",
+        "=== USER PROFILE ===",
+        f"Name: {profile.name}",
+        f"Age: {profile.age}",
+        f"Sex: {profile.sex}",
+        f"Height: {profile.height_cm}cm",
+        f"Current Weight: {profile.weight_kg}kg",
+        f"Target Weight: {profile.target_weight_kg}kg",
+        f"Goal: {profile.goal_type} ({profile.timeframe_weeks} weeks)",
+        f"Activity Level: {profile.activity_level}",
+        "",
+        f"Dietary Preferences: {listed(profile.get_preferences())}",
+        f"Food Allergies: {listed(profile.get_allergies())}",
+        f"Kitchen Equipment: {listed(profile.get_equipment())}",
+        ""
+    ]
+    return '\n'.join(lines)
+
+
+def _build_weight(user_id: int) -> str:
+    weigh_ins = WeighIn.query.filter_by(user_id=user_id)\
+        .order_by(WeighIn.recorded_at.desc())\
+        .limit(5).all()
+
+    lines = ["", "=== RECENT WEIGHT PROGRESS ==="]
+    if weigh_ins:
+        lines.extend(f"{w.recorded_at.strftime('%Y-%m-%d')}: {w.weight_kg:.1f}kg" for w in weigh_ins)
+        if len(weigh_ins) >= 2:
+            lines.append(f"Recent Weight Change: {weigh_ins[0].weight_kg - weigh_ins[-1].weight_kg:+.1f}kg")
+    else:
+        lines.append("No recent weight entries")
+    lines.append("")
+    return '\n'.join(lines)
+
+
+def _build_food(user_id: int) -> str:
+    week_ago = datetime.utcnow() - timedelta(days=7)
+    logs = FoodLog.query.options(joinedload(FoodLog.food_item))\
+        .filter_by(user_id=user_id)\
+        .filter(FoodLog.logged_at >= week_ago)\
+        .order_by(FoodLog.logged_at.desc())\
+        .limit(20).all()
+
+    lines = ["", "=== RECENT FOOD LOGS (Last 7 days) ==="]
+    if logs:
+        for log in logs:
+            food_name = log.custom_name or (log.food_item.canonical_name if log.food_item else 'Unknown')
+            lines.append(f"{log.logged_at.strftime('%Y-%m-%d %H:%M')} - {log.meal}: {food_name} ({log.grams}g, {log.calories:.0f}cal)")
+    else:
+        lines.append("No recent food logs")
+    lines.append("")
+    return '\n'.join(lines)
+
+
+def _build_memory(user_id: int) -> str:
+    # Recent messages go to the model as chat turns; older ones only as their summary
+    memory = CoachMemory.query.filter_by(user_id=user_id).first()
+
+    lines = ["", "=== CONVERSATION MEMORY (Summary of earlier exchanges) ==="]
+    lines.append(memory.summary if memory and memory.summary else "No earlier conversations")
+    return '\n'.join(lines)
+
+
+_BUILDERS: Dict[str, Callable[[int], str]] = {
+    'profile': _build_profile,
+    'weight': _build_weight,
+    'food': _build_food,
+    'memory': _build_memory
+}
+
+
+def _section_for(instance) -> Optional[str]:
+    for model, section in _SECTION_BY_MODEL.items():
+        if isinstance(instance, model):
+            return section
+    return None
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    """Remember which (user, section) pairs this transaction touched"""
+    changed: Set[Tuple[int, str]] = session.info.setdefault('coach_context_changed', set())
+    for instance in itertools.chain(session.new, session.dirty, session.deleted):
+        section = _section_for(instance)
+        user_id = getattr(instance, 'user_id', None) if section else None
+        if user_id:
+            changed.add((user_id, section))
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_committed(session):
+    """Bump versions only once the change is committed"""
+    changed = session.info.pop('coach_context_changed', None)
+    if not changed:
+        return
+
+    by_user = {}
+    for user_id, section in changed:
+        by_user.setdefault(user_id, set()).add(section)
+    for user_id, sections in by_user.items():
+        try:
+            CoachContext.bump(user_id, sections)
+        except Exception as e:
+            logger.error(f"Error invalidating coach context for user {user_id}: {e}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('coach_context_changed', None)
@@ -0,0 +1,220 @@
+"""
+Coach Memory Service for NutriCoach
+Keeps the coach prompt within a fixed token budget: older messages are folded
+into a rolling per-user summary in the background, and only the most recent
+turns are sent verbatim
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+import logging
+import threading
+
+from flask import current_app
+
+from extensions import db
+from models import CoachMemory, CoachMessage
+
+logger = logging.getLogger(__name__)
+
+# Approximate characters per token for English text with Llama-style tokenizers
+CHARS_PER_TOKEN = 4
+# Role markers and separators the chat template adds to every message
+MESSAGE_OVERHEAD_TOKENS = 4
+# Most messages folded into the summary in one pass; a long backlog (e.g. history
+# from before summaries existed) is skipped up to the last this many
+MAX_FOLD_MESSAGES = 40
+# Each message is cut to this many characters in the summarization prompt
+FOLD_MESSAGE_CHARS = 600
+
+SUMMARY_PROMPT = """You maintain the long-term memory of a nutrition coach.
+Merge the existing summary and the new messages into one updated summary of what matters for future coaching:
+the user's goals, preferences, struggles, commitments, and advice already given.
+Write short plain-text bullet points, drop small talk, and do not add anything that was not said."""
+
+_summary_executor = None
+_summary_executor_lock = threading.Lock()
+_pending = set()  # user ids with a summary job queued or running
+_pending_lock = threading.Lock()
+
+
+def _get_summary_executor() -> ThreadPoolExecutor:
+    global _summary_executor
+
+    with _summary_executor_lock:
+        if _summary_executor is None:
+            _summary_executor = ThreadPoolExecutor(
+                max_workers=current_app.config.get('COACH_MEMORY_WORKERS', 1),
+                thread_name_prefix='coach-memory'
+            )
+    return _summary_executor
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate; close enough to budget a prompt without loading a tokenizer"""
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _message_tokens(content: str) -> int:
+    return estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+def build_prompt(user_id: int, system_prompt: str, context: str, message: str,
+                 budget: int = None) -> Tuple[str, List[Dict], Dict]:
+    """Assemble the system prompt and chat turns for a coach reply within the token budget.
+
+    The system prompt and the new message are always sent; the user context
+    is cut if they would not fit otherwise. The remaining budget is filled
+    with the newest messages not yet folded into the summary, so older turns
+    drop out first. Returns (system prompt, messages, token stats).
+    """
+    budget = budget or current_app.config.get('COACH_PROMPT_TOKEN_BUDGET', 2048)
+
+    fixed = _message_tokens(system_prompt) + _message_tokens(message) + estimate_tokens("\n\nUser Context:\n")
+    context_budget = max(budget - fixed, 0)
+    context_truncated = estimate_tokens(context) > context_budget
+    if context_truncated:
+        context = context[:context_budget * CHARS_PER_TOKEN]
+    enhanced_prompt = f"{system_prompt}\n\nUser Context:\n{context}"
+    used = _message_tokens(enhanced_prompt) + _message_tokens(message)
+
+    memory = CoachMemory.query.filter_by(user_id=user_id).first()
+    summarized_through = memory.summarized_through_id if memory else 0
+    recent = CoachMessage.query.filter(
+        CoachMessage.user_id == user_id,
+        CoachMessage.id > summarized_through,
+        CoachMessage.role.in_(('user', 'assistant'))
+    ).order_by(CoachMessage.id.desc()).limit(MAX_FOLD_MESSAGES).all()
+
+    kept, history_tokens = 0, 0
+    for msg in recent:
+        tokens = _message_tokens(msg.content)
+        if used + history_tokens + tokens > budget:
+            break
+        kept += 1
+        history_tokens += tokens
+
+    if kept < len(recent):
+        # Drop the oldest turns in whole blocks, so the start of the window (and with it the
+        # prompt prefix Ollama can reuse from its cache) only moves every few turns
+        block = max(current_app.config.get('COACH_MEMORY_BATCH', 6), 1)
+        dropped = -(-(len(recent) - kept) // block) * block
+        kept = max(len(recent) - dropped, 0)
+
+    history = [{'role': msg.role, 'content': msg.content} for msg in recent[:kept]]
+    history_tokens = sum(_message_tokens(msg['content']) for msg in history)
+
+    messages = list(reversed(history)) + [{'role': 'user', 'content': message}]
+    stats = {
+        'budget': budget,
+        'system_tokens': _message_tokens(enhanced_prompt),
+        'history_turns': len(history),
+        'history_tokens': history_tokens,
+        'prompt_tokens': used + history_tokens,
+        'context_truncated': context_truncated
+    }
+    return enhanced_prompt, messages, stats
+
+
+class CoachMemoryService:
+    """Rolling summary of each user's older coach messages"""
+
+    @staticmethod
+    def schedule(user_id: int):
+        """Queue a summary pass for the user unless one is already queued or running"""
+        with _pending_lock:
+            if user_id in _pending:
+                return
+            _pending.add(user_id)
+
+        app = current_app._get_current_object()
+        try:
+            _get_summary_executor().submit(_run_summary, app, user_id)
+        except Exception:
+            with _pending_lock:
+                _pending.discard(user_id)
+            raise
+
+    @staticmethod
+    def summarize(user_id: int) -> bool:
+        """Fold messages older than the newest COACH_MEMORY_KEEP_RECENT into the summary.
+
+        Waits until at least COACH_MEMORY_BATCH messages can be folded, so the
+        model is called once per few exchanges rather than every turn.
+        Returns True if the summary was updated.
+        """
+        config = current_app.config
+        keep_recent = config.get('COACH_MEMORY_KEEP_RECENT', 6)
+        batch = config.get('COACH_MEMORY_BATCH', 6)
+        max_tokens = config.get('COACH_SUMMARY_MAX_TOKENS', 300)
+
+        memory = CoachMemory.query.filter_by(user_id=user_id).first()
+        summarized_through = memory.summarized_through_id if memory else 0
+        unsummarized = CoachMessage.query.filter(
+            CoachMessage.user_id == user_id,
+            CoachMessage.id > summarized_through,
+            CoachMessage.role.in_(('user', 'assistant'))
+        ).order_by(CoachMessage.id.desc()).limit(keep_recent + MAX_FOLD_MESSAGES).all()
+
+        fold = list(reversed(unsummarized[keep_recent:]))
+        if len(fold) < batch:
+            return False
+
+        from services.ollama_client import OllamaClient
+
+        chat_model = OllamaClient.get_user_models(user_id)['chat_model']
+        if not chat_model:
+            return False
+
+        transcript = '\n'.join(
+            f"{'User' if msg.role == 'user' else 'Coach'}: {msg.content[:FOLD_MESSAGE_CHARS]}"
+            for msg in fold
+        )
+        previous = memory.summary if memory and memory.summary else 'None yet'
+        last_id = fold[-1].id
+        # Don't hold the read transaction (and SQLite's lock) while the model works
+        db.session.rollback()
+
+        summary = OllamaClient.from_user_settings(user_id).complete(
+            [{'role': 'user', 'content': f"Existing summary:\n{previous}\n\nNew messages:\n{transcript}"}],
+            chat_model,
+            SUMMARY_PROMPT,
+            max_tokens=max_tokens
+        )
+        if not summary:
+            return False
+
+        # History may have been cleared, or another pass finished first, while the model was working
+        memory = CoachMemory.query.filter_by(user_id=user_id).first()
+        if (memory.summarized_through_id if memory else 0) != summarized_through \
+                or CoachMessage.query.filter_by(id=last_id).first() is None:
+            return False
+
+        if memory is None:
+            memory = CoachMemory(user_id=user_id)
+            db.session.add(memory)
+        memory.summary = summary.strip()[:max_tokens * CHARS_PER_TOKEN]
+        memory.summarized_through_id = last_id
+        memory.message_count = (memory.message_count or 0) + len(fold)
+        db.session.commit()
+        return True
+
+
+def _run_summary(app, user_id: int):
+    """Background job: update the user's summary, never failing the caller"""
+    from services.ollama_client import OllamaBusyError
+
+    with app.app_context():
+        try:
+            CoachMemoryService.summarize(user_id)
+        except OllamaBusyError:
+            # Chat has priority; the next reply schedules another pass
+            logger.debug(f"Skipped coach summary for user {user_id}: Ollama is busy")
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error summarizing coach history for user {user_id}: {e}")
+        finally:
+            with _pending_lock:
+                _pending.discard(user_id)
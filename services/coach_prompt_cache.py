@@ -0,0 +1,118 @@
+"""
+Coach Prompt Cache Service for NutriCoach
+Continues coach conversations from the token context Ollama returned for the
+previous turn (/api/generate), so the system prompt and user context are not
+evaluated again every turn
+"""
+
+from typing import Dict, Iterator, List, Optional
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from flask import current_app
+
+from extensions import get_redis
+from services.coach_memory import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# user_id -> (expires_at, fingerprint, context), used when Redis is not reachable
+_local_contexts = {}
+_local_lock = threading.Lock()
+
+
+class CoachPromptCache:
+    """Per-user Ollama context arrays, valid for one system prompt + context snapshot"""
+
+    KEY_PREFIX = 'nutricoach:coach:kv:'
+
+    @staticmethod
+    def fingerprint(model: str, system_prompt: str) -> str:
+        """Identifies the prefix a context array was built on; any change to it starts over"""
+        return hashlib.sha256(f"{model}\0{system_prompt}".encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _ttl() -> int:
+        return current_app.config.get('COACH_KV_CONTEXT_TTL', 1800)
+
+    @staticmethod
+    def get(user_id: int, fingerprint: str) -> Optional[List[int]]:
+        """The stored context if it was built on this fingerprint"""
+        redis = get_redis()
+        if redis is not None:
+            try:
+                stored = redis.get(f"{CoachPromptCache.KEY_PREFIX}{user_id}")
+                if stored:
+                    entry = json.loads(stored)
+                    return entry['context'] if entry.get('fingerprint') == fingerprint else None
+                return None
+            except Exception as e:
+                logger.debug(f"Coach prompt cache Redis read failed: {e}")
+
+        with _local_lock:
+            entry = _local_contexts.get(user_id)
+        if entry and entry[0] > time.monotonic() and entry[1] == fingerprint:
+            return entry[2]
+        return None
+
+    @staticmethod
+    def store(user_id: int, fingerprint: str, context: List[int]):
+        redis = get_redis()
+        if redis is not None:
+            try:
+                redis.set(f"{CoachPromptCache.KEY_PREFIX}{user_id}",
+                          json.dumps({'fingerprint': fingerprint, 'context': context}),
+                          ex=CoachPromptCache._ttl())
+                return
+            except Exception as e:
+                logger.debug(f"Coach prompt cache Redis write failed: {e}")
+
+        with _local_lock:
+            now = time.monotonic()
+            for stale in [key for key, entry in _local_contexts.items() if entry[0] <= now]:
+                del _local_contexts[stale]
+            _local_contexts[user_id] = (now + CoachPromptCache._ttl(), fingerprint, context)
+
+    @staticmethod
+    def invalidate(user_id: int):
+        """Drop the user's context; needed when history changes without the prefix changing"""
+        with _local_lock:
+            _local_contexts.pop(user_id, None)
+
+        redis = get_redis()
+        if redis is not None:
+            try:
+                redis.delete(f"{CoachPromptCache.KEY_PREFIX}{user_id}")
+            except Exception as e:
+                logger.debug(f"Coach prompt cache Redis delete failed: {e}")
+
+    @staticmethod
+    def chat(client, user_id: int, model: str, system_prompt: str, messages: List[Dict]) -> Iterator[str]:
+        """Stream a coach reply, continuing from the cached context when the prefix is unchanged.
+
+        messages is the chat history ending with the new user message, as built
+        by build_prompt. Without a usable context (first turn, changed user
+        context, or a context past COACH_PROMPT_TOKEN_BUDGET) the earlier turns
+        are sent as text once and the returned context is stored for the next
+        turn. Raises OllamaBusyError like OllamaClient.chat.
+        """
+        message = messages[-1]['content']
+        fingerprint = CoachPromptCache.fingerprint(model, system_prompt)
+        budget = current_app.config.get('COACH_PROMPT_TOKEN_BUDGET', 2048)
+
+        def on_done(result: Dict):
+            if result.get('context'):
+                CoachPromptCache.store(user_id, fingerprint, result['context'])
+
+        context = CoachPromptCache.get(user_id, fingerprint)
+        if context and len(context) + estimate_tokens(message) <= budget:
+            return client.generate(message, model, context=context, on_done=on_done)
+
+        history = messages[:-1]
+        if history:
+            lines = [f"{'User' if msg['role'] == 'user' else 'Coach'}: {msg['content']}" for msg in history]
+            system_prompt = f"{system_prompt}\n\n=== CURRENT CONVERSATION ===\n" + '\n'.join(lines)
+        return client.generate(message, model, system_prompt, on_done=on_done)
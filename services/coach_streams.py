@@ -0,0 +1,298 @@
+"""
+Coach Stream Service for NutriCoach
+Runs coach replies independently of the HTTP connection and publishes them to a
+per-generation Redis Stream, so a dropped client can reconnect and resume
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+import json
+import logging
+import threading
+import time
+import uuid
+
+from flask import current_app
+
+from extensions import db, get_redis
+from models import CoachMessage
+from services.coach_memory import CoachMemoryService
+from services.sse import CoalescingSSEWriter, sse_event
+
+logger = logging.getLogger(__name__)
+
+# Shortest wait for new events, so a zero COACH_STREAM_POLL_TIMEOUT cannot busy-loop
+MIN_POLL_MS = 100
+
+# Process-wide pool for generations, sized from config on first use
+_generation_executor = None
+_generation_executor_lock = threading.Lock()
+
+# key -> _LocalStream, used when Redis is not reachable
+_local_streams = {}
+_local_requests = {}  # (user_id, request_id) -> (expires_at, generation_id)
+_local_lock = threading.Lock()
+
+
+def _get_generation_executor() -> ThreadPoolExecutor:
+    global _generation_executor
+
+    with _generation_executor_lock:
+        if _generation_executor is None:
+            _generation_executor = ThreadPoolExecutor(
+                max_workers=current_app.config.get('COACH_GENERATION_WORKERS', 8),
+                thread_name_prefix='coach-generation'
+            )
+    return _generation_executor
+
+
+def _id_key(entry_id: str) -> Tuple[int, ...]:
+    # Stream ids are "<ms>-<seq>"; compare them numerically
+    try:
+        return tuple(int(part) for part in entry_id.split('-'))
+    except (AttributeError, ValueError):
+        return (0,)
+
+
+def _decode(value) -> str:
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+class _LocalStream:
+    """In-process stand-in for a Redis Stream (single worker only)"""
+
+    def __init__(self, ttl: int):
+        self.entries: List[Tuple[str, Dict]] = []
+        self.expires_at = time.monotonic() + ttl
+        self._created_ms = int(time.time() * 1000)
+        self._seq = 0
+        self._cond = threading.Condition()
+
+    def add(self, payload: Dict) -> str:
+        with self._cond:
+            self._seq += 1
+            entry_id = f"{self._created_ms}-{self._seq}"
+            self.entries.append((entry_id, payload))
+            self._cond.notify_all()
+        return entry_id
+
+    def read(self, after: str, block: float) -> List[Tuple[str, Dict]]:
+        with self._cond:
+            pending = self._after(after)
+            if not pending and block:
+                self._cond.wait(block)
+                pending = self._after(after)
+            return pending
+
+    def _after(self, after: str) -> List[Tuple[str, Dict]]:
+        after_key = _id_key(after)
+        return [(entry_id, payload) for entry_id, payload in self.entries if _id_key(entry_id) > after_key]
+
+    def expire(self, ttl: int):
+        self.expires_at = time.monotonic() + ttl
+
+    def exists(self) -> bool:
+        return self.expires_at > time.monotonic()
+
+
+class _RedisStream:
+    """A Redis Stream holding one generation's events"""
+
+    def __init__(self, redis, key: str):
+        self.redis = redis
+        self.key = key
+
+    def add(self, payload: Dict) -> str:
+        return _decode(self.redis.xadd(self.key, {'data': json.dumps(payload)}))
+
+    def read(self, after: str, block: float) -> List[Tuple[str, Dict]]:
+        # Always a blocking XREAD: without BLOCK an idle reader would spin on Redis, and BLOCK 0 waits forever
+        response = self.redis.xread({self.key: after}, count=500, block=max(int(block * 1000), MIN_POLL_MS))
+        entries = []
+        for _, stream_entries in response or []:
+            for entry_id, fields in stream_entries:
+                data = fields.get(b'data', fields.get('data'))
+                entries.append((_decode(entry_id), json.loads(_decode(data))))
+        return entries
+
+    def expire(self, ttl: int):
+        self.redis.expire(self.key, ttl)
+
+    def exists(self) -> bool:
+        return bool(self.redis.exists(self.key))
+
+
+class CoachStreams:
+    """Coach generations that outlive the request that started them"""
+
+    KEY_PREFIX = 'nutricoach:coach:stream:'
+    REQUEST_PREFIX = 'nutricoach:coach:request:'
+
+    @staticmethod
+    def _key(user_id: int, generation_id: str) -> str:
+        return f"{CoachStreams.KEY_PREFIX}{user_id}:{generation_id}"
+
+    @staticmethod
+    def _ttl() -> int:
+        return current_app.config.get('COACH_STREAM_TTL', 600)
+
+    @staticmethod
+    def _redis():
+        """The Redis client if it is reachable right now, else None"""
+        redis = get_redis()
+        if redis is None:
+            return None
+        try:
+            redis.ping()
+            return redis
+        except Exception as e:
+            logger.debug(f"Coach streams falling back to in-process storage: {e}")
+            return None
+
+    @staticmethod
+    def _open(key: str, create: bool = False):
+        """The stream for key: this process's local one if it has it, otherwise Redis"""
+        with _local_lock:
+            local = _local_streams.get(key)
+        if local is not None and local.exists():
+            return local
+
+        redis = CoachStreams._redis()
+        if redis is not None:
+            stream = _RedisStream(redis, key)
+            return stream if create or stream.exists() else None
+
+        if create:
+            local = _LocalStream(CoachStreams._ttl())
+            with _local_lock:
+                for stale in [k for k, s in _local_streams.items() if not s.exists()]:
+                    del _local_streams[stale]
+                _local_streams[key] = local
+            return local
+        return None
+
+    @staticmethod
+    def start(user_id: int, chunks: Iterator[str], request_id: str = None) -> str:
+        """Consume chunks on a background worker, publishing them; returns the generation id.
+
+        chunks is the iterator returned by OllamaClient.chat; the worker
+        closes it. The assistant message is saved when generation finishes,
+        whether or not a client is still connected. request_id is the
+        client's own id for the message, which finds the generation again
+        if the connection drops before the client has seen its id.
+        """
+        generation_id = uuid.uuid4().hex
+        key = CoachStreams._key(user_id, generation_id)
+        stream = CoachStreams._open(key, create=True)
+        stream.add({'generation_id': generation_id})
+        stream.expire(CoachStreams._ttl())
+        if request_id:
+            CoachStreams._set_request(user_id, request_id, generation_id)
+
+        app = current_app._get_current_object()
+        _get_generation_executor().submit(_run_generation, app, user_id, generation_id, stream, chunks)
+        return generation_id
+
+    @staticmethod
+    def _set_request(user_id: int, request_id: str, generation_id: str):
+        ttl = CoachStreams._ttl()
+        redis = CoachStreams._redis()
+        if redis is not None:
+            try:
+                redis.set(f"{CoachStreams.REQUEST_PREFIX}{user_id}:{request_id}", generation_id, ex=ttl)
+                return
+            except Exception as e:
+                logger.debug(f"Coach stream Redis write failed: {e}")
+
+        now = time.monotonic()
+        with _local_lock:
+            for stale in [k for k, (expires_at, _) in _local_requests.items() if expires_at <= now]:
+                del _local_requests[stale]
+            _local_requests[(user_id, request_id)] = (now + ttl, generation_id)
+
+    @staticmethod
+    def generation_for_request(user_id: int, request_id: str) -> Optional[str]:
+        """The generation started for the client's request_id, kept as long as its stream (COACH_STREAM_TTL)"""
+        redis = CoachStreams._redis()
+        if redis is not None:
+            try:
+                generation_id = redis.get(f"{CoachStreams.REQUEST_PREFIX}{user_id}:{request_id}")
+                if generation_id:
+                    return _decode(generation_id)
+            except Exception as e:
+                logger.debug(f"Coach stream Redis read failed: {e}")
+
+        with _local_lock:
+            entry = _local_requests.get((user_id, request_id))
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    @staticmethod
+    def parse_event_id(event_id: str) -> Tuple[Optional[str], str]:
+        """Split a Last-Event-ID ("<generation_id>:<entry_id>") into its parts"""
+        generation_id, _, entry_id = (event_id or '').partition(':')
+        return (generation_id or None), (entry_id or '0')
+
+    @staticmethod
+    def exists(user_id: int, generation_id: str) -> bool:
+        return CoachStreams._open(CoachStreams._key(user_id, generation_id)) is not None
+
+    @staticmethod
+    def events(user_id: int, generation_id: str, after: str = '0') -> Iterator[str]:
+        """SSE frames for a generation from after the given entry id until it finishes"""
+        stream = CoachStreams._open(CoachStreams._key(user_id, generation_id))
+        if stream is None:
+            yield sse_event({'error': 'Chat stream expired'})
+            return
+
+        poll = max(current_app.config.get('COACH_STREAM_POLL_TIMEOUT', 15), MIN_POLL_MS / 1000)
+        while True:
+            entries = stream.read(after, poll)
+            if not entries:
+                if not stream.exists():
+                    yield sse_event({'error': 'Chat stream expired'})
+                    return
+                # Comment frame keeps proxies and clients from timing out the connection
+                yield ': keep-alive\n\n'
+                continue
+
+            for entry_id, payload in entries:
+                after = entry_id
+                yield sse_event(payload, event_id=f"{generation_id}:{entry_id}")
+                if payload.get('done') or payload.get('error'):
+                    return
+
+
+def _run_generation(app, user_id: int, generation_id: str, stream, chunks: Iterator[str]):
+    """Background job: publish the reply as it is generated, then save it"""
+    with app.app_context():
+        try:
+            writer = CoalescingSSEWriter(chunks)
+            for batch in writer.batches():
+                stream.add({'content': batch})
+
+            message_id = None
+            content = writer.text
+            if content:
+                assistant_msg = CoachMessage(user_id=user_id, role='assistant', content=content)
+                db.session.add(assistant_msg)
+                db.session.commit()
+                message_id = assistant_msg.id
+                CoachMemoryService.schedule(user_id)
+
+            stream.add({'done': True, 'message_id': message_id})
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Coach generation {generation_id} failed: {e}")
+            try:
+                stream.add({'error': 'Chat stream failed'})
+            except Exception:
+                pass
+        finally:
+            chunks.close()
+            try:
+                # Finished streams stay replayable for COACH_STREAM_TTL
+                stream.expire(CoachStreams._ttl())
+            except Exception as e:
+                logger.debug(f"Coach stream cleanup failed: {e}")
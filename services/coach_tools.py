@@ -0,0 +1,301 @@
+"""
+Coach Tools Service for NutriCoach
+Lets the coach model look up the user's nutrition data on demand through
+Ollama tool calls, instead of receiving all of it in every prompt
+"""
+
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import json
+import logging
+import threading
+import time
+
+from flask import current_app
+
+from services.analytics import AnalyticsService
+from services.coach_context import CoachContext
+from services.ollama_client import OllamaBusyError
+from services.recommendations import RecommendationService
+
+logger = logging.getLogger(__name__)
+
+# Sections still sent with every prompt when tools are available; the rest is looked up
+CONTEXT_SECTIONS = ('profile', 'memory')
+
+BUSY_MESSAGE = "\n\nThe AI service is busy, please try again in {retry_after} seconds."
+
+TOOLS_PROMPT = """
+
+You can look up the user's logged food, daily and weekly nutrition totals, weight history and
+nutrition facts with the provided tools. Only call a tool when the question needs that data."""
+
+TOOL_SPECS: List[Dict] = [
+    {
+        'type': 'function',
+        'function': {
+            'name': 'get_daily_summary',
+            'description': "Calories and macros eaten on one day, per meal, against the user's daily targets",
+            'parameters': {
+                'type': 'object',
+                'properties': {
+                    'date': {'type': 'string', 'description': 'Day as YYYY-MM-DD; today if omitted'}
+                }
+            }
+        }
+    },
+    {
+        'type': 'function',
+        'function': {
+            'name': 'get_weekly_averages',
+            'description': 'Average daily calories and macros for a week (Monday to Sunday), and calories per logged day',
+            'parameters': {
+                'type': 'object',
+                'properties': {
+                    'weeks_back': {'type': 'integer', 'description': '0 for this week, 1 for last week, up to 12'}
+                }
+            }
+        }
+    },
+    {
+        'type': 'function',
+        'function': {
+            'name': 'get_top_foods',
+            'description': 'The foods the user logs most often, with how often and their calories',
+            'parameters': {
+                'type': 'object',
+                'properties': {
+                    'days': {'type': 'integer', 'description': 'How many days back to look, 1-90 (default 30)'},
+                    'limit': {'type': 'integer', 'description': 'How many foods to return, 1-20 (default 10)'}
+                }
+            }
+        }
+    },
+    {
+        'type': 'function',
+        'function': {
+            'name': 'get_weight_trend',
+            'description': "The user's weigh-ins and weight change over a period",
+            'parameters': {
+                'type': 'object',
+                'properties': {
+                    'days': {'type': 'integer', 'description': 'How many days back to look, 7-365 (default 90)'}
+                }
+            }
+        }
+    },
+    {
+        'type': 'function',
+        'function': {
+            'name': 'search_nutrition',
+            'description': 'Nutrition facts per 100g for a food or product',
+            'parameters': {
+                'type': 'object',
+                'properties': {
+                    'query': {'type': 'string', 'description': 'Food or product name'}
+                },
+                'required': ['query']
+            }
+        }
+    }
+]
+
+# (user_id, tool, arguments) -> (expires_at, versions, result)
+_results = {}
+_results_lock = threading.Lock()
+_MAX_CACHED_RESULTS = 2000
+
+
+def _clamp(value, default: int, low: int, high: int) -> int:
+    try:
+        return max(low, min(high, int(value)))
+    except (TypeError, ValueError):
+        return default
+
+
+def _daily_summary(user_id: int, arguments: Dict) -> Dict:
+    date = None
+    if arguments.get('date'):
+        try:
+            date = datetime.strptime(str(arguments['date']), '%Y-%m-%d').date()
+        except ValueError:
+            return {'error': 'date must be YYYY-MM-DD'}
+    return RecommendationService.get_daily_summary(user_id, date)
+
+
+def _weekly_averages(user_id: int, arguments: Dict) -> Dict:
+    # A copy: the service result may be memoized for the request
+    summary = dict(RecommendationService.get_weekly_summary(user_id, _clamp(arguments.get('weeks_back'), 0, 0, 12)))
+    summary['daily_calories'] = {day: round(totals['calories']) for day, totals in summary.pop('daily_data').items()}
+    return summary
+
+
+def _top_foods(user_id: int, arguments: Dict) -> Dict:
+    days = _clamp(arguments.get('days'), 30, 1, 90)
+    limit = _clamp(arguments.get('limit'), 10, 1, 20)
+    return {'days': days, 'foods': AnalyticsService.get_top_foods(user_id, days, limit)}
+
+
+def _weight_trend(user_id: int, arguments: Dict) -> Dict:
+    days = _clamp(arguments.get('days'), 90, 7, 365)
+    trends = AnalyticsService.get_weight_trends(user_id, days)
+    weights = trends['weights']
+    if not weights:
+        return {'days': days, 'weigh_ins': 0}
+
+    # A long history is summarized; the model only needs the shape and the latest points
+    return {
+        'days': days,
+        'weigh_ins': len(weights),
+        'first': {'date': trends['dates'][0], 'weight_kg': weights[0]},
+        'latest': {'date': trends['dates'][-1], 'weight_kg': weights[-1]},
+        'change_kg': round(weights[-1] - weights[0], 1),
+        'min_kg': min(weights),
+        'max_kg': max(weights),
+        'moving_average_kg': trends['trend'][-1],
+        'recent': [{'date': date, 'weight_kg': weight}
+                   for date, weight in zip(trends['dates'][-10:], weights[-10:])]
+    }
+
+
+def _search_nutrition(user_id: int, arguments: Dict) -> Dict:
+    query = str(arguments.get('query') or '').strip()
+    if not query:
+        return {'error': 'query is required'}
+
+    from services.nutrition_search import NutritionSearch
+
+    results = []
+    for item in NutritionSearch().search_food(query):
+        if item.get('nutrition'):
+            results.append({
+                'name': item.get('title') or item.get('name'),
+                'source': item.get('source'),
+                'per_100g': item['nutrition']
+            })
+        if len(results) == 5:
+            break
+    return {'query': query, 'results': results}
+
+
+# name -> (function, context sections whose writes invalidate the cached result, per user)
+_TOOLS: Dict[str, Tuple[Callable[[int, Dict], Dict], Tuple[str, ...], bool]] = {
+    'get_daily_summary': (_daily_summary, ('food', 'profile'), True),
+    'get_weekly_averages': (_weekly_averages, ('food',), True),
+    'get_top_foods': (_top_foods, ('food',), True),
+    'get_weight_trend': (_weight_trend, ('weight',), True),
+    'search_nutrition': (_search_nutrition, (), False)
+}
+
+
+class CoachTools:
+    """Server-side functions the coach model can call, with cached results"""
+
+    @staticmethod
+    def available(client, model: str) -> bool:
+        """Whether the coach should use tools with this model"""
+        config = current_app.config
+        # /api/generate has no tool calling
+        if not config.get('COACH_TOOLS_ENABLED', True) or config.get('COACH_KV_REUSE') == 'context':
+            return False
+        capabilities = client.model_capabilities(model)
+        return bool(capabilities) and 'tools' in capabilities
+
+    @staticmethod
+    def execute(user_id: int, name: str, arguments: Dict) -> Dict:
+        """Run a tool for the user, served from cache while the data behind it is unchanged.
+
+        Cached per-user results are keyed on the coach context version stamps
+        of the sections they read, so a committed food log or weigh-in is seen
+        on the next call; COACH_TOOL_CACHE_TTL bounds results that depend on
+        the current date.
+        """
+        tool = _TOOLS.get(name)
+        if tool is None:
+            return {'error': f"Unknown tool: {name}"}
+        function, sections, per_user = tool
+        arguments = arguments if isinstance(arguments, dict) else {}
+
+        key = (user_id if per_user else None, name, json.dumps(arguments, sort_keys=True, default=str))
+        versions = None
+        if sections:
+            stamps = CoachContext.versions(user_id)
+            versions = tuple(stamps[section] for section in sections)
+
+        now = time.monotonic()
+        with _results_lock:
+            entry = _results.get(key)
+        if entry and entry[0] > now and entry[1] == versions:
+            return entry[2]
+
+        try:
+            result = function(user_id, arguments)
+        except Exception as e:
+            logger.error(f"Coach tool {name} failed for user {user_id}: {e}")
+            return {'error': f"{name} failed"}
+
+        with _results_lock:
+            if len(_results) >= _MAX_CACHED_RESULTS:
+                for stale in [k for k, v in _results.items() if v[0] <= now] or list(_results)[:len(_results) // 2]:
+                    del _results[stale]
+            _results[key] = (now + current_app.config.get('COACH_TOOL_CACHE_TTL', 300), versions, result)
+        return result
+
+    @staticmethod
+    def chat(client, user_id: int, model: str, system_prompt: str, messages: List[Dict]) -> Iterator[str]:
+        """Stream a coach reply, running the tools the model calls in between.
+
+        The first request is made here, so a busy host raises OllamaBusyError
+        to the caller. Each round's tool results are sent back to the model;
+        after COACH_TOOL_MAX_ROUNDS rounds it must answer without tools.
+        """
+        calls: List[Dict] = []
+        chunks = client.chat(messages, model, system_prompt, stream=True, tools=TOOL_SPECS, on_tool_calls=calls.extend)
+        return _tool_loop(client, user_id, model, system_prompt, list(messages), chunks, calls)
+
+
+def _parse_call(call: Dict) -> Tuple[str, Dict]:
+    function = call.get('function') or {}
+    arguments = function.get('arguments') or {}
+    if isinstance(arguments, str):
+        # Some models return the arguments JSON-encoded
+        try:
+            arguments = json.loads(arguments)
+        except ValueError:
+            arguments = {}
+    return function.get('name', ''), arguments
+
+
+def _tool_loop(client, user_id: int, model: str, system_prompt: str, messages: List[Dict],
+               chunks: Iterator[str], calls: List[Dict]) -> Iterator[str]:
+    max_rounds = current_app.config.get('COACH_TOOL_MAX_ROUNDS', 3)
+    rounds = 0
+    try:
+        while True:
+            text = []
+            for chunk in chunks:
+                text.append(chunk)
+                yield chunk
+            if not calls:
+                return
+
+            rounds += 1
+            messages.append({'role': 'assistant', 'content': ''.join(text), 'tool_calls': list(calls)})
+            for call in calls:
+                name, arguments = _parse_call(call)
+                result = CoachTools.execute(user_id, name, arguments)
+                logger.debug(f"Coach tool {name}({arguments}) for user {user_id}")
+                messages.append({'role': 'tool', 'tool_name': name, 'content': json.dumps(result, default=str)})
+            calls.clear()
+
+            tools: Optional[List[Dict]] = TOOL_SPECS if rounds < max_rounds else None
+            try:
+                chunks = client.chat(messages, model, system_prompt, stream=True, tools=tools,
+                                     on_tool_calls=calls.extend)
+            except OllamaBusyError as e:
+                # The reply has already started streaming, so end it with a note the user can retry on
+                logger.info(f"Coach tool round {rounds} for user {user_id} refused: host busy")
+                yield BUSY_MESSAGE.format(retry_after=e.retry_after)
+                return
+    finally:
+        chunks.close()
@@ -0,0 +1,61 @@
+"""
+Dashboard Service for NutriCoach
+Builds every dashboard statistic (today, this week, meal and macro split,
+streaks, top foods) from a handful of queries shared between the sections
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict
+
+from services.analytics import AnalyticsService
+from services.nutrition_rollup import NutritionRollup
+from services.recommendations import RecommendationService
+
+
+class DashboardService:
+    """Single-pass aggregation for the web dashboard and /api/analytics/dashboard"""
+
+    @staticmethod
+    def build(user_id: int, days: int = 7, top_foods: int = 5) -> Dict:
+        """All dashboard sections for the user.
+
+        Returns what get_daily_summary, get_weekly_summary,
+        get_meal_distribution and get_macro_distribution (over days),
+        get_logging_streaks and get_top_foods return, from today's stored
+        targets, one rollup query covering today, the week and the window,
+        the logged dates and, unless top_foods is 0, one top foods query.
+        """
+        today = datetime.utcnow().date()
+        window_start = today - timedelta(days=days)
+        week_start, week_end = RecommendationService.week_bounds(today)
+
+        targets = RecommendationService.calculate_daily_targets(user_id)
+
+        rows = NutritionRollup.day_meal_totals(user_id, min(window_start, week_start), max(today, week_end))
+
+        today_meals = {}
+        week_days = defaultdict(list)
+        window_days = defaultdict(list)
+        window_meals = defaultdict(list)
+        for (day, meal), totals in rows.items():
+            if day == today:
+                today_meals[meal] = totals
+            if week_start <= day <= week_end:
+                week_days[day].append(totals)
+            if window_start <= day <= today:
+                window_days[day].append(totals)
+                window_meals[meal].append(totals)
+
+        combine = NutritionRollup.combine
+        return {
+            'today': RecommendationService.build_daily_summary(today, today_meals, targets),
+            'weekly': RecommendationService.build_weekly_summary(
+                week_start, week_end, {day: combine(totals) for day, totals in week_days.items()}),
+            'meal_distribution': AnalyticsService.build_meal_distribution(
+                {meal: combine(totals) for meal, totals in sorted(window_meals.items())}),
+            'macro_distribution': AnalyticsService.build_macro_distribution(
+                [combine(totals) for totals in window_days.values()]),
+            'streaks': AnalyticsService.build_logging_streaks(NutritionRollup.logged_dates(user_id), today),
+            'top_foods': AnalyticsService.get_top_foods(user_id, days, top_foods) if top_foods else []
+        }
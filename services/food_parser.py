@@ -1,8 +1,27 @@
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import List, Dict, Optional
+from flask import current_app
 from services.nutrition_search import NutritionSearch
 from services.vision_classifier import VisionClassifier
 
+# Process-wide pool for per-item nutrition enrichment, sized from config on first use
+_enrichment_executor = None
+_enrichment_executor_lock = threading.Lock()
+
+
+def _get_enrichment_executor() -> ThreadPoolExecutor:
+    global _enrichment_executor
+    
+    with _enrichment_executor_lock:
+        if _enrichment_executor is None:
+            _enrichment_executor = ThreadPoolExecutor(
+                max_workers=current_app.config.get('PHOTO_ENRICHMENT_WORKERS', 4),
+                thread_name_prefix='photo-enrichment'
+            )
+    return _enrichment_executor
+
 
 class FoodParser:
     def __init__(self):
@@ -10,8 +29,12 @@ class FoodParser:
         self.vision_classifier = VisionClassifier()
     
     def parse_vision_results(self, vision_items: List[Dict]) -> List[Dict]:
-        """Parse vision model results into structured food candidates"""
-        candidates = []
+        """Parse vision model results into structured food candidates.
+        
+        Items are enriched with nutrition data concurrently; any item still
+        searching when PHOTO_ENRICHMENT_DEADLINE passes gets a basic estimate.
+        """
+        items = []
         
         for item in vision_items:
             # Normalize fields from various possible shapes
@@ -36,11 +59,37 @@ class FoodParser:
             except Exception:
                 confidence = 0.7
 
-            # Search for nutrition data
-            nutrition_results = self.nutrition_search.search_food(raw_name)
-
-            # Get nutrition estimate
-            nutrition = self.nutrition_search.get_nutrition_estimate(raw_name, portion_grams)
+            items.append((raw_name, portion_grams, confidence))
+        
+        if not items:
+            return []
+        
+        app = current_app._get_current_object()
+        deadline = app.config.get('PHOTO_ENRICHMENT_DEADLINE', 12)
+        
+        def enrich(name, grams):
+            with app.app_context():
+                return self._enrich_item(name, grams)
+        
+        futures = [_get_enrichment_executor().submit(enrich, name, grams) for name, grams, _ in items]
+        wait(futures, timeout=deadline)
+        
+        candidates = []
+        for (raw_name, portion_grams, confidence), future in zip(items, futures):
+            nutrition_results = []
+            nutrition = None
+            
+            if future.done():
+                try:
+                    nutrition_results, nutrition = future.result()
+                except Exception as e:
+                    current_app.logger.error(f"Error enriching '{raw_name}': {e}")
+            else:
+                future.cancel()
+                current_app.logger.warning(f"Nutrition lookup for '{raw_name}' missed the {deadline}s photo deadline")
+            
+            if nutrition is None:
+                nutrition = self.nutrition_search._get_basic_estimate(raw_name, portion_grams)
 
             candidate = {
                 'name': raw_name,
@@ -54,6 +103,12 @@ class FoodParser:
         
         return candidates
     
+    def _enrich_item(self, name: str, portion_grams: float):
+        """Search once and scale the portion nutrition from that result"""
+        nutrition_results = self.nutrition_search.search_food(name)
+        nutrition = self.nutrition_search.estimate_from_results(nutrition_results, name, portion_grams)
+        return nutrition_results, nutrition
+    
     def parse_barcode_to_food(self, barcode: str) -> Optional[Dict]:
         """Parse barcode into food item data"""
         result = self.nutrition_search.search_barcode(barcode)
@@ -0,0 +1,100 @@
+"""
+HTTP Session Pool for NutriCoach
+Process-wide keep-alive sessions for outbound calls, keyed by base URL
+"""
+
+from typing import Dict, Tuple
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def _normalize_base_url(base_url: str) -> str:
+    return (base_url or '').rstrip('/').lower()
+
+
+def get_session(base_url: str) -> requests.Session:
+    """Get the shared session for a base URL, creating it on first use.
+
+    Connections are kept alive and reused across requests and threads. Failed
+    connection attempts are retried with backoff. Reads and HTTP errors are
+    never retried, because requests such as a pull or a chat turn are not
+    idempotent.
+    """
+    key = _normalize_base_url(base_url)
+
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _build_session()
+            _sessions[key] = session
+            logger.info(f"Created pooled HTTP session for {key}")
+    return session
+
+
+def _build_session() -> requests.Session:
+    config = current_app.config
+    pool_size = config.get('OLLAMA_POOL_MAXSIZE', 10)
+
+    retry = Retry(
+        total=config.get('OLLAMA_CONNECT_RETRIES', 2),
+        connect=config.get('OLLAMA_CONNECT_RETRIES', 2),
+        read=0,
+        status=0,
+        other=0,
+        redirect=0,
+        allowed_methods=None,  # connection never established, safe for POST too
+        backoff_factor=config.get('OLLAMA_RETRY_BACKOFF', 0.5),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=False, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({'Content-Type': 'application/json'})
+    return session
+
+
+def get_timeout(read_timeout: float = None) -> Tuple[float, float]:
+    """(connect, read) timeout tuple; read defaults to OLLAMA_READ_TIMEOUT"""
+    config = current_app.config
+    if read_timeout is None:
+        read_timeout = config.get('OLLAMA_READ_TIMEOUT', 180)
+    return config.get('OLLAMA_CONNECT_TIMEOUT', 5), read_timeout
+
+
+def pool_stats() -> Dict[str, Dict]:
+    """Connection counters per base URL, for monitoring"""
+    with _sessions_lock:
+        sessions = dict(_sessions)
+
+    stats = {}
+    for key, session in sessions.items():
+        adapter = session.adapters['https://' if key.startswith('https://') else 'http://']
+        pools = [adapter.poolmanager.pools[pool_key] for pool_key in adapter.poolmanager.pools.keys()]
+
+        stats[key] = {
+            'pool_maxsize': current_app.config.get('OLLAMA_POOL_MAXSIZE', 10),
+            'connections_opened': sum(pool.num_connections for pool in pools),
+            'requests_sent': sum(pool.num_requests for pool in pools),
+            'idle_connections': sum(_idle_connections(pool) for pool in pools)
+        }
+    return stats
+
+
+def _idle_connections(pool) -> int:
+    # The pool queue holds idle connections and None placeholders for unopened slots
+    try:
+        return sum(1 for conn in list(pool.pool.queue) if conn is not None)
+    except Exception:
+        return 0
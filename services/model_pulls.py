@@ -0,0 +1,240 @@
+"""
+Model Pull Service for NutriCoach
+Runs Ollama model pulls on background workers and records their progress
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import json
+import logging
+import threading
+import time
+
+from flask import current_app
+
+from extensions import get_redis
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = 'pending'
+STATUS_PULLING = 'pulling'
+STATUS_COMPLETE = 'complete'
+STATUS_FAILED = 'failed'
+
+ACTIVE_STATUSES = (STATUS_PENDING, STATUS_PULLING)
+
+_local_progress = {}  # key -> progress dict, used when Redis is not reachable
+_local_claims = set()  # keys with a pull running in this process
+_local_lock = threading.Lock()
+
+# Process-wide pool for pulls, sized from config on first use
+_pull_executor = None
+_pull_executor_lock = threading.Lock()
+
+
+def _get_pull_executor() -> ThreadPoolExecutor:
+    global _pull_executor
+
+    with _pull_executor_lock:
+        if _pull_executor is None:
+            _pull_executor = ThreadPoolExecutor(
+                max_workers=current_app.config.get('OLLAMA_PULL_WORKERS', 2),
+                thread_name_prefix='model-pull'
+            )
+    return _pull_executor
+
+
+class ModelPulls:
+    """Background model pulls, one per (host, model) at a time"""
+
+    KEY_PREFIX = 'nutricoach:ollama:pull:'
+
+    @staticmethod
+    def _key(base_url: str, model: str) -> str:
+        return f"{ModelPulls.KEY_PREFIX}{(base_url or '').rstrip('/').lower()}|{model}"
+
+    @staticmethod
+    def _stale_after() -> float:
+        # A pull whose progress has not moved for this long is presumed dead (worker restarted)
+        return current_app.config.get('OLLAMA_PULL_STALE_AFTER', 300)
+
+    @staticmethod
+    def start(base_url: str, model: str) -> Tuple[Dict, bool]:
+        """Start pulling model onto base_url unless that pull is already running.
+
+        Returns (progress, started); started is False when an existing pull
+        was found, in which case its progress is returned.
+        """
+        key = ModelPulls._key(base_url, model)
+        existing = ModelPulls.get_progress(base_url, model)
+        if existing and existing['status'] in ACTIVE_STATUSES:
+            return existing, False
+
+        if not ModelPulls._claim(key):
+            return ModelPulls.get_progress(base_url, model) or existing, False
+
+        progress = {
+            'base_url': base_url,
+            'model': model,
+            'status': STATUS_PENDING,
+            'detail': None,
+            'completed': 0,
+            'total': None,
+            'percent': None,
+            'error': None,
+            'started_at': datetime.utcnow().isoformat()
+        }
+        ModelPulls._store(key, progress)
+
+        app = current_app._get_current_object()
+        _get_pull_executor().submit(_run_pull, app, base_url, model)
+        return progress, True
+
+    @staticmethod
+    def get_progress(base_url: str, model: str) -> Optional[Dict]:
+        """Latest progress for a pull, or None if none was recorded"""
+        key = ModelPulls._key(base_url, model)
+        progress = None
+
+        redis = get_redis()
+        if redis is not None:
+            try:
+                payload = redis.get(key)
+                progress = json.loads(payload) if payload else None
+            except Exception as e:
+                logger.debug(f"Model pull Redis read failed: {e}")
+
+        if progress is None:
+            with _local_lock:
+                progress = _local_progress.get(key)
+            progress = dict(progress) if progress else None
+
+        if progress and progress['status'] in ACTIVE_STATUSES \
+                and time.time() - progress['updated_at_ts'] > ModelPulls._stale_after():
+            progress['status'] = STATUS_FAILED
+            progress['error'] = 'Pull stopped reporting progress'
+        return progress
+
+    @staticmethod
+    def get_all(base_urls: List[str], model: str) -> List[Dict]:
+        """Progress of a model's pull on each host that has one recorded"""
+        progress = (ModelPulls.get_progress(base_url, model) for base_url in base_urls)
+        return [entry for entry in progress if entry]
+
+    @staticmethod
+    def update(base_url: str, model: str, **fields):
+        """Merge fields into a pull's recorded progress"""
+        key = ModelPulls._key(base_url, model)
+        progress = ModelPulls.get_progress(base_url, model) or {'base_url': base_url, 'model': model}
+        progress.update(fields)
+        ModelPulls._store(key, progress)
+
+    @staticmethod
+    def _claim(key: str) -> bool:
+        """Take the right to run a pull, across workers when Redis is available"""
+        with _local_lock:
+            if key in _local_claims:
+                return False
+            _local_claims.add(key)
+
+        redis = get_redis()
+        if redis is not None:
+            try:
+                if not redis.set(f"{key}:claim", '1', nx=True, ex=int(ModelPulls._stale_after())):
+                    with _local_lock:
+                        _local_claims.discard(key)
+                    return False
+            except Exception as e:
+                logger.debug(f"Model pull Redis claim failed: {e}")
+        return True
+
+    @staticmethod
+    def _refresh_claim(key: str):
+        """Extend a running pull's claim, so a long download is not taken over by another worker"""
+        redis = get_redis()
+        if redis is not None:
+            try:
+                redis.expire(f"{key}:claim", int(ModelPulls._stale_after()))
+            except Exception as e:
+                logger.debug(f"Model pull Redis claim refresh failed: {e}")
+
+    @staticmethod
+    def _release(key: str):
+        with _local_lock:
+            _local_claims.discard(key)
+
+        redis = get_redis()
+        if redis is not None:
+            try:
+                redis.delete(f"{key}:claim")
+            except Exception as e:
+                logger.debug(f"Model pull Redis release failed: {e}")
+
+    @staticmethod
+    def _store(key: str, progress: Dict):
+        progress['updated_at'] = datetime.utcnow().isoformat()
+        progress['updated_at_ts'] = time.time()
+        with _local_lock:
+            _local_progress[key] = progress
+
+        redis = get_redis()
+        if redis is not None:
+            try:
+                redis.set(key, json.dumps(progress), ex=current_app.config.get('OLLAMA_PULL_PROGRESS_TTL', 3600))
+            except Exception as e:
+                logger.debug(f"Model pull Redis write failed: {e}")
+
+
+def overall_status(pulls: List[Dict]) -> str:
+    """Combined status of a model's pulls across hosts: active while any runs, complete if any finished"""
+    statuses = {pull['status'] for pull in pulls}
+    for status in (STATUS_PULLING, STATUS_PENDING, STATUS_COMPLETE):
+        if status in statuses:
+            return status
+    return STATUS_FAILED
+
+
+def _progress_fields(event: Dict) -> Dict:
+    """Translate one Ollama /api/pull event into progress fields"""
+    fields = {'status': STATUS_PULLING, 'detail': event.get('status')}
+    total = event.get('total')
+    if total:
+        completed = event.get('completed', 0)
+        fields.update(completed=completed, total=total, percent=round(completed * 100 / total, 1))
+    return fields
+
+
+def _run_pull(app, base_url: str, model: str):
+    """Background job: pull the model, recording progress as Ollama reports it"""
+    from services.ollama_client import OllamaClient
+
+    key = ModelPulls._key(base_url, model)
+    with app.app_context():
+        try:
+            # Layers report progress many times a second; keep writes to about one per interval
+            interval = current_app.config.get('OLLAMA_PULL_PROGRESS_INTERVAL', 1.0)
+            last_write = 0.0
+
+            def on_progress(event: Dict):
+                nonlocal last_write
+                now = time.monotonic()
+                if now - last_write >= interval:
+                    # Each write also renews the claim: staleness counts from the last progress, not the start
+                    ModelPulls.update(base_url, model, **_progress_fields(event))
+                    ModelPulls._refresh_claim(key)
+                    last_write = now
+
+            ModelPulls.update(base_url, model, status=STATUS_PULLING)
+            pulled = OllamaClient(base_url).pull_model(model, on_progress=on_progress)
+
+            if pulled:
+                ModelPulls.update(base_url, model, status=STATUS_COMPLETE, detail='success', percent=100.0)
+                logger.info(f"Pulled {model} onto {base_url}")
+            else:
+                ModelPulls.update(base_url, model, status=STATUS_FAILED, error='Ollama could not pull the model')
+        except Exception as e:
+            logger.error(f"Pull of {model} onto {base_url} failed: {e}")
+            ModelPulls.update(base_url, model, status=STATUS_FAILED, error=str(e))
+        finally:
+            ModelPulls._release(key)
@@ -0,0 +1,173 @@
+"""
+Model Warm-up Service for NutriCoach
+Preloads Ollama chat/vision models and keeps them resident during active hours
+"""
+
+from datetime import datetime
+from typing import List, Optional, Set, Tuple
+import logging
+
+from apscheduler.triggers.interval import IntervalTrigger
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+
+def get_keep_alive() -> Optional[str]:
+    """keep_alive value sent with chat/vision requests, or None to use Ollama's default"""
+    return current_app.config.get('OLLAMA_KEEP_ALIVE') or None
+
+
+class ModelWarmup:
+    """Loads configured models ahead of user requests"""
+
+    @staticmethod
+    def in_active_hours(now: datetime = None) -> bool:
+        """Check OLLAMA_ACTIVE_HOURS ("start-end" local hours, may wrap midnight; empty = always)"""
+        spec = (current_app.config.get('OLLAMA_ACTIVE_HOURS') or '').strip()
+        if not spec:
+            return True
+
+        try:
+            start, end = (int(part) for part in spec.split('-'))
+        except ValueError:
+            logger.warning(f"Invalid OLLAMA_ACTIVE_HOURS '{spec}', treating as always active")
+            return True
+
+        hour = (now or datetime.now()).hour
+        if start <= end:
+            return start <= hour < end
+        return hour >= start or hour < end
+
+    @staticmethod
+    def targets() -> List[Tuple[str, str]]:
+        """(base_url, model) pairs in use: config defaults, admin defaults and per-user models.
+
+        When an Ollama pool is configured, every model it serves is warmed on
+        each pool host, since any of them may be picked for the request.
+        """
+        from models import Settings, GlobalSettings
+        from services.ollama_client import _docker_url
+        from services.ollama_pool import OllamaPool
+
+        config = current_app.config
+        default_url = config.get('OLLAMA_URL', 'http://localhost:11434')
+        pairs: Set[Tuple[str, str]] = {
+            (default_url, config.get('DEFAULT_CHAT_MODEL', 'llama2')),
+            (default_url, config.get('DEFAULT_VISION_MODEL', 'llava'))
+        }
+        pooled_models: Set[str] = {model for _, model in pairs}
+        pool = OllamaPool.get_configured()
+
+        try:
+            global_settings = {
+                setting.key: setting.get_value()
+                for setting in GlobalSettings.query.filter(GlobalSettings.key.in_(
+                    ['ollama_url', 'default_chat_model', 'default_vision_model']
+                )).all()
+            }
+            admin_url = global_settings.get('ollama_url') or default_url
+            for key in ('default_chat_model', 'default_vision_model'):
+                if global_settings.get(key):
+                    pairs.add((admin_url, global_settings[key]))
+                    pooled_models.add(global_settings[key])
+
+            rows = Settings.query.with_entities(
+                Settings.ollama_url, Settings.chat_model, Settings.vision_model
+            ).distinct().all()
+            for url, chat_model, vision_model in rows:
+                url = _docker_url(url) if url else default_url
+                on_pool = pool is not None and pool.applies_to({'url_source': 'user', 'ollama_url': url})
+                for model in (chat_model, vision_model):
+                    if model:
+                        pairs.add((url, model))
+                        if on_pool:
+                            pooled_models.add(model)
+        except Exception as e:
+            logger.error(f"Error listing models to warm up: {e}")
+
+        if pool is not None:
+            pairs.update((host, model) for host in pool.hosts for model in pooled_models)
+
+        return sorted(pairs)
+
+    @staticmethod
+    def warm(base_url: str, model: str) -> bool:
+        """Ask Ollama to load a model (an empty generate request) and keep it loaded"""
+        from services.ollama_client import OllamaClient, OllamaBusyError, PRIORITY_BACKGROUND, get_admission_controller
+
+        payload = {'model': model}
+        keep_alive = get_keep_alive()
+        if keep_alive:
+            payload['keep_alive'] = keep_alive
+
+        try:
+            with get_admission_controller(base_url).slot(PRIORITY_BACKGROUND):
+                response = OllamaClient(base_url)._make_request(
+                    'api/generate', 'POST', payload,
+                    timeout=current_app.config.get('OLLAMA_WARMUP_TIMEOUT', 300)
+                )
+            if response.status_code != 200:
+                logger.warning(f"Warm-up of {model} on {base_url} returned {response.status_code}")
+                return False
+            return True
+        except OllamaBusyError:
+            logger.info(f"Skipping warm-up of {model}: {base_url} is busy")
+            return False
+        except Exception as e:
+            logger.warning(f"Warm-up of {model} on {base_url} failed: {e}")
+            return False
+
+    @staticmethod
+    def warm_all() -> int:
+        """Warm every target on a reachable host that has the model; returns the number loaded"""
+        from services.ollama_health import OllamaHealth, has_model
+
+        warmed = 0
+        for base_url, model in ModelWarmup.targets():
+            status = OllamaHealth.get_status(base_url) or OllamaHealth.probe(base_url)
+            if not status['available']:
+                continue
+            if not has_model(status['models'], model):
+                continue
+            if ModelWarmup.warm(base_url, model):
+                warmed += 1
+        return warmed
+
+
+def _warmup_job(app, respect_active_hours: bool = True):
+    """Background job: preload models (startup) or keep them loaded (periodic)"""
+    with app.app_context():
+        try:
+            if respect_active_hours and not ModelWarmup.in_active_hours():
+                return
+            warmed = ModelWarmup.warm_all()
+            logger.info(f"Warmed {warmed} Ollama model(s)")
+        except Exception as e:
+            logger.error(f"Model warm-up failed: {e}")
+
+
+def init_model_warmup(app, app_scheduler):
+    """Schedule a warm-up at startup and keep_alive pings during active hours"""
+    if not app.config.get('OLLAMA_WARMUP_ENABLED', True):
+        return
+
+    try:
+        app_scheduler.add_job(
+            func=_warmup_job,
+            args=[app, False],
+            id='model_warmup_startup',
+            name='Warm Up Ollama Models',
+            replace_existing=True
+        )
+        app_scheduler.add_job(
+            func=_warmup_job,
+            args=[app],
+            trigger=IntervalTrigger(minutes=app.config.get('OLLAMA_WARMUP_INTERVAL', 10)),
+            id='model_keep_alive',
+            name='Keep Ollama Models Loaded',
+            replace_existing=True
+        )
+        logger.info("Model warm-up scheduled")
+    except Exception as e:
+        logger.error(f"Failed to schedule model warm-up: {e}")
@@ -8,6 +8,7 @@ from typing import List, Optional, Dict, Any
 from sqlalchemy import and_, or_
 from models import Notification, NotificationTemplate, User, FoodLog, Profile
 from extensions import db
+from services.time_window import on_day
 import logging
 
 logger = logging.getLogger(__name__)
@@ -381,15 +382,11 @@ class ReminderService:
             user_name = user.profile.name
             
             # Check if user has already logged this meal today
-            today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-            today_end = today_start + timedelta(days=1)
-            
             existing_log = FoodLog.query.filter(
                 and_(
                     FoodLog.user_id == user_id,
                     FoodLog.meal == meal_type,
-                    FoodLog.logged_at >= today_start,
-                    FoodLog.logged_at < today_end
+                    on_day(FoodLog.logged_at, datetime.utcnow().date())
                 )
             ).first()
             
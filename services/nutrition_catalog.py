@@ -0,0 +1,192 @@
+"""
+Nutrition Catalog Service for NutriCoach
+Read-through local catalog of nutrition search results stored in FoodItem
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from flask import current_app
+from sqlalchemy import case, func, or_
+
+from models import FoodItem
+from extensions import db, scheduler
+
+logger = logging.getLogger(__name__)
+
+# Characters that start a new word in a product name, for word-prefix matches
+WORD_SEPARATORS = (' ', '-', '(')
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a search query (case and whitespace) for matching and keys"""
+    return ' '.join((query or '').lower().split())
+
+
+class NutritionCatalog:
+    """Serves Open Food Facts / Wikipedia lookups from FoodItem rows"""
+
+    PRODUCT_LIMIT = 5  # mirrors the Open Food Facts page_size used by NutritionSearch
+
+    def __init__(self):
+        self.max_age = timedelta(hours=current_app.config.get('NUTRITION_CATALOG_MAX_AGE_HOURS', 24 * 7))
+        self.min_results = current_app.config.get('NUTRITION_CATALOG_MIN_RESULTS', 3)
+
+    def is_fresh(self, item: FoodItem) -> bool:
+        """Check if a catalog entry is inside the freshness window"""
+        if not item.refreshed_at:
+            return False
+        return item.refreshed_at >= datetime.utcnow() - self.max_age
+
+    def search(self, query: str) -> Tuple[List[Dict], bool]:
+        """Return (results, stale) for a text query.
+
+        Returns an empty list when the catalog does not hold enough products to
+        answer the query on its own; callers should then go to the network.
+        """
+        key = normalize_query(query)
+        if not key:
+            return [], False
+
+        # Names equal to the query first, then names starting with it, then
+        # names with a word starting with it; "rice" does not match "licorice"
+        name = func.lower(FoodItem.canonical_name)
+        starts = name.startswith(key, autoescape=True)
+        rank = case((name == key, 0), (starts, 1), else_=2)
+
+        try:
+            products = FoodItem.query.filter(
+                FoodItem.source == 'openfoodfacts',
+                or_(starts, *[name.contains(separator + key, autoescape=True) for separator in WORD_SEPARATORS])
+            ).order_by(rank, FoodItem.refreshed_at.desc()).limit(self.PRODUCT_LIMIT).all()
+
+            if len(products) < self.min_results:
+                return [], False
+
+            article = FoodItem.query.filter_by(source='wikipedia', search_key=key).first()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error reading nutrition catalog: {e}")
+            return [], False
+
+        entries = products + ([article] if article else [])
+        stale = any(not self.is_fresh(item) for item in entries)
+
+        return [item.to_search_result() for item in entries], stale
+
+    def lookup_barcode(self, barcode: str) -> Tuple[Optional[Dict], bool]:
+        """Return (result, stale) for a barcode, or (None, False) if not catalogued"""
+        try:
+            item = FoodItem.query.filter_by(source='openfoodfacts', barcode=barcode).first()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error reading nutrition catalog: {e}")
+            return None, False
+
+        if not item:
+            return None, False
+
+        return item.to_search_result(), not self.is_fresh(item)
+
+    def upsert_results(self, results: List[Dict], query: str = None) -> int:
+        """Insert or refresh catalog entries for normalized search results"""
+        count = 0
+        try:
+            for result in results:
+                if self._upsert(result, query):
+                    count += 1
+
+            if count:
+                db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error updating nutrition catalog: {e}")
+            return 0
+
+        return count
+
+    def _upsert(self, result: Dict, query: str = None) -> bool:
+        source = result.get('source')
+        now = datetime.utcnow()
+
+        if source == 'openfoodfacts':
+            name = (result.get('name') or '').strip()
+            if not name or not result.get('nutrition'):
+                return False
+
+            brand = (result.get('brand') or '').strip() or None
+            barcode = result.get('barcode') or None
+
+            if barcode:
+                item = FoodItem.query.filter_by(source=source, barcode=barcode).first()
+            else:
+                item = FoodItem.query.filter_by(source=source, canonical_name=name[:200], brand=brand).first()
+
+            if item is None:
+                item = FoodItem(source=source)
+                db.session.add(item)
+
+            item.canonical_name = name[:200]
+            item.brand = brand[:100] if brand else None
+            item.barcode = barcode
+            item.set_nutrition(result['nutrition'])
+            item.url = result.get('url') or None
+            item.image_url = result.get('image_url') or None
+            item.search_key = normalize_query(name)[:200]
+            item.refreshed_at = now
+            return True
+
+        if source == 'wikipedia':
+            key = normalize_query(query or result.get('title'))
+            if not key:
+                return False
+
+            item = FoodItem.query.filter_by(source=source, search_key=key[:200]).first()
+            if item is None:
+                item = FoodItem(source=source, search_key=key[:200])
+                db.session.add(item)
+
+            item.canonical_name = (result.get('title') or query)[:200]
+            item.url = result.get('url') or None
+            item.description = result.get('snippet') or None
+            item.refreshed_at = now
+            return True
+
+        return False
+
+    def schedule_refresh(self, query: str = None, barcode: str = None):
+        """Refresh a stale entry on the background scheduler"""
+        if barcode:
+            job_id = f"catalog_refresh_barcode_{barcode}"
+        else:
+            job_id = f"catalog_refresh_query_{normalize_query(query)}"
+
+        try:
+            if not scheduler.running or scheduler.get_job(job_id):
+                return
+
+            scheduler.add_job(
+                func=_refresh_entry,
+                args=[current_app._get_current_object(), query, barcode],
+                id=job_id,
+                name='Refresh Nutrition Catalog Entry',
+                replace_existing=True
+            )
+        except Exception as e:
+            logger.warning(f"Failed to schedule catalog refresh ({job_id}): {e}")
+
+
+def _refresh_entry(app, query: str = None, barcode: str = None):
+    """Background job: re-fetch a catalog entry from its external source"""
+    from services.nutrition_search import NutritionSearch
+
+    with app.app_context():
+        try:
+            search = NutritionSearch()
+            if barcode:
+                search.fetch_barcode(barcode)
+            elif query:
+                search.fetch_food(query)
+        except Exception as e:
+            logger.error(f"Error refreshing catalog entry: {e}")
@@ -0,0 +1,214 @@
+"""
+Nutrition Rollup Service for NutriCoach
+Maintains DailyNutrition, the per-user, per-day, per-meal totals of FoodLog, so
+dashboards read one row per day and meal instead of every log
+"""
+
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+from sqlalchemy import and_, func
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import DailyNutrition, FoodLog
+
+logger = logging.getLogger(__name__)
+
+# Summed FoodLog columns, named the same on DailyNutrition
+FIELDS = ('calories', 'protein_g', 'carbs_g', 'fat_g', 'fiber_g', 'sugar_g', 'sodium_mg')
+
+# Totals that differ by less than this are float rounding, not drift
+TOLERANCE = 0.01
+
+
+class NutritionRollup:
+    """Keeps DailyNutrition in step with FoodLog and reads totals from it"""
+
+    @staticmethod
+    def add(log: FoodLog):
+        """Count a new log in its day's totals; call in the same transaction that adds it"""
+        _apply(log, 1)
+
+    @staticmethod
+    def remove(log: FoodLog):
+        """Take a log out of its day's totals; call in the same transaction that deletes it"""
+        _apply(log, -1)
+
+    @staticmethod
+    def daily_totals(user_id: int, start: date, end: date) -> Dict[date, Dict[str, float]]:
+        """Totals per day between start and end (inclusive); days without logs are absent"""
+        rows = db.session.query(
+            DailyNutrition.date,
+            func.sum(DailyNutrition.log_count).label('log_count'),
+            *[func.sum(getattr(DailyNutrition, field)).label(field) for field in FIELDS]
+        ).filter(
+            DailyNutrition.user_id == user_id,
+            DailyNutrition.date >= start,
+            DailyNutrition.date <= end,
+            DailyNutrition.log_count > 0
+        ).group_by(DailyNutrition.date).all()
+
+        return {_as_date(row.date): _totals(row) for row in rows}
+
+    @staticmethod
+    def meal_totals(user_id: int, start: date, end: date) -> Dict[str, Dict[str, float]]:
+        """Totals per meal between start and end (inclusive)"""
+        rows = db.session.query(
+            DailyNutrition.meal,
+            func.sum(DailyNutrition.log_count).label('log_count'),
+            *[func.sum(getattr(DailyNutrition, field)).label(field) for field in FIELDS]
+        ).filter(
+            DailyNutrition.user_id == user_id,
+            DailyNutrition.date >= start,
+            DailyNutrition.date <= end,
+            DailyNutrition.log_count > 0
+        ).group_by(DailyNutrition.meal).all()
+
+        return {row.meal: _totals(row) for row in rows}
+
+    @staticmethod
+    def day_meal_totals(user_id: int, start: date, end: date) -> Dict[Tuple[date, str], Dict[str, float]]:
+        """The stored rows between start and end (inclusive), keyed on (day, meal).
+
+        For callers deriving several day and meal breakdowns from one query;
+        combine() adds rows up the way daily_totals and meal_totals do.
+        """
+        rows = DailyNutrition.query.filter(
+            DailyNutrition.user_id == user_id,
+            DailyNutrition.date >= start,
+            DailyNutrition.date <= end,
+            DailyNutrition.log_count > 0
+        ).all()
+        return {(_as_date(row.date), row.meal): _totals(row) for row in rows}
+
+    @staticmethod
+    def combine(totals: Iterable[Dict[str, float]]) -> Dict[str, float]:
+        """Sum of several totals dicts"""
+        combined = {field: 0.0 for field in FIELDS}
+        combined['log_count'] = 0
+        for item in totals:
+            for field in combined:
+                combined[field] += item[field]
+        return combined
+
+    @staticmethod
+    def logged_dates(user_id: int) -> List[date]:
+        """Every day the user logged food, newest first"""
+        rows = db.session.query(DailyNutrition.date).filter(
+            DailyNutrition.user_id == user_id,
+            DailyNutrition.log_count > 0
+        ).distinct().order_by(DailyNutrition.date.desc()).all()
+        return [_as_date(row.date) for row in rows]
+
+    @staticmethod
+    def rebuild(user_id: int = None) -> int:
+        """Recompute the rollup from FoodLog (all users, or one); returns the rows written.
+
+        Used to backfill existing installs and to repair drift found by check().
+        Commits.
+        """
+        delete = DailyNutrition.query
+        if user_id is not None:
+            delete = delete.filter_by(user_id=user_id)
+        delete.delete(synchronize_session=False)
+
+        rows = _aggregate_logs(user_id)
+        now = datetime.utcnow()
+        db.session.bulk_insert_mappings(DailyNutrition, [dict(row, updated_at=now) for row in rows])
+        db.session.commit()
+        return len(rows)
+
+    @staticmethod
+    def check(user_id: int = None) -> List[Dict]:
+        """Compare the rollup with a fresh aggregate of FoodLog; returns the (user, day, meal) that differ"""
+        expected = {(row['user_id'], row['date'], row['meal']): row for row in _aggregate_logs(user_id)}
+
+        query = DailyNutrition.query.filter(DailyNutrition.log_count != 0)
+        if user_id is not None:
+            query = query.filter_by(user_id=user_id)
+        actual = {
+            (row.user_id, row.date, row.meal): {'log_count': row.log_count, **{f: getattr(row, f) for f in FIELDS}}
+            for row in query.all()
+        }
+
+        mismatches = []
+        for key in sorted(set(expected) | set(actual)):
+            want, have = expected.get(key), actual.get(key)
+            if want and have and want['log_count'] == have['log_count'] \
+                    and all(abs(want[f] - (have[f] or 0)) < TOLERANCE for f in FIELDS):
+                continue
+            mismatches.append({
+                'user_id': key[0],
+                'date': key[1].isoformat(),
+                'meal': key[2],
+                'expected': want,
+                'actual': have
+            })
+        return mismatches
+
+
+def _as_date(value) -> date:
+    if isinstance(value, str):
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def _totals(row) -> Dict[str, float]:
+    totals = {field: float(getattr(row, field) or 0) for field in FIELDS}
+    totals['log_count'] = int(row.log_count or 0)
+    return totals
+
+
+def _aggregate_logs(user_id: Optional[int]) -> List[Dict]:
+    """FoodLog summed per user, UTC day and meal, the way the rollup stores it"""
+    day = func.date(FoodLog.logged_at)
+    query = db.session.query(
+        FoodLog.user_id,
+        day.label('date'),
+        FoodLog.meal,
+        func.count(FoodLog.id).label('log_count'),
+        *[func.sum(getattr(FoodLog, field)).label(field) for field in FIELDS]
+    )
+    if user_id is not None:
+        query = query.filter(FoodLog.user_id == user_id)
+    rows = query.group_by(FoodLog.user_id, day, FoodLog.meal).all()
+    return [{'user_id': row.user_id, 'date': _as_date(row.date), 'meal': row.meal, **_totals(row)} for row in rows]
+
+
+def _apply(log: FoodLog, sign: int):
+    """Add (sign=1) or subtract (sign=-1) a log's values in its DailyNutrition row"""
+    if log.logged_at is None:
+        # The column default would only be applied at flush; the day has to be known now
+        log.logged_at = datetime.utcnow()
+
+    table = DailyNutrition.__table__
+    day = log.logged_at.date()
+    deltas = {field: sign * float(getattr(log, field) or 0) for field in FIELDS}
+    now = datetime.utcnow()
+    match = and_(table.c.user_id == log.user_id, table.c.date == day, table.c.meal == log.meal)
+
+    # Increment in SQL, so concurrent writers to the same day do not overwrite each other
+    increment = table.update().where(match).values(
+        log_count=table.c.log_count + sign,
+        updated_at=now,
+        **{field: table.c[field] + delta for field, delta in deltas.items()}
+    )
+    if db.session.execute(increment).rowcount:
+        return
+
+    if sign < 0:
+        logger.warning(f"No nutrition rollup row for user {log.user_id} on {day} ({log.meal}); run the rollup check")
+        return
+
+    try:
+        with db.session.begin_nested():
+            db.session.execute(table.insert().values(
+                user_id=log.user_id, date=day, meal=log.meal, log_count=1, updated_at=now, **deltas
+            ))
+    except IntegrityError:
+        # Another request created the row in the meantime
+        db.session.execute(increment)
@@ -1,113 +1,195 @@
 import requests
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import Dict, List, Optional
 from flask import current_app
+from services.nutrition_catalog import NutritionCatalog
+from services.search_cache import SearchCache
+
+REQUEST_TIMEOUT = 10  # seconds, per external request
+
+# Shared by all searches; abandoned lookups finish (and fill the cache) in the background
+_search_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='nutrition-search')
 
 
 class NutritionSearch:
     def __init__(self):
         self.openfoodfacts_url = current_app.config.get('OPENFOODFACTS_API_URL', 'https://world.openfoodfacts.org')
         self.wikipedia_url = current_app.config.get('WIKIPEDIA_API_URL', 'https://en.wikipedia.org')
+        self.catalog = NutritionCatalog()
+        self.cache = SearchCache.get_instance()
     
     def search_food(self, query: str) -> List[Dict]:
-        """Search for food items across multiple sources"""
-        results = []
+        """Search for food items, serving from the local catalog when possible"""
+        results, stale = self.catalog.search(query)
+        
+        if results:
+            if stale:
+                self.catalog.schedule_refresh(query=query)
+            return results[:10]
+        
+        return self.fetch_food(query)
+    
+    def fetch_food(self, query: str) -> List[Dict]:
+        """Search external sources concurrently and record the results in the catalog.
+        
+        Open Food Facts and Wikipedia are queried in parallel under one shared
+        deadline; sources that have not answered by then are abandoned and
+        whatever did arrive is returned.
+        """
+        deadline = current_app.config.get('NUTRITION_SEARCH_DEADLINE', 8)
+        started = time.monotonic()
+        app = current_app._get_current_object()
         
-        # Search Open Food Facts
-        off_results = self.search_openfoodfacts(query)
-        results.extend(off_results)
+        def run(source_search):
+            with app.app_context():
+                remaining = deadline - (time.monotonic() - started)
+                return source_search(query, timeout=max(0.5, min(REQUEST_TIMEOUT, remaining)))
         
-        # Search Wikipedia for general information
-        wiki_results = self.search_wikipedia(query)
-        results.extend(wiki_results)
+        # Open Food Facts first, Wikipedia for general information
+        futures = [
+            (name, _search_executor.submit(run, source_search))
+            for name, source_search in [
+                ('openfoodfacts', self.search_openfoodfacts),
+                ('wikipedia', self.search_wikipedia)
+            ]
+        ]
+        wait([future for _, future in futures], timeout=deadline)
+        
+        results = []
+        for name, future in futures:
+            if not future.done():
+                future.cancel()
+                current_app.logger.warning(f"{name} search for '{query}' missed the {deadline}s deadline")
+                continue
+            try:
+                results.extend(future.result())
+            except Exception as e:
+                current_app.logger.error(f"Error searching {name}: {e}")
+        
+        self.catalog.upsert_results(results, query)
         
         return results[:10]  # Limit to top 10 results
     
-    def search_openfoodfacts(self, query: str) -> List[Dict]:
+    def search_openfoodfacts(self, query: str, timeout: float = REQUEST_TIMEOUT) -> List[Dict]:
         """Search Open Food Facts API"""
         try:
             if current_app.config.get('DISABLE_EXTERNAL_CALLS', False):
                 return []
             
-            url = f"{self.openfoodfacts_url}/cgi/search.pl"
-            params = {
-                'search_terms': query,
-                'search_simple': 1,
-                'action': 'process',
-                'json': 1,
-                'page_size': 5
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                products = data.get('products', [])
-                
-                results = []
-                for product in products:
-                    result = self._normalize_openfoodfacts_product(product)
-                    if result:
-                        results.append(result)
-                
-                return results
-            
-            return []
+            return self.cache.get_or_fetch('openfoodfacts', query, lambda: self._fetch_openfoodfacts(query, timeout))
         
         except Exception as e:
             current_app.logger.error(f"Error searching Open Food Facts: {e}")
             return []
     
+    def _fetch_openfoodfacts(self, query: str, timeout: float = REQUEST_TIMEOUT) -> List[Dict]:
+        """Query Open Food Facts search; raises on transport/server errors"""
+        url = f"{self.openfoodfacts_url}/cgi/search.pl"
+        params = {
+            'search_terms': query,
+            'search_simple': 1,
+            'action': 'process',
+            'json': 1,
+            'page_size': 5
+        }
+        
+        response = requests.get(url, params=params, timeout=timeout)
+        response.raise_for_status()
+        
+        data = response.json()
+        products = data.get('products', [])
+        
+        results = []
+        for product in products:
+            result = self._normalize_openfoodfacts_product(product)
+            if result:
+                results.append(result)
+        
+        return results
+    
     def search_barcode(self, barcode: str) -> Optional[Dict]:
-        """Search for product by barcode"""
+        """Search for product by barcode, serving from the local catalog when possible"""
+        result, stale = self.catalog.lookup_barcode(barcode)
+        
+        if result:
+            if stale:
+                self.catalog.schedule_refresh(barcode=barcode)
+            return result
+        
+        return self.fetch_barcode(barcode)
+    
+    def fetch_barcode(self, barcode: str) -> Optional[Dict]:
+        """Look up a barcode on Open Food Facts and record it in the catalog"""
+        result = self._search_barcode_remote(barcode)
+        
+        if result:
+            self.catalog.upsert_results([result])
+        
+        return result
+    
+    def _search_barcode_remote(self, barcode: str) -> Optional[Dict]:
+        """Search Open Food Facts for a product by barcode"""
         try:
             if current_app.config.get('DISABLE_EXTERNAL_CALLS', False):
                 return None
             
-            url = f"{self.openfoodfacts_url}/api/v0/product/{barcode}.json"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('status') == 1:
-                    product = data.get('product', {})
-                    return self._normalize_openfoodfacts_product(product)
-            
-            return None
+            return self.cache.get_or_fetch('barcode', barcode.strip(), lambda: self._fetch_barcode(barcode))
         
         except Exception as e:
             current_app.logger.error(f"Error searching barcode: {e}")
             return None
     
-    def search_wikipedia(self, query: str) -> List[Dict]:
+    def _fetch_barcode(self, barcode: str) -> Optional[Dict]:
+        """Fetch a product by barcode; returns None for unknown products"""
+        url = f"{self.openfoodfacts_url}/api/v0/product/{barcode}.json"
+        response = requests.get(url, timeout=REQUEST_TIMEOUT)
+        
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        
+        data = response.json()
+        if data.get('status') == 1:
+            product = data.get('product', {})
+            return self._normalize_openfoodfacts_product(product)
+        
+        return None
+    
+    def search_wikipedia(self, query: str, timeout: float = REQUEST_TIMEOUT) -> List[Dict]:
         """Search Wikipedia for food information"""
         try:
             if current_app.config.get('DISABLE_EXTERNAL_CALLS', False):
                 return []
             
-            # Search for pages
-            search_url = f"{self.wikipedia_url}/api/rest_v1/page/summary/{query}"
-            response = requests.get(search_url, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                result = {
-                    'source': 'wikipedia',
-                    'title': data.get('title', query),
-                    'url': data.get('content_urls', {}).get('desktop', {}).get('page', ''),
-                    'snippet': data.get('extract', ''),
-                    'nutrition': None  # Wikipedia doesn't provide structured nutrition data
-                }
-                
-                return [result]
-            
-            return []
+            return self.cache.get_or_fetch('wikipedia', query, lambda: self._fetch_wikipedia(query, timeout))
         
         except Exception as e:
             current_app.logger.error(f"Error searching Wikipedia: {e}")
             return []
     
+    def _fetch_wikipedia(self, query: str, timeout: float = REQUEST_TIMEOUT) -> List[Dict]:
+        """Fetch a Wikipedia page summary; returns [] when there is no page"""
+        search_url = f"{self.wikipedia_url}/api/rest_v1/page/summary/{query}"
+        response = requests.get(search_url, timeout=timeout)
+        
+        if response.status_code == 404:
+            return []
+        response.raise_for_status()
+        
+        data = response.json()
+        
+        result = {
+            'source': 'wikipedia',
+            'title': data.get('title', query),
+            'url': data.get('content_urls', {}).get('desktop', {}).get('page', ''),
+            'snippet': data.get('extract', ''),
+            'nutrition': None  # Wikipedia doesn't provide structured nutrition data
+        }
+        
+        return [result]
+    
     def _normalize_openfoodfacts_product(self, product: Dict) -> Optional[Dict]:
         """Normalize Open Food Facts product data"""
         try:
@@ -144,6 +226,8 @@ class NutritionSearch:
             return {
                 'source': 'openfoodfacts',
                 'title': f"{name} {brand}".strip(),
+                'name': name,
+                'brand': brand,
                 'url': f"{self.openfoodfacts_url}/product/{product.get('code', '')}",
                 'snippet': f"Brand: {brand}" if brand else "",
                 'nutrition': nutrition,
@@ -157,8 +241,10 @@ class NutritionSearch:
     
     def get_nutrition_estimate(self, food_name: str, grams: float = 100) -> Dict:
         """Get nutrition estimate for a food item"""
-        results = self.search_food(food_name)
-        
+        return self.estimate_from_results(self.search_food(food_name), food_name, grams)
+    
+    def estimate_from_results(self, results: List[Dict], food_name: str, grams: float = 100) -> Dict:
+        """Scale the best search result to a portion, without searching again"""
         # Find the best match with nutrition data
         for result in results:
             if result.get('nutrition') and result['source'] == 'openfoodfacts':
@@ -2,107 +2,403 @@ import requests
 import json
 import base64
 import re
-from typing import List, Dict, Optional, Generator
-from flask import current_app
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Dict, Optional, Generator, Iterator, Tuple
+from flask import current_app, g, has_app_context
 from flask_login import current_user
+from services.http_pool import get_session, get_timeout
+from services.ollama_metrics import record_timings
+from services.model_warmup import get_keep_alive
+
+# user_id -> (expires_at, resolved config); see OllamaClient.resolve_user_config
+_user_config_cache = {}
+_user_config_lock = threading.Lock()
+
+# base URL -> (fetched_at, models); see OllamaClient.list_models
+_model_cache = {}
+_model_refreshing = set()
+_model_cache_lock = threading.Lock()
+
+# (base URL, model) -> (fetched_at, capabilities); see OllamaClient.model_capabilities
+_capabilities_cache = {}
+_capabilities_refreshing = set()
+
+
+def _docker_url(ollama_url: str) -> str:
+    # Only auto-correct localhost URLs in Docker environment
+    if ollama_url == 'http://localhost:11434' and current_app.config.get('FLASK_ENV') == 'production':
+        current_app.logger.info("Auto-correcting localhost to host.docker.internal for Docker environment")
+        return 'http://host.docker.internal:11434'
+    return ollama_url
+
+
+def _add_keep_alive(payload: Dict):
+    # Explicit keep_alive so models stay loaded between coach turns and photos
+    keep_alive = get_keep_alive()
+    if keep_alive:
+        payload['keep_alive'] = keep_alive
+
+
+def _default_user_config() -> Dict:
+    return {
+        'ollama_url': current_app.config.get('OLLAMA_URL', 'http://host.docker.internal:11434'),
+        'url_source': 'default',
+        'chat_model': current_app.config.get('DEFAULT_CHAT_MODEL', 'llama2'),
+        'vision_model': current_app.config.get('DEFAULT_VISION_MODEL', 'llava'),
+        'system_prompt': None
+    }
+
+
+def _load_user_config(user_id: int = None) -> Optional[Dict]:
+    """Read the user's settings, falling back to the admin's, then to config defaults.
+    
+    Returns None when the lookup fails so the defaults are not cached.
+    """
+    try:
+        from models import Settings, User
+        
+        config = _default_user_config()
+        settings = Settings.query.filter_by(user_id=user_id).first() if user_id else None
+        
+        has_url = bool(settings and settings.ollama_url)
+        has_models = bool(settings and (settings.chat_model or settings.vision_model))
+        
+        admin_settings = None
+        if not (has_url and has_models):
+            admin_user = User.query.filter_by(is_admin=True).first()
+            if admin_user:
+                admin_settings = Settings.query.filter_by(user_id=admin_user.id).first()
+        
+        if has_url:
+            config['ollama_url'] = _docker_url(settings.ollama_url)
+            config['url_source'] = 'user'
+        elif admin_settings and admin_settings.ollama_url:
+            config['ollama_url'] = _docker_url(admin_settings.ollama_url)
+            config['url_source'] = 'admin'
+        
+        if has_models:
+            config['chat_model'] = settings.chat_model
+            config['vision_model'] = settings.vision_model
+            config['system_prompt'] = settings.system_prompt
+        elif admin_settings:
+            config['chat_model'] = admin_settings.chat_model or config['chat_model']
+            config['vision_model'] = admin_settings.vision_model or config['vision_model']
+            config['system_prompt'] = admin_settings.system_prompt
+        
+        return config
+    except Exception as e:
+        current_app.logger.error(f"Error resolving Ollama settings: {e}")
+        return None
+
+
+# Admission priorities, lower is served first
+PRIORITY_INTERACTIVE = 0  # coach chat
+PRIORITY_VISION = 1  # photo analysis
+PRIORITY_BACKGROUND = 2  # warm-up, memory summaries
+
+_PRIORITY_NAMES = {PRIORITY_INTERACTIVE: 'interactive', PRIORITY_VISION: 'vision', PRIORITY_BACKGROUND: 'background'}
+
+
+class OllamaBusyError(Exception):
+    """Raised when an Ollama host's admission queue is full or the wait timed out"""
+    
+    def __init__(self, base_url: str, retry_after: int):
+        super().__init__(f"Ollama at {base_url} is busy, retry after {retry_after}s")
+        self.base_url = base_url
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Per-host concurrency limit with a bounded, priority-ordered wait queue"""
+    
+    def __init__(self, base_url: str, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.base_url = base_url
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiters = []  # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._avg_hold = 5.0  # seconds, moving average used for retry-after
+        self._stats = {'admitted': 0, 'rejected': 0, 'timed_out': 0, 'total_wait_ms': 0.0}
+    
+    def acquire(self, priority: int = PRIORITY_INTERACTIVE):
+        """Wait for a slot; raises OllamaBusyError if the queue is full or the wait times out"""
+        with self._cond:
+            if self._active < self.max_concurrent and not self._waiters:
+                self._active += 1
+                self._stats['admitted'] += 1
+                return
+            
+            if len(self._waiters) >= self.max_queue:
+                self._stats['rejected'] += 1
+                raise OllamaBusyError(self.base_url, self._retry_after())
+            
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiters, ticket)
+            started = time.monotonic()
+            
+            try:
+                while not (self._waiters[0] == ticket and self._active < self.max_concurrent):
+                    remaining = started + self.queue_timeout - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timed_out'] += 1
+                        raise OllamaBusyError(self.base_url, self._retry_after())
+                    self._cond.wait(remaining)
+            except BaseException:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+                raise
+            
+            heapq.heappop(self._waiters)
+            self._active += 1
+            self._stats['admitted'] += 1
+            self._stats['total_wait_ms'] += (time.monotonic() - started) * 1000
+            # Another slot may be free for the next waiter
+            self._cond.notify_all()
+    
+    def release(self, held_seconds: float = None):
+        with self._cond:
+            self._active -= 1
+            if held_seconds is not None:
+                self._avg_hold = 0.8 * self._avg_hold + 0.2 * held_seconds
+            self._cond.notify_all()
+    
+    @contextmanager
+    def slot(self, priority: int = PRIORITY_INTERACTIVE):
+        self.acquire(priority)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+    
+    def _retry_after(self) -> int:
+        # Time for the queue ahead to drain at the observed hold time
+        return max(1, math.ceil(self._avg_hold * (len(self._waiters) + 1) / self.max_concurrent))
+    
+    def stats(self) -> Dict:
+        with self._cond:
+            queued = {name: 0 for name in _PRIORITY_NAMES.values()}
+            for priority, _ in self._waiters:
+                queued[_PRIORITY_NAMES.get(priority, str(priority))] += 1
+            
+            stats = dict(self._stats)
+            admitted = stats.pop('total_wait_ms')
+            stats.update({
+                'active': self._active,
+                'max_concurrent': self.max_concurrent,
+                'queue_depth': len(self._waiters),
+                'max_queue': self.max_queue,
+                'queued': queued,
+                'avg_wait_ms': round(admitted / stats['admitted'], 1) if stats['admitted'] else 0.0,
+                'retry_after': self._retry_after()
+            })
+            return stats
+
+
+_admission_controllers = {}
+_pull_controllers = {}
+_admission_lock = threading.Lock()
+
+
+def _get_controller(controllers: Dict, base_url: str, max_concurrent: int) -> AdmissionController:
+    key = (base_url or '').rstrip('/').lower()
+    with _admission_lock:
+        controller = controllers.get(key)
+        if controller is None:
+            config = current_app.config
+            controller = AdmissionController(
+                key,
+                max_concurrent=max_concurrent,
+                max_queue=config.get('OLLAMA_QUEUE_MAX', 16),
+                queue_timeout=config.get('OLLAMA_QUEUE_TIMEOUT', 30)
+            )
+            controllers[key] = controller
+    return controller
+
+
+def get_admission_controller(base_url: str) -> AdmissionController:
+    """The shared admission controller for an Ollama host's generation requests"""
+    return _get_controller(_admission_controllers, base_url, current_app.config.get('OLLAMA_MAX_CONCURRENT', 2))
+
+
+def get_pull_controller(base_url: str) -> AdmissionController:
+    """The host's limit on concurrent model pulls.
+    
+    Pulls are downloads that run for minutes, so they are kept apart from the
+    generation slots rather than holding one of them.
+    """
+    return _get_controller(_pull_controllers, base_url, current_app.config.get('OLLAMA_PULL_MAX_CONCURRENT', 1))
+
+
+def admission_stats() -> Dict[str, Dict]:
+    """Queue depth and admission counters per host, for monitoring"""
+    with _admission_lock:
+        controllers = dict(_admission_controllers)
+    return {key: controller.stats() for key, controller in controllers.items()}
+
+
+def pull_stats() -> Dict[str, Dict]:
+    """Running and queued model pulls per host, for monitoring"""
+    with _admission_lock:
+        controllers = dict(_pull_controllers)
+    return {key: controller.stats() for key, controller in controllers.items()}
+
+
+class _ReleasingStream:
+    """Iterator that calls release() once it is exhausted, closed or collected.
+    
+    Used to hold an admission slot (or a pool's outstanding count) for the
+    lifetime of a streamed response.
+    """
+    
+    def __init__(self, chunks: Iterator[str], release: Callable[[], None]):
+        self._chunks = chunks
+        self._release = release
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self) -> str:
+        try:
+            return next(self._chunks)
+        except BaseException:
+            self.close()
+            raise
+    
+    def close(self):
+        release, self._release = self._release, None
+        if release is not None:
+            try:
+                self._chunks.close()
+            finally:
+                release()
+    
+    def __del__(self):
+        self.close()
+
+
+def _error_stream(error: Exception) -> Generator[str, None, None]:
+    """Reply stream for a request that never reached the host"""
+    yield f"Error communicating with AI: {str(error)}"
 
 
 class OllamaClient:
     def __init__(self, base_url: str = None):
         self.base_url = base_url or current_app.config.get('OLLAMA_URL', 'http://localhost:11434')
+        # Shared keep-alive session; clients are cheap to rebuild per request
+        self.session = get_session(self.base_url)
+        # Called with (base_url, error) when the host cannot be reached; set by OllamaPool
+        self.on_host_error: Optional[Callable[[str, Exception], None]] = None
     
     @classmethod
     def from_user_settings(cls, user_id: int = None):
-        """Create OllamaClient using the user's saved settings, fallback to admin settings"""
-        try:
-            if user_id is None and current_user and current_user.is_authenticated:
-                user_id = current_user.id
-            
-            from models import Settings, User
-            
-            # Try to get current user's settings first
-            if user_id:
-                settings = Settings.query.filter_by(user_id=user_id).first()
-                if settings and settings.ollama_url:
-                    ollama_url = settings.ollama_url
-                    # Only auto-correct localhost URLs in Docker environment
-                    if ollama_url == 'http://localhost:11434' and current_app.config.get('FLASK_ENV') == 'production':
-                        ollama_url = 'http://host.docker.internal:11434'
-                        current_app.logger.info(f"Auto-correcting localhost to host.docker.internal for Docker environment")
-                    return cls(ollama_url)
-            
-            # Fallback to admin user settings
-            admin_user = User.query.filter_by(is_admin=True).first()
-            if admin_user:
-                admin_settings = Settings.query.filter_by(user_id=admin_user.id).first()
-                if admin_settings and admin_settings.ollama_url:
-                    ollama_url = admin_settings.ollama_url
-                    # Only auto-correct localhost URLs in Docker environment
-                    if ollama_url == 'http://localhost:11434' and current_app.config.get('FLASK_ENV') == 'production':
-                        ollama_url = 'http://host.docker.internal:11434'
-                        current_app.logger.info(f"Using admin settings with auto-corrected URL for Docker environment")
-                    return cls(ollama_url)
-            
-            # Final fallback to config default
-            default_url = current_app.config.get('OLLAMA_URL', 'http://host.docker.internal:11434')
-            return cls(default_url)
-        except Exception:
-            # Final fallback if anything goes wrong
-            default_url = current_app.config.get('OLLAMA_URL', 'http://host.docker.internal:11434')
-            return cls(default_url)
+        """Create OllamaClient using the user's saved settings, fallback to admin settings.
+        
+        When an Ollama pool is configured and applies to this user, a
+        pool-backed client is returned instead; it has the same interface.
+        """
+        from services.ollama_pool import OllamaPool, PooledOllamaClient
+        
+        config = cls.resolve_user_config(user_id)
+        pool = OllamaPool.get_configured()
+        if pool and pool.applies_to(config):
+            return PooledOllamaClient(pool)
+        return cls(config['ollama_url'])
     
     @staticmethod
     def get_user_models(user_id: int = None):
         """Get user's saved chat and vision models, fallback to admin settings"""
+        config = OllamaClient.resolve_user_config(user_id)
+        return {
+            'chat_model': config['chat_model'],
+            'vision_model': config['vision_model'],
+            'system_prompt': config['system_prompt']
+        }
+    
+    @staticmethod
+    def resolve_user_config(user_id: int = None) -> Dict:
+        """Resolve the user's Ollama URL and models in one lookup.
+        
+        Results are memoized for the current request/app context and for
+        OLLAMA_CONFIG_CACHE_TTL seconds per user; saving settings should call
+        invalidate_user_config().
+        """
+        if user_id is None and current_user and current_user.is_authenticated:
+            user_id = current_user.id
+        
+        request_cache = g.setdefault('_ollama_user_config', {})
+        if user_id in request_cache:
+            return request_cache[user_id]
+        
+        with _user_config_lock:
+            entry = _user_config_cache.get(user_id)
+        if entry and entry[0] > time.monotonic():
+            config = entry[1]
+        else:
+            config = _load_user_config(user_id)
+            if config is not None:
+                ttl = current_app.config.get('OLLAMA_CONFIG_CACHE_TTL', 60)
+                with _user_config_lock:
+                    _user_config_cache[user_id] = (time.monotonic() + ttl, config)
+            else:
+                config = _default_user_config()
+        
+        request_cache[user_id] = config
+        return config
+    
+    @staticmethod
+    def invalidate_user_config(user_id: int = None):
+        """Drop cached settings for one user, or for everyone when user_id is None.
+        
+        Clear everyone after changes to admin users or admin settings, since
+        they are the fallback for users without their own settings.
+        """
+        with _user_config_lock:
+            if user_id is None:
+                _user_config_cache.clear()
+            else:
+                _user_config_cache.pop(user_id, None)
+        
+        if has_app_context():
+            request_cache = g.get('_ollama_user_config')
+            if request_cache:
+                if user_id is None:
+                    request_cache.clear()
+                else:
+                    request_cache.pop(user_id, None)
+    
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send over the pooled session, reporting connection failures to on_host_error"""
         try:
-            if user_id is None and current_user and current_user.is_authenticated:
-                user_id = current_user.id
-            
-            from models import Settings, User
-            
-            # Try to get current user's settings first
-            if user_id:
-                settings = Settings.query.filter_by(user_id=user_id).first()
-                if settings and (settings.chat_model or settings.vision_model):
-                    return {
-                        'chat_model': settings.chat_model,
-                        'vision_model': settings.vision_model,
-                        'system_prompt': settings.system_prompt
-                    }
-            
-            # Fallback to admin user settings
-            admin_user = User.query.filter_by(is_admin=True).first()
-            if admin_user:
-                admin_settings = Settings.query.filter_by(user_id=admin_user.id).first()
-                if admin_settings:
-                    return {
-                        'chat_model': admin_settings.chat_model or current_app.config.get('DEFAULT_CHAT_MODEL', 'llama2'),
-                        'vision_model': admin_settings.vision_model or current_app.config.get('DEFAULT_VISION_MODEL', 'llava'),
-                        'system_prompt': admin_settings.system_prompt
-                    }
-            
-            # Final fallback to config defaults
-            return {
-                'chat_model': current_app.config.get('DEFAULT_CHAT_MODEL', 'llama2'),
-                'vision_model': current_app.config.get('DEFAULT_VISION_MODEL', 'llava'),
-                'system_prompt': None
-            }
-        except Exception:
-            # Final fallback if anything goes wrong
-            return {
-                'chat_model': current_app.config.get('DEFAULT_CHAT_MODEL', 'llama2'),
-                'vision_model': current_app.config.get('DEFAULT_VISION_MODEL', 'llava'),
-                'system_prompt': None
-            }
+            return self.session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if self.on_host_error:
+                self.on_host_error(self.base_url, e)
+            raise
+    
+    def is_available(self) -> bool:
+        """Cached health of this client's host (see OllamaHealth)"""
+        from services.ollama_health import OllamaHealth
+        return OllamaHealth.is_available(self.base_url)
     
-    def _make_request(self, endpoint: str, method: str = 'GET', data: dict = None, timeout: int = 180) -> requests.Response:
+    def _make_request(self, endpoint: str, method: str = 'GET', data: dict = None, timeout: float = None) -> requests.Response:
+        """Send a request over the pooled session; timeout is the read timeout in seconds"""
         url = f"{self.base_url.rstrip('/')}/{endpoint.lstrip('/')}"
         
         if method == 'GET':
-            response = requests.get(url, timeout=timeout)
+            response = self._send('GET', url, timeout=get_timeout(timeout))
         elif method == 'POST':
-            headers = {'Content-Type': 'application/json'}
-            response = requests.post(url, json=data, headers=headers, timeout=timeout)
+            response = self._send('POST', url, json=data, timeout=get_timeout(timeout))
         else:
             raise ValueError(f"Unsupported method: {method}")
         
@@ -115,59 +411,260 @@ class OllamaClient:
         except Exception:
             return False
     
-    def list_models(self) -> List[Dict]:
+    def list_models(self, refresh: bool = False) -> List[Dict]:
+        """List models on the server, cached per base URL.
+        
+        Fresh entries (OLLAMA_MODELS_CACHE_TTL) are returned as is; stale ones
+        are returned immediately while a background refresh runs. Only a cold
+        cache or refresh=True waits on Ollama.
+        """
+        key = self.base_url.rstrip('/').lower()
+        
+        if not refresh:
+            with _model_cache_lock:
+                entry = _model_cache.get(key)
+            if entry:
+                fetched_at, models = entry
+                if time.monotonic() - fetched_at > current_app.config.get('OLLAMA_MODELS_CACHE_TTL', 300):
+                    self._revalidate_models(key)
+                return models
+        
+        models = self._fetch_models()
+        return models if models is not None else []
+    
+    def _fetch_models(self) -> Optional[List[Dict]]:
+        """Fetch /api/tags and cache the result; None if Ollama could not be reached"""
         try:
             response = self._make_request('api/tags')
             if response.status_code == 200:
                 data = response.json()
-                return data.get('models', [])
+                models = data.get('models', [])
+                OllamaClient.cache_models(self.base_url, models)
+                return models
             return []
         except Exception as e:
             current_app.logger.error(f"Error listing models: {e}")
-            return []
+            return None
+    
+    def _revalidate_models(self, key: str):
+        with _model_cache_lock:
+            if key in _model_refreshing:
+                return
+            _model_refreshing.add(key)
+        
+        app = current_app._get_current_object()
+        
+        def refresh():
+            try:
+                with app.app_context():
+                    OllamaClient(self.base_url)._fetch_models()
+            finally:
+                with _model_cache_lock:
+                    _model_refreshing.discard(key)
+        
+        threading.Thread(target=refresh, name='ollama-models-refresh', daemon=True).start()
+    
+    @staticmethod
+    def cache_models(base_url: str, models: List[Dict]):
+        """Record a model listing for base_url (also fed by the health prober)"""
+        with _model_cache_lock:
+            _model_cache[base_url.rstrip('/').lower()] = (time.monotonic(), models)
+    
+    @staticmethod
+    def invalidate_models(base_url: str):
+        with _model_cache_lock:
+            _model_cache.pop(base_url.rstrip('/').lower(), None)
+    
+    def model_capabilities(self, model: str) -> Optional[List[str]]:
+        """What a model supports (e.g. 'completion', 'tools', 'vision') per /api/show, cached.
+        
+        Cached per host and model like list_models: stale entries are returned
+        while a background refresh runs, so only a cold cache waits on Ollama.
+        None if Ollama could not be asked, or is too old to report capabilities.
+        """
+        key = (self.base_url.rstrip('/').lower(), model)
+        with _model_cache_lock:
+            entry = _capabilities_cache.get(key)
+        if entry:
+            fetched_at, capabilities = entry
+            if time.monotonic() - fetched_at > current_app.config.get('OLLAMA_MODELS_CACHE_TTL', 300):
+                self._revalidate_capabilities(key, model)
+            return capabilities
+        
+        return self._fetch_capabilities(key, model)
     
-    def pull_model(self, model_name: str) -> bool:
+    def _fetch_capabilities(self, key: Tuple[str, str], model: str) -> Optional[List[str]]:
+        """Fetch /api/show and cache the answer, including an Ollama too old to report capabilities"""
         try:
-            data = {'name': model_name}
-            response = self._make_request('api/pull', 'POST', data)
-            return response.status_code == 200
+            response = self._make_request('api/show', 'POST', {'model': model})
+            if response.status_code != 200:
+                return None
+            capabilities = response.json().get('capabilities')
+        except Exception as e:
+            current_app.logger.error(f"Error reading model capabilities: {e}")
+            return None
+        
+        with _model_cache_lock:
+            _capabilities_cache[key] = (time.monotonic(), capabilities)
+        return capabilities
+    
+    def _revalidate_capabilities(self, key: Tuple[str, str], model: str):
+        with _model_cache_lock:
+            if key in _capabilities_refreshing:
+                return
+            _capabilities_refreshing.add(key)
+        
+        app = current_app._get_current_object()
+        
+        def refresh():
+            try:
+                with app.app_context():
+                    OllamaClient(self.base_url)._fetch_capabilities(key, model)
+            finally:
+                with _model_cache_lock:
+                    _capabilities_refreshing.discard(key)
+        
+        threading.Thread(target=refresh, name='ollama-capabilities-refresh', daemon=True).start()
+    
+    def pull_hosts(self) -> List[str]:
+        """Hosts a model pull should go to"""
+        return [self.base_url]
+    
+    def pull_model(self, model_name: str, on_progress: Callable[[Dict], None] = None) -> bool:
+        """Pull a model, reading Ollama's streamed progress events.
+        
+        Pulls of large models take minutes, so this is meant to run on a
+        background worker (see services.model_pulls); on_progress is called
+        with each event ({'status', 'completed', 'total', ...}). The pull holds
+        one of the host's pull slots (OLLAMA_PULL_MAX_CONCURRENT) throughout,
+        not a generation slot, and raises OllamaBusyError if none frees up.
+        """
+        url = f"{self.base_url.rstrip('/')}/api/pull"
+        try:
+            with get_pull_controller(self.base_url).slot(PRIORITY_BACKGROUND):
+                return self._stream_pull(url, model_name, on_progress)
+        except OllamaBusyError:
+            raise
         except Exception as e:
             current_app.logger.error(f"Error pulling model {model_name}: {e}")
             return False
+        finally:
+            # The listing changed (or may have, if the pull failed part way)
+            OllamaClient.invalidate_models(self.base_url)
     
-    def chat(self, messages: List[Dict], model: str, system_prompt: str = None, stream: bool = False) -> Generator[str, None, None]:
-        try:
-            # Prepare the request data
-            data = {
-                'model': model,
-                'messages': messages,
-                'stream': stream
-            }
-            
-            if system_prompt:
-                # Add system message at the beginning
-                system_message = {'role': 'system', 'content': system_prompt}
-                data['messages'] = [system_message] + messages
-            
-            url = f"{self.base_url.rstrip('/')}/api/chat"
-            headers = {'Content-Type': 'application/json'}
-            
-            response = requests.post(url, json=data, headers=headers, stream=stream, timeout=180)
+    def _stream_pull(self, url: str, model_name: str, on_progress: Callable[[Dict], None] = None) -> bool:
+        """POST the pull and follow its progress events; True once Ollama reports success"""
+        response = self._send('POST', url, json={'name': model_name, 'stream': True},
+                              stream=True, timeout=get_timeout())
+        with response:
+            if response.status_code != 200:
+                current_app.logger.error(f"Pull of {model_name} returned {response.status_code}")
+                return False
             
+            succeeded = False
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                try:
+                    event = json.loads(line.decode('utf-8'))
+                except json.JSONDecodeError:
+                    continue
+                if event.get('error'):
+                    current_app.logger.error(f"Error pulling model {model_name}: {event['error']}")
+                    return False
+                if on_progress:
+                    on_progress(event)
+                succeeded = event.get('status') == 'success'
+            return succeeded
+    
+    def chat(self, messages: List[Dict], model: str, system_prompt: str = None, stream: bool = False,
+             priority: int = PRIORITY_INTERACTIVE, tools: List[Dict] = None,
+             on_tool_calls: Callable[[List[Dict]], None] = None) -> Iterator[str]:
+        """Chat with a model, yielding response text.
+        
+        The host admission slot is taken and the request sent at call time,
+        so a busy host raises OllamaBusyError here rather than mid-stream; the
+        slot is released when the returned iterator is exhausted or closed. An
+        unreachable host yields a single error message. With tools, any tool
+        calls the model makes are passed to on_tool_calls.
+        """
+        try:
+            return self._open_chat(messages, model, system_prompt, stream, priority, tools, on_tool_calls)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            current_app.logger.error(f"Error in chat: {e}")
+            return _error_stream(e)
+    
+    def _open_chat(self, messages: List[Dict], model: str, system_prompt: str = None, stream: bool = False,
+                   priority: int = PRIORITY_INTERACTIVE, tools: List[Dict] = None,
+                   on_tool_calls: Callable[[List[Dict]], None] = None) -> Iterator[str]:
+        """chat(), except that connection errors and timeouts are raised"""
+        data = {
+            'model': model,
+            'messages': messages,
+            'stream': stream
+        }
+        if tools:
+            data['tools'] = tools
+        _add_keep_alive(data)
+        
+        if system_prompt:
+            # Add system message at the beginning
+            system_message = {'role': 'system', 'content': system_prompt}
+            data['messages'] = [system_message] + messages
+        
+        url = f"{self.base_url.rstrip('/')}/api/chat"
+        return self._open_stream(url, data, stream, priority,
+                                 lambda response: self._chat(response, model, stream, on_tool_calls))
+    
+    def _open_stream(self, url: str, data: Dict, stream: bool, priority: int,
+                     read: Callable[[requests.Response], Iterator[str]]) -> Iterator[str]:
+        """Take an admission slot and POST data, returning read(response) holding the slot.
+        
+        The response is closed with the stream, even if reading never started.
+        """
+        controller = get_admission_controller(self.base_url)
+        controller.acquire(priority)
+        started = time.monotonic()
+        try:
+            response = self._send('POST', url, json=data, stream=stream, timeout=get_timeout())
+        except BaseException:
+            controller.release(time.monotonic() - started)
+            raise
+        
+        def release():
+            response.close()
+            controller.release(time.monotonic() - started)
+        
+        return _ReleasingStream(read(response), release)
+    
+    def _chat(self, response: requests.Response, model: str, stream: bool = False,
+              on_tool_calls: Callable[[List[Dict]], None] = None) -> Generator[str, None, None]:
+        try:
             if stream:
-                for line in response.iter_lines():
-                    if line:
-                        try:
-                            chunk = json.loads(line.decode('utf-8'))
-                            if 'message' in chunk and 'content' in chunk['message']:
+                # Closing returns the connection to the pool even if the consumer stops early
+                with response:
+                    if response.status_code != 200:
+                        yield f"Error: {response.status_code} - {response.text}"
+                        return
+                    for line in response.iter_lines():
+                        if line:
+                            try:
+                                chunk = json.loads(line.decode('utf-8'))
+                            except json.JSONDecodeError:
+                                continue
+                            if chunk.get('message', {}).get('content'):
                                 yield chunk['message']['content']
-                            elif chunk.get('done', False):
+                            if chunk.get('message', {}).get('tool_calls') and on_tool_calls:
+                                on_tool_calls(chunk['message']['tool_calls'])
+                            if chunk.get('done', False):
+                                record_timings(self.base_url, model, 'chat', chunk)
                                 break
-                        except json.JSONDecodeError:
-                            continue
             else:
                 if response.status_code == 200:
                     result = response.json()
+                    record_timings(self.base_url, model, 'chat', result)
+                    if result.get('message', {}).get('tool_calls') and on_tool_calls:
+                        on_tool_calls(result['message']['tool_calls'])
                     if 'message' in result and 'content' in result['message']:
                         yield result['message']['content']
                 else:
@@ -177,7 +674,100 @@ class OllamaClient:
             current_app.logger.error(f"Error in chat: {e}")
             yield f"Error communicating with AI: {str(e)}"
     
-    def vision_analyze(self, image_path: str, model: str, prompt: str = "Describe what food items you see in this image.") -> Optional[str]:
+    def generate(self, prompt: str, model: str, system_prompt: str = None, context: List[int] = None,
+                 on_done: Callable[[Dict], None] = None, priority: int = PRIORITY_INTERACTIVE) -> Iterator[str]:
+        """Stream a completion from /api/generate, continuing from a previous context.
+        
+        context is the token array Ollama returned for an earlier turn; with
+        it the server resumes the conversation without re-sending its text.
+        on_done receives the final response, whose 'context' continues this
+        turn. Admission and connection errors work as for chat().
+        """
+        try:
+            return self._open_generate(prompt, model, system_prompt, context, on_done, priority)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            current_app.logger.error(f"Error in generate: {e}")
+            return _error_stream(e)
+    
+    def _open_generate(self, prompt: str, model: str, system_prompt: str = None, context: List[int] = None,
+                       on_done: Callable[[Dict], None] = None,
+                       priority: int = PRIORITY_INTERACTIVE) -> Iterator[str]:
+        """generate(), except that connection errors and timeouts are raised"""
+        data = {'model': model, 'prompt': prompt, 'stream': True}
+        if system_prompt:
+            data['system'] = system_prompt
+        if context:
+            data['context'] = context
+        _add_keep_alive(data)
+        
+        url = f"{self.base_url.rstrip('/')}/api/generate"
+        kind = 'generate_context' if context else 'generate'
+        return self._open_stream(url, data, True, priority,
+                                 lambda response: self._generate(response, model, kind, on_done))
+    
+    def _generate(self, response: requests.Response, model: str, kind: str,
+                  on_done: Callable[[Dict], None] = None) -> Generator[str, None, None]:
+        try:
+            with response:
+                if response.status_code != 200:
+                    yield f"Error: {response.status_code} - {response.text}"
+                    return
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    try:
+                        chunk = json.loads(line.decode('utf-8'))
+                    except json.JSONDecodeError:
+                        continue
+                    if chunk.get('response'):
+                        yield chunk['response']
+                    if chunk.get('done', False):
+                        record_timings(self.base_url, model, kind, chunk)
+                        if on_done:
+                            on_done(chunk)
+                        break
+        
+        except Exception as e:
+            current_app.logger.error(f"Error in generate: {e}")
+            yield f"Error communicating with AI: {str(e)}"
+    
+    def complete(self, messages: List[Dict], model: str, system_prompt: str = None, max_tokens: int = None,
+                 priority: int = PRIORITY_BACKGROUND) -> Optional[str]:
+        """Non-streaming chat returning the whole reply, or None on failure.
+        
+        Raises OllamaBusyError if the host's admission queue is full.
+        """
+        with get_admission_controller(self.base_url).slot(priority):
+            return self._complete(messages, model, system_prompt, max_tokens)
+    
+    def _complete(self, messages: List[Dict], model: str, system_prompt: str = None, max_tokens: int = None) -> Optional[str]:
+        data = {
+            'model': model,
+            'messages': ([{'role': 'system', 'content': system_prompt}] if system_prompt else []) + messages,
+            'stream': False
+        }
+        if max_tokens:
+            data['options'] = {'num_predict': max_tokens}
+        _add_keep_alive(data)
+        
+        try:
+            response = self._make_request('api/chat', 'POST', data)
+            if response.status_code == 200:
+                result = response.json()
+                record_timings(self.base_url, model, 'complete', result)
+                return result.get('message', {}).get('content') or None
+            current_app.logger.warning(f"Chat completion returned {response.status_code}: {response.text}")
+        except Exception as e:
+            current_app.logger.error(f"Error in chat completion: {e}")
+        return None
+    
+    def vision_analyze(self, image_path: str, model: str, prompt: str = "Describe what food items you see in this image.",
+                       priority: int = PRIORITY_VISION) -> Optional[str]:
+        """Analyze an image; raises OllamaBusyError if the host's admission queue is full"""
+        with get_admission_controller(self.base_url).slot(priority):
+            return self._vision_analyze(image_path, model, prompt)
+    
+    def _vision_analyze(self, image_path: str, model: str, prompt: str) -> Optional[str]:
         try:
             # Read and encode the image
             with open(image_path, 'rb') as image_file:
@@ -200,13 +790,14 @@ class OllamaClient:
                 },
                 'stream': False
             }
+            _add_keep_alive(chat_payload)
 
             try:
                 chat_url = f"{self.base_url.rstrip('/')}/api/chat"
-                headers = {'Content-Type': 'application/json'}
-                response = requests.post(chat_url, json=chat_payload, headers=headers, timeout=180)
+                response = self._send('POST', chat_url, json=chat_payload, timeout=get_timeout())
                 if response.status_code == 200:
                     result = response.json()
+                    record_timings(self.base_url, model, 'vision', result)
                     if 'message' in result and 'content' in result['message']:
                         return result['message']['content']
                 else:
@@ -225,10 +816,12 @@ class OllamaClient:
                 },
                 'stream': False
             }
+            _add_keep_alive(generate_payload)
 
             response = self._make_request('api/generate', 'POST', generate_payload)
             if response.status_code == 200:
                 result = response.json()
+                record_timings(self.base_url, model, 'vision', result)
                 # Some servers return { response: "..." }
                 if isinstance(result, dict):
                     return result.get('response') or result.get('message', {}).get('content', '')
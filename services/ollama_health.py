@@ -0,0 +1,193 @@
+"""
+Ollama Health Service for NutriCoach
+Background prober that records status, latency and models for each Ollama host
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+import json
+import logging
+import threading
+import time
+
+import requests
+from apscheduler.triggers.interval import IntervalTrigger
+from flask import current_app
+
+from extensions import get_redis
+
+logger = logging.getLogger(__name__)
+
+_local_status = {}  # base_url -> status dict, used when Redis is not reachable
+_local_lock = threading.Lock()
+
+
+def has_model(available: List[str], model: str) -> bool:
+    """Whether a model name is in a host's model list ("llava" matches "llava:latest")"""
+    return any(name == model or name == f"{model}:latest" for name in available)
+
+
+class OllamaHealth:
+    """Cached Ollama host health; hot paths read it instead of probing"""
+
+    KEY_PREFIX = 'nutricoach:ollama:health:'
+
+    @staticmethod
+    def _key(base_url: str) -> str:
+        return f"{OllamaHealth.KEY_PREFIX}{(base_url or '').rstrip('/').lower()}"
+
+    @staticmethod
+    def _max_age() -> float:
+        # A few missed probe intervals and the entry is no longer trusted
+        return current_app.config.get('OLLAMA_HEALTH_INTERVAL', 30) * 3
+
+    @staticmethod
+    def get_status(base_url: str) -> Optional[Dict]:
+        """Last recorded status for a host, or None if unknown or too old"""
+        status = None
+        key = OllamaHealth._key(base_url)
+
+        redis = get_redis()
+        if redis is not None:
+            try:
+                payload = redis.get(key)
+                status = json.loads(payload) if payload else None
+            except Exception as e:
+                logger.debug(f"Ollama health Redis read failed: {e}")
+
+        if status is None:
+            with _local_lock:
+                status = _local_status.get(key)
+
+        if status and time.time() - status['checked_at_ts'] > OllamaHealth._max_age():
+            return None
+        return status
+
+    @staticmethod
+    def is_available(base_url: str) -> bool:
+        """Cached availability; only probes when nothing is recorded yet.
+
+        The probe is a single attempt bounded by OLLAMA_HEALTH_TIMEOUT, so a
+        down host costs at most that long, never the pooled session's retries.
+        """
+        status = OllamaHealth.get_status(base_url)
+        if status is None:
+            status = OllamaHealth.probe(base_url)
+        return status['available']
+
+    @staticmethod
+    def probe(base_url: str) -> Dict:
+        """Probe a host now and record the result.
+
+        Uses a plain request rather than the pooled session, whose connect
+        retries and backoff would stretch a probe of a down host.
+        """
+        from services.ollama_client import OllamaClient
+
+        started = time.monotonic()
+        status = {
+            'base_url': base_url,
+            'available': False,
+            'latency_ms': None,
+            'models': [],
+            'error': None
+        }
+
+        try:
+            timeout = current_app.config.get('OLLAMA_HEALTH_TIMEOUT', 3)
+            response = requests.get(f"{base_url.rstrip('/')}/api/tags", timeout=(timeout, timeout))
+            status['latency_ms'] = round((time.monotonic() - started) * 1000, 1)
+            if response.status_code == 200:
+                models = response.json().get('models', [])
+                status['available'] = True
+                status['models'] = [model.get('name') for model in models]
+                # Keeps the model listing cache warm for the settings pages
+                OllamaClient.cache_models(base_url, models)
+            else:
+                status['error'] = f"HTTP {response.status_code}"
+        except Exception as e:
+            status['error'] = str(e)
+
+        status['checked_at'] = datetime.utcnow().isoformat()
+        status['checked_at_ts'] = time.time()
+        OllamaHealth._store(base_url, status)
+        return status
+
+    @staticmethod
+    def _store(base_url: str, status: Dict):
+        key = OllamaHealth._key(base_url)
+        with _local_lock:
+            _local_status[key] = status
+
+        redis = get_redis()
+        if redis is not None:
+            try:
+                redis.set(key, json.dumps(status), ex=int(OllamaHealth._max_age()))
+            except Exception as e:
+                logger.debug(f"Ollama health Redis write failed: {e}")
+
+    @staticmethod
+    def configured_hosts() -> List[str]:
+        """Every Ollama URL in use: user settings, the admin global setting, the pool and the config default"""
+        from models import Settings, GlobalSettings
+        from services.ollama_client import _docker_url
+        from services.ollama_pool import OllamaPool
+
+        hosts = [current_app.config.get('OLLAMA_URL', 'http://localhost:11434')]
+        try:
+            global_url = GlobalSettings.query.filter_by(key='ollama_url').first()
+            if global_url and global_url.get_value():
+                hosts.append(global_url.get_value())
+
+            rows = Settings.query.with_entities(Settings.ollama_url).filter(
+                Settings.ollama_url.isnot(None)
+            ).distinct().all()
+            hosts.extend(_docker_url(url) for url, in rows if url)
+
+            pool = OllamaPool.get_configured()
+            if pool:
+                hosts.extend(pool.hosts)
+        except Exception as e:
+            logger.error(f"Error listing Ollama hosts: {e}")
+
+        unique = {}
+        for host in hosts:
+            unique.setdefault(host.rstrip('/').lower(), host)
+        return list(unique.values())
+
+    @staticmethod
+    def probe_all() -> List[Dict]:
+        """Probe every configured host"""
+        return [OllamaHealth.probe(host) for host in OllamaHealth.configured_hosts()]
+
+
+def _probe_job(app):
+    """Background job: refresh the health of every configured host"""
+    with app.app_context():
+        try:
+            statuses = OllamaHealth.probe_all()
+            down = [s['base_url'] for s in statuses if not s['available']]
+            if down:
+                logger.info(f"Ollama hosts unavailable: {', '.join(down)}")
+        except Exception as e:
+            logger.error(f"Ollama health probe failed: {e}")
+
+
+def init_ollama_health_prober(app, app_scheduler):
+    """Schedule the periodic Ollama health probe"""
+    if not app.config.get('OLLAMA_HEALTH_PROBE_ENABLED', True):
+        return
+
+    try:
+        app_scheduler.add_job(
+            func=_probe_job,
+            args=[app],
+            trigger=IntervalTrigger(seconds=app.config.get('OLLAMA_HEALTH_INTERVAL', 30)),
+            next_run_time=datetime.now(),
+            id='ollama_health_probe',
+            name='Probe Ollama Hosts',
+            replace_existing=True
+        )
+        logger.info("Ollama health prober scheduled")
+    except Exception as e:
+        logger.error(f"Failed to schedule Ollama health prober: {e}")
@@ -0,0 +1,69 @@
+"""
+Ollama Metrics for NutriCoach
+Prompt-eval (prefill) vs. eval (generation) timings reported by Ollama, per host,
+model and request kind, so prompt-cache savings can be measured
+"""
+
+from typing import Dict, List
+import threading
+
+# (host, model, kind) -> counters
+_timings = {}
+_timings_lock = threading.Lock()
+
+_NS_PER_MS = 1_000_000
+
+
+def record_timings(base_url: str, model: str, kind: str, result: Dict):
+    """Add the timing fields of a finished Ollama response (the final chunk when streaming)"""
+    if not isinstance(result, dict) or 'eval_count' not in result and 'prompt_eval_count' not in result:
+        return
+
+    key = ((base_url or '').rstrip('/').lower(), model or '', kind)
+    with _timings_lock:
+        counters = _timings.setdefault(key, {
+            'requests': 0,
+            'prompt_tokens': 0,
+            'prompt_eval_ms': 0.0,
+            'eval_tokens': 0,
+            'eval_ms': 0.0,
+            'load_ms': 0.0
+        })
+        counters['requests'] += 1
+        # prompt_eval_count only counts tokens Ollama actually evaluated, so cache hits show up as fewer
+        counters['prompt_tokens'] += result.get('prompt_eval_count') or 0
+        counters['prompt_eval_ms'] += (result.get('prompt_eval_duration') or 0) / _NS_PER_MS
+        counters['eval_tokens'] += result.get('eval_count') or 0
+        counters['eval_ms'] += (result.get('eval_duration') or 0) / _NS_PER_MS
+        counters['load_ms'] += (result.get('load_duration') or 0) / _NS_PER_MS
+
+
+def timing_stats() -> List[Dict]:
+    """Totals and per-request averages for each (host, model, kind), for monitoring"""
+    with _timings_lock:
+        timings = {key: dict(counters) for key, counters in _timings.items()}
+
+    stats = []
+    for (host, model, kind), counters in sorted(timings.items()):
+        requests = counters['requests']
+        stats.append({
+            'host': host,
+            'model': model,
+            'kind': kind,
+            **{name: round(value, 1) if isinstance(value, float) else value for name, value in counters.items()},
+            'avg_prompt_tokens': round(counters['prompt_tokens'] / requests, 1),
+            'avg_prompt_eval_ms': round(counters['prompt_eval_ms'] / requests, 1),
+            'avg_eval_ms': round(counters['eval_ms'] / requests, 1),
+            'prompt_tokens_per_second': _rate(counters['prompt_tokens'], counters['prompt_eval_ms']),
+            'eval_tokens_per_second': _rate(counters['eval_tokens'], counters['eval_ms'])
+        })
+    return stats
+
+
+def reset_timings():
+    with _timings_lock:
+        _timings.clear()
+
+
+def _rate(tokens: int, ms: float) -> float:
+    return round(tokens * 1000 / ms, 1) if ms else 0.0
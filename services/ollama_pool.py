@@ -0,0 +1,328 @@
+"""
+Ollama Pool Service for NutriCoach
+Routes requests across several Ollama hosts: least outstanding requests first,
+only hosts that have the model, and a cooldown for hosts that stop answering
+"""
+
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+import logging
+import threading
+import time
+
+import requests
+from flask import current_app
+
+from services.ollama_client import (
+    OllamaClient, OllamaBusyError, _ReleasingStream, _docker_url, _error_stream,
+    PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, PRIORITY_VISION
+)
+from services.ollama_health import OllamaHealth, has_model
+
+logger = logging.getLogger(__name__)
+
+POOL_SETTING_KEY = 'ollama_pool'
+
+# normalized host -> counters; shared by every pool instance and thread
+_host_state: Dict[str, Dict] = {}
+_state_lock = threading.Lock()
+
+# (expires_at, OllamaPool or None); see OllamaPool.get_configured
+_configured = None
+_configured_lock = threading.Lock()
+
+
+def _normalize(base_url: str) -> str:
+    return (base_url or '').rstrip('/').lower()
+
+
+def parse_hosts(value) -> List[str]:
+    """Host list from a GlobalSettings value: a JSON list, or comma/newline separated URLs"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.replace(',', '\n').splitlines()
+
+    hosts = {}
+    for url in value:
+        url = str(url).strip()
+        if url:
+            hosts.setdefault(_normalize(url), _docker_url(url))
+    return list(hosts.values())
+
+
+class OllamaPool:
+    """A set of interchangeable Ollama hosts"""
+
+    def __init__(self, hosts: List[str]):
+        self.hosts = hosts
+
+    @staticmethod
+    def get_configured() -> Optional['OllamaPool']:
+        """Pool from the 'ollama_pool' global setting, cached for OLLAMA_CONFIG_CACHE_TTL; None if unset"""
+        global _configured
+        from models import GlobalSettings
+
+        with _configured_lock:
+            entry = _configured
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+
+        pool = None
+        try:
+            setting = GlobalSettings.query.filter_by(key=POOL_SETTING_KEY).first()
+            hosts = parse_hosts(setting.get_value()) if setting else []
+            pool = OllamaPool(hosts) if hosts else None
+        except Exception as e:
+            logger.error(f"Error loading Ollama pool: {e}")
+
+        with _configured_lock:
+            _configured = (time.monotonic() + current_app.config.get('OLLAMA_CONFIG_CACHE_TTL', 60), pool)
+        return pool
+
+    @staticmethod
+    def invalidate():
+        """Forget the cached pool; call after the 'ollama_pool' setting changes"""
+        global _configured
+        with _configured_lock:
+            _configured = None
+
+    def applies_to(self, config: Dict) -> bool:
+        """Whether a resolved user config (see OllamaClient.resolve_user_config) should use the pool.
+
+        Users on the admin or default URL, including the stock localhost URL
+        every new account is created with, or on one of the pool hosts are
+        served by the pool; a user who points at some other host keeps it.
+        """
+        if config.get('url_source') != 'user':
+            return True
+        shared = set(self.hosts) | {
+            'http://localhost:11434',
+            'http://host.docker.internal:11434',
+            current_app.config.get('OLLAMA_URL', '')
+        }
+        return _normalize(config.get('ollama_url')) in {_normalize(host) for host in shared}
+
+    def candidates(self, model: str = None) -> List[str]:
+        """Usable hosts, least outstanding requests first.
+
+        Hosts cooling down or reported down by the health prober are skipped,
+        and when the prober knows which hosts have the model only those are
+        used. If that leaves nothing, every host is tried rather than none.
+        """
+        now = time.monotonic()
+        with _state_lock:
+            state = {host: dict(_state(host)) for host in self.hosts}
+
+        usable = []
+        with_model = []
+        for host in self.hosts:
+            if state[host]['cooldown_until'] > now:
+                continue
+            status = OllamaHealth.get_status(host)
+            if status is not None and not status['available']:
+                continue
+            usable.append(host)
+            if model and status is not None and has_model(status['models'], model):
+                with_model.append(host)
+
+        hosts = with_model or usable or list(self.hosts)
+        # Ties go to the host that has served less, which spreads idle traffic
+        return sorted(hosts, key=lambda host: (state[host]['outstanding'], state[host]['requests']))
+
+    def pick(self, model: str = None) -> str:
+        return self.candidates(model)[0]
+
+    def begin(self, host: str):
+        with _state_lock:
+            state = _state(host)
+            state['outstanding'] += 1
+            state['requests'] += 1
+
+    def end(self, host: str):
+        with _state_lock:
+            state = _state(host)
+            state['outstanding'] = max(0, state['outstanding'] - 1)
+
+    @contextmanager
+    def track(self, host: str):
+        """Count a request against host for as long as the block runs"""
+        self.begin(host)
+        try:
+            yield
+        finally:
+            self.end(host)
+
+    def in_cooldown(self, host: str) -> bool:
+        with _state_lock:
+            return _state(host)['cooldown_until'] > time.monotonic()
+
+    def mark_failed(self, host: str, error: Exception = None):
+        """Take a host out of rotation for OLLAMA_POOL_COOLDOWN seconds"""
+        cooldown = current_app.config.get('OLLAMA_POOL_COOLDOWN', 30)
+        with _state_lock:
+            state = _state(host)
+            state['failures'] += 1
+            state['cooldown_until'] = time.monotonic() + cooldown
+        logger.warning(f"Ollama host {host} failed, cooling down for {cooldown}s: {error}")
+
+    def stats(self) -> Dict[str, Dict]:
+        """Routing counters per host, for monitoring"""
+        now = time.monotonic()
+        stats = {}
+        for host in self.hosts:
+            with _state_lock:
+                state = dict(_state(host))
+            status = OllamaHealth.get_status(host)
+            stats[host] = {
+                'outstanding': state['outstanding'],
+                'requests': state['requests'],
+                'failures': state['failures'],
+                'cooldown_remaining': round(max(0.0, state['cooldown_until'] - now), 1),
+                'available': status['available'] if status else None,
+                'models': status['models'] if status else None
+            }
+        return stats
+
+
+def _state(host: str) -> Dict:
+    # Callers hold _state_lock
+    return _host_state.setdefault(_normalize(host), {
+        'outstanding': 0,
+        'requests': 0,
+        'failures': 0,
+        'cooldown_until': 0.0
+    })
+
+
+class PooledOllamaClient(OllamaClient):
+    """OllamaClient that sends each request to a host chosen by an OllamaPool"""
+
+    def __init__(self, pool: OllamaPool):
+        # base_url is where the pool would route right now; each request still picks its own host
+        super().__init__(pool.pick())
+        self.pool = pool
+        self.on_host_error = pool.mark_failed
+
+    def _client(self, host: str) -> OllamaClient:
+        client = OllamaClient(host)
+        client.on_host_error = self.pool.mark_failed
+        return client
+
+    def _available_hosts(self) -> List[str]:
+        return [host for host in self.pool.hosts
+                if not self.pool.in_cooldown(host) and OllamaHealth.is_available(host)]
+
+    def is_available(self) -> bool:
+        return bool(self._available_hosts())
+
+    def _make_request(self, endpoint: str, method: str = 'GET', data: dict = None, timeout: float = None):
+        host = self.pool.pick(data.get('model') if data else None)
+        with self.pool.track(host):
+            return self._client(host)._make_request(endpoint, method, data, timeout)
+
+    def test_connection(self) -> bool:
+        return any(self._client(host).test_connection() for host in self.pool.hosts)
+
+    def list_models(self, refresh: bool = False) -> List[Dict]:
+        """Models available on any reachable host"""
+        models = {}
+        for host in self._available_hosts():
+            for model in self._client(host).list_models(refresh):
+                models.setdefault(model.get('name'), model)
+        return list(models.values())
+
+    def model_capabilities(self, model: str) -> Optional[List[str]]:
+        return self._client(self.pool.pick(model)).model_capabilities(model)
+
+    def pull_hosts(self) -> List[str]:
+        """Every reachable host, so the model is available wherever requests are routed"""
+        return self._available_hosts()
+
+    def pull_model(self, model_name: str, on_progress=None) -> bool:
+        """Pull onto every reachable host; True if at least one host has it afterwards"""
+        pulled = False
+        for host in self.pull_hosts():
+            pulled = self._client(host).pull_model(model_name, on_progress) or pulled
+        return pulled
+
+    def _open_on_pool(self, model: str, open_stream: Callable[[OllamaClient], Iterator[str]]) -> Iterator[str]:
+        """Start a stream on the first candidate host that admits and answers it.
+        
+        A busy host hands over to the next one, as does an unreachable one,
+        which is also put in cooldown. If every host is busy OllamaBusyError
+        is raised; if none could be reached the stream is an error message.
+        """
+        busy = None
+        error = None
+        for host in self.pool.candidates(model):
+            self.pool.begin(host)
+            try:
+                chunks = open_stream(self._client(host))
+            except OllamaBusyError as e:
+                self.pool.end(host)
+                busy = e
+                continue
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # on_host_error has already put the host in cooldown
+                self.pool.end(host)
+                error = e
+                continue
+            return _ReleasingStream(chunks, lambda host=host: self.pool.end(host))
+        if busy:
+            raise busy
+        logger.error(f"No Ollama host in the pool could be reached: {error}")
+        return _error_stream(error)
+
+    def chat(self, messages: List[Dict], model: str, system_prompt: str = None, stream: bool = False,
+             priority: int = PRIORITY_INTERACTIVE, tools: List[Dict] = None, on_tool_calls=None) -> Iterator[str]:
+        """Chat on the least loaded host with the model, failing over when a host is busy or unreachable"""
+        return self._open_on_pool(model, lambda client: client._open_chat(
+            messages, model, system_prompt, stream, priority, tools, on_tool_calls))
+
+    def generate(self, prompt: str, model: str, system_prompt: str = None, context: List[int] = None,
+                 on_done=None, priority: int = PRIORITY_INTERACTIVE) -> Iterator[str]:
+        """Generate on the least loaded host with the model, failing over when a host is busy or unreachable.
+        
+        Context arrays are model tokens, so they stay valid on any host with the
+        same model; only the server-side cache of that host is lost.
+        """
+        return self._open_on_pool(model, lambda client: client._open_generate(
+            prompt, model, system_prompt, context, on_done, priority))
+
+    def complete(self, messages: List[Dict], model: str, system_prompt: str = None, max_tokens: int = None,
+                 priority: int = PRIORITY_BACKGROUND) -> Optional[str]:
+        """Complete on the least loaded host with the model, failing over when a host is busy or unreachable"""
+        busy = None
+        for host in self.pool.candidates(model):
+            try:
+                with self.pool.track(host):
+                    result = self._client(host).complete(messages, model, system_prompt, max_tokens, priority)
+            except OllamaBusyError as e:
+                busy = e
+                continue
+            if result is None and self.pool.in_cooldown(host):
+                continue
+            return result
+        if busy:
+            raise busy
+        return None
+
+    def vision_analyze(self, image_path: str, model: str, prompt: str = "Describe what food items you see in this image.",
+                       priority: int = PRIORITY_VISION) -> Optional[str]:
+        """Analyze on the least loaded host with the model, failing over when a host is busy or unreachable"""
+        busy = None
+        for host in self.pool.candidates(model):
+            try:
+                with self.pool.track(host):
+                    result = self._client(host).vision_analyze(image_path, model, prompt, priority)
+            except OllamaBusyError as e:
+                busy = e
+                continue
+            if result is None and self.pool.in_cooldown(host):
+                # The host dropped during the request; analysis is safe to repeat elsewhere
+                continue
+            return result
+        if busy:
+            raise busy
+        return None
@@ -0,0 +1,144 @@
+"""
+Photo Analysis Jobs for NutriCoach
+Runs photo analysis on a background worker and tracks its status in Photo.analysis
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+import logging
+import threading
+
+from flask import current_app
+
+from models import Photo
+from extensions import db
+from services.notification_service import ActionNotificationService
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = 'pending'
+STATUS_PROCESSING = 'processing'
+STATUS_COMPLETE = 'complete'
+STATUS_FAILED = 'failed'
+
+# Process-wide pool for analysis jobs, sized from config on first use
+_job_executor = None
+_job_executor_lock = threading.Lock()
+
+
+def _get_job_executor() -> ThreadPoolExecutor:
+    global _job_executor
+
+    with _job_executor_lock:
+        if _job_executor is None:
+            _job_executor = ThreadPoolExecutor(
+                max_workers=current_app.config.get('PHOTO_ANALYSIS_WORKERS', 2),
+                thread_name_prefix='photo-analysis'
+            )
+    return _job_executor
+
+
+class PhotoAnalysisJobs:
+    """Queue photo analysis off the request thread; the photo id is the job id"""
+
+    @staticmethod
+    def submit(photo: Photo, analyze: Callable) -> Future:
+        """Mark the photo pending and run analyze(filepath, photo_id, user_id) in the background"""
+        _set_status(photo, STATUS_PENDING)
+        db.session.commit()
+
+        app = current_app._get_current_object()
+        return _get_job_executor().submit(_run_job, app, photo.id, photo.user_id, photo.filepath, analyze)
+
+    @staticmethod
+    def get_status(photo: Photo) -> Dict:
+        """Status payload for a photo; jobs lost to a restart are reported as failed"""
+        analysis = photo.get_analysis()
+        status = analysis.get('status')
+
+        if status is None:
+            # Analysed before jobs existed, or synchronously
+            if 'candidates' in analysis:
+                status = STATUS_COMPLETE if analysis['candidates'] else STATUS_FAILED
+            else:
+                status = STATUS_PENDING
+
+        if status in (STATUS_PENDING, STATUS_PROCESSING):
+            timeout = timedelta(seconds=current_app.config.get('PHOTO_ANALYSIS_TIMEOUT', 600))
+            started_at = _parse_time(analysis.get('queued_at')) or photo.created_at
+            if started_at and started_at < datetime.utcnow() - timeout:
+                status = STATUS_FAILED
+                analysis.setdefault('meta', {})['warning'] = 'Photo analysis timed out'
+
+        meta = analysis.get('meta') or {}
+        body = {
+            'photo_id': photo.id,
+            'job_id': photo.id,
+            'status': status
+        }
+
+        if status == STATUS_COMPLETE:
+            body['candidates'] = analysis.get('candidates', [])
+            if meta.get('source'):
+                body['analysis_source'] = meta['source']
+        elif status == STATUS_FAILED:
+            body['error'] = 'Photo analysis failed'
+
+        if meta.get('warning'):
+            body['warning'] = meta['warning']
+        if meta.get('errors'):
+            body['errors'] = meta['errors']
+
+        return body
+
+
+def _set_status(photo: Photo, status: str, **fields):
+    analysis = photo.get_analysis()
+    analysis['status'] = status
+    if status == STATUS_PENDING:
+        analysis['queued_at'] = datetime.utcnow().isoformat()
+    analysis.update(fields)
+    photo.set_analysis(analysis)
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def _run_job(app, photo_id: int, user_id: int, filepath: str, analyze: Callable):
+    """Background job: analyze the photo, record the outcome and notify the user"""
+    with app.app_context():
+        try:
+            photo = Photo.query.get(photo_id)
+            if not photo:
+                return
+            _set_status(photo, STATUS_PROCESSING)
+            db.session.commit()
+
+            candidates, meta = analyze(filepath, photo_id, user_id)
+
+            # analyze() stores candidates/vision_items itself; only the outcome is added here
+            db.session.refresh(photo)
+            if candidates:
+                _set_status(photo, STATUS_COMPLETE, candidates=candidates, meta=meta)
+            else:
+                _set_status(photo, STATUS_FAILED, meta=meta)
+            db.session.commit()
+
+            if candidates:
+                ActionNotificationService.notify_photo_analyzed(user_id, photo_id, len(candidates))
+
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Photo analysis job {photo_id} failed: {e}")
+            try:
+                photo = Photo.query.get(photo_id)
+                if photo:
+                    _set_status(photo, STATUS_FAILED, meta={'source': None, 'warning': 'Unexpected error during analysis', 'errors': [str(e)]})
+                    db.session.commit()
+            except Exception:
+                db.session.rollback()
@@ -1,17 +1,104 @@
-from datetime import datetime, timedelta
-from sqlalchemy import func
-from models import Profile, FoodLog, WeighIn
+from datetime import date as date_type, datetime, timedelta
+from models import Profile, TargetHistory, WeighIn
 from extensions import db
-from typing import Dict, List, Optional
+from services.nutrition_rollup import FIELDS, NutritionRollup
+from services.request_memo import request_memo
+from services.time_window import day_bounds
+from typing import Dict, List, Optional, Tuple
+
+# Profile fields the daily targets are computed from
+TARGET_INPUTS = ('age', 'sex', 'height_cm', 'weight_kg', 'activity_level', 'goal_type')
+
+# Targets stored on TargetHistory
+TARGET_FIELDS = ('calories', 'protein_g', 'carbs_g', 'fat_g', 'bmr', 'tdee')
 
 
 class RecommendationService:
     
     @staticmethod
-    def calculate_daily_targets(user_id: int) -> Dict:
-        """Calculate daily calorie and macro targets for a user"""
-        profile = Profile.query.filter_by(user_id=user_id).first()
-        
+    @request_memo
+    def calculate_daily_targets(user_id: int, date: date_type = None) -> Dict:
+        """Daily calorie and macro targets in effect on date (today if omitted)"""
+        day = date or datetime.utcnow().date()
+        return RecommendationService.targets_by_day(user_id, day, day)[day]
+    
+    @staticmethod
+    @request_memo
+    def targets_by_day(user_id: int, start: date_type, end: date_type) -> Dict[date_type, Dict]:
+        """Targets in effect on each day from start to end (inclusive), from the target history.
+        
+        A day gets the last targets recorded before it ended; days before the
+        first entry get the first. Users without history (profiles created
+        before it existed) get targets computed from their profile.
+        """
+        _, until = day_bounds(start, end)
+        history = TargetHistory.query.filter(
+            TargetHistory.user_id == user_id,
+            TargetHistory.effective_from < until
+        ).order_by(TargetHistory.effective_from, TargetHistory.id).all()
+        
+        if not history:
+            first = TargetHistory.query.filter_by(user_id=user_id)\
+                .order_by(TargetHistory.effective_from, TargetHistory.id).first()
+            if first:
+                history = [first]
+        
+        fallback = None
+        if not history:
+            profile = Profile.query.filter_by(user_id=user_id).first()
+            fallback = RecommendationService.targets_for_profile(profile)
+        
+        targets = {}
+        index = 0
+        day = start
+        while day <= end:
+            if history:
+                _, day_end = day_bounds(day, day)
+                while index + 1 < len(history) and history[index + 1].effective_from < day_end:
+                    index += 1
+                targets[day] = history[index].to_dict()
+            else:
+                targets[day] = fallback
+            day += timedelta(days=1)
+        return targets
+    
+    @staticmethod
+    def target_inputs(profile: Profile) -> Tuple:
+        """The profile values the targets depend on, to detect when they change"""
+        return tuple(getattr(profile, field) for field in TARGET_INPUTS)
+    
+    @staticmethod
+    def record_targets(profile: Profile, effective_from: datetime = None) -> TargetHistory:
+        """Add the profile's current targets to the history; the caller commits.
+        
+        Call when a profile is created or one of TARGET_INPUTS changes. Nothing
+        is added when the targets equal the latest entry.
+        """
+        targets = RecommendationService.targets_for_profile(profile)
+        targets = {field: targets[field] for field in TARGET_FIELDS}
+        latest = TargetHistory.query.filter_by(user_id=profile.user_id)\
+            .order_by(TargetHistory.effective_from.desc(), TargetHistory.id.desc()).first()
+        if latest and latest.to_dict() == targets:
+            return latest
+        
+        entry = TargetHistory(user_id=profile.user_id, effective_from=effective_from or datetime.utcnow(), **targets)
+        db.session.add(entry)
+        return entry
+    
+    @staticmethod
+    def backfill_targets() -> int:
+        """Record targets for every profile without history, in effect from its creation; commits"""
+        profiles = Profile.query.filter(
+            ~Profile.user_id.in_(db.session.query(TargetHistory.user_id))
+        ).all()
+        for profile in profiles:
+            RecommendationService.record_targets(profile, profile.created_at)
+        db.session.commit()
+        return len(profiles)
+    
+    @staticmethod
+    def targets_for_profile(profile: Optional[Profile]) -> Dict:
+        """Daily calorie and macro targets for an already loaded profile"""
         if not profile:
             return {
                 'calories': 2000,
@@ -66,40 +153,33 @@ class RecommendationService:
         }
     
     @staticmethod
+    @request_memo
     def get_daily_summary(user_id: int, date: datetime = None) -> Dict:
         """Get daily nutrition summary for a user"""
+        # The targets in effect that day, not today's
+        targets = RecommendationService.calculate_daily_targets(user_id, date)
         if date is None:
             date = datetime.utcnow().date()
         
-        # Get food logs for the day
-        logs = FoodLog.query.filter(
-            FoodLog.user_id == user_id,
-            func.date(FoodLog.logged_at) == date
-        ).all()
-        
+        # The day's rollup rows, one per meal
+        meals = NutritionRollup.meal_totals(user_id, date, date)
+        return RecommendationService.build_daily_summary(date, meals, targets)
+    
+    @staticmethod
+    def build_daily_summary(date, meals: Dict[str, Dict[str, float]], targets: Dict) -> Dict:
+        """Daily summary from the day's totals per meal and the user's targets"""
         # Calculate totals
-        totals = {
-            'calories': sum(log.calories for log in logs),
-            'protein_g': sum(log.protein_g for log in logs),
-            'carbs_g': sum(log.carbs_g for log in logs),
-            'fat_g': sum(log.fat_g for log in logs),
-            'fiber_g': sum(log.fiber_g for log in logs),
-            'sugar_g': sum(log.sugar_g for log in logs),
-            'sodium_mg': sum(log.sodium_mg for log in logs),
-            'meal_breakdown': {}
-        }
+        totals = {field: sum(meal[field] for meal in meals.values()) for field in FIELDS}
+        totals['meal_breakdown'] = {}
         
         # Meal breakdown
         for meal in ['breakfast', 'lunch', 'dinner', 'snack']:
-            meal_logs = [log for log in logs if log.meal == meal]
+            meal_totals = meals.get(meal, {})
             totals['meal_breakdown'][meal] = {
-                'calories': sum(log.calories for log in meal_logs),
-                'count': len(meal_logs)
+                'calories': meal_totals.get('calories', 0),
+                'count': meal_totals.get('log_count', 0)
             }
         
-        # Get targets
-        targets = RecommendationService.calculate_daily_targets(user_id)
-        
         # Calculate percentages
         if targets['calories'] > 0:
             totals['calories_percent'] = (totals['calories'] / targets['calories']) * 100
@@ -120,34 +200,33 @@ class RecommendationService:
         }
     
     @staticmethod
+    @request_memo
     def get_weekly_summary(user_id: int, weeks_back: int = 0) -> Dict:
         """Get weekly nutrition summary"""
         # Calculate date range
-        today = datetime.utcnow().date()
+        start_of_week, end_of_week = RecommendationService.week_bounds(datetime.utcnow().date(), weeks_back)
+        daily = NutritionRollup.daily_totals(user_id, start_of_week, end_of_week)
+        return RecommendationService.build_weekly_summary(start_of_week, end_of_week, daily)
+    
+    @staticmethod
+    def week_bounds(today, weeks_back: int = 0) -> Tuple:
+        """Monday and Sunday of the week weeks_back weeks before today's"""
         start_of_week = today - timedelta(days=today.weekday() + (weeks_back * 7))
-        end_of_week = start_of_week + timedelta(days=6)
-        
-        # Get food logs for the week
-        logs = FoodLog.query.filter(
-            FoodLog.user_id == user_id,
-            func.date(FoodLog.logged_at) >= start_of_week,
-            func.date(FoodLog.logged_at) <= end_of_week
-        ).all()
-        
+        return start_of_week, start_of_week + timedelta(days=6)
+    
+    @staticmethod
+    def build_weekly_summary(start_of_week, end_of_week, daily: Dict) -> Dict:
+        """Weekly summary from the week's totals per day"""
         # Calculate daily averages
         daily_totals = {}
-        for log in logs:
-            log_date = log.logged_at.date()
+        for log_date, day in sorted(daily.items()):
             date_str = log_date.isoformat()  # Convert to string for JSON compatibility
-            if date_str not in daily_totals:
-                daily_totals[date_str] = {
-                    'calories': 0, 'protein_g': 0, 'carbs_g': 0, 'fat_g': 0
-                }
-            
-            daily_totals[date_str]['calories'] += log.calories
-            daily_totals[date_str]['protein_g'] += log.protein_g
-            daily_totals[date_str]['carbs_g'] += log.carbs_g
-            daily_totals[date_str]['fat_g'] += log.fat_g
+            daily_totals[date_str] = {
+                'calories': day['calories'],
+                'protein_g': day['protein_g'],
+                'carbs_g': day['carbs_g'],
+                'fat_g': day['fat_g']
+            }
         
         # Calculate averages
         days_with_data = len(daily_totals)
@@ -270,6 +349,7 @@ class RecommendationService:
         return filtered_suggestions[:5]  # Return top 5 suggestions
     
     @staticmethod
+    @request_memo
     def get_progress_insights(user_id: int) -> Dict:
         """Get insights about user's progress"""
         # Get recent weigh-ins
@@ -305,10 +385,17 @@ class RecommendationService:
         if insights['consistency_score'] < 70:
             insights['recommendations'].append("Try to log your meals more consistently to get better insights.")
         
-        targets = RecommendationService.calculate_daily_targets(user_id)
-        if insights['weekly_average_calories'] < targets['calories'] * 0.8:
+        # Compare with the targets that were in effect on the days logged
+        logged_days = [datetime.strptime(day, '%Y-%m-%d').date() for day in weekly_summary['daily_data']]
+        if logged_days:
+            by_day = RecommendationService.targets_by_day(user_id, min(logged_days), max(logged_days))
+            target_calories = sum(by_day[day]['calories'] for day in logged_days) / len(logged_days)
+        else:
+            target_calories = RecommendationService.calculate_daily_targets(user_id)['calories']
+        
+        if insights['weekly_average_calories'] < target_calories * 0.8:
             insights['recommendations'].append("You may be eating too few calories. Consider adding healthy snacks.")
-        elif insights['weekly_average_calories'] > targets['calories'] * 1.2:
+        elif insights['weekly_average_calories'] > target_calories * 1.2:
             insights['recommendations'].append("You're exceeding your calorie targets. Try smaller portions or healthier alternatives.")
         
         return insights
\ No newline at end of file
@@ -3,7 +3,7 @@ Reminder Scheduler Service for NutriCoach
 Manages automatic notification reminders using APScheduler
 """
 
-from datetime import datetime, time, timedelta
+from datetime import datetime, time
 from typing import Dict, List
 import logging
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -12,6 +12,7 @@ from apscheduler.triggers.interval import IntervalTrigger
 
 from models import User, Profile, FoodLog
 from services.notification_service import ReminderService
+from services.time_window import on_day
 from extensions import db
 
 logger = logging.getLogger(__name__)
@@ -91,14 +92,10 @@ class ReminderScheduler:
             for user in users:
                 try:
                     # Check if user has already logged this meal today
-                    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-                    today_end = today_start + timedelta(days=1)
-                    
                     existing_log = FoodLog.query.filter(
                         FoodLog.user_id == user.id,
                         FoodLog.meal == current_meal,
-                        FoodLog.logged_at >= today_start,
-                        FoodLog.logged_at < today_end
+                        on_day(FoodLog.logged_at, datetime.utcnow().date())
                     ).first()
                     
                     if not existing_log:
@@ -0,0 +1,83 @@
+"""
+Request Memo for NutriCoach
+Request-scoped memoization for static service methods. A decorated method
+runs once per distinct (method, arguments) in a request; later calls in the
+same request get the stored result. Any commit in the request clears it.
+"""
+
+from functools import wraps
+from typing import Callable, Dict
+import inspect
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_MEMO_KEY = '_service_memo'
+
+
+def _state() -> Dict:
+    """The memo for the current request.
+
+    Tagged with the request, since an app context (and its g) can outlive
+    one, e.g. in tests.
+    """
+    owner = request._get_current_object()
+    state = g.get(_MEMO_KEY)
+    if state is None or state['request'] is not owner:
+        state = {'request': owner, 'results': {}, 'counts': {}}
+        setattr(g, _MEMO_KEY, state)
+    return state
+
+
+def request_memo(function: Callable) -> Callable:
+    """Memoize a service method for the current request, keyed on its bound arguments.
+
+    Place it under @staticmethod. Arguments must be hashable; defaults are
+    applied first, so f(1) and f(1, None) share an entry. Results are shared
+    between callers, who must not mutate them. Outside a request the method
+    just runs.
+    """
+    signature = inspect.signature(function)
+    name = function.__qualname__
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        if not has_request_context():
+            return function(*args, **kwargs)
+
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = (name, tuple(bound.arguments.values()))
+
+        state = _state()
+        counts = state['counts'].setdefault(name, {'calls': 0, 'runs': 0})
+        counts['calls'] += 1
+        if key in state['results']:
+            return state['results'][key]
+
+        counts['runs'] += 1
+        result = function(*args, **kwargs)
+        state['results'][key] = result
+        return result
+
+    return wrapper
+
+
+def memo_counts() -> Dict[str, Dict[str, int]]:
+    """Calls and actual runs per memoized method in the current request"""
+    if not has_request_context():
+        return {}
+    return {name: dict(counts) for name, counts in _state()['counts'].items()}
+
+
+def clear_request_memo():
+    """Forget the results memoized in the current request"""
+    if has_request_context():
+        _state()['results'].clear()
+
+
+@event.listens_for(Session, 'after_commit')
+def _clear_on_commit(session):
+    """Committed writes may change any memoized result"""
+    clear_request_memo()
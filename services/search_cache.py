@@ -0,0 +1,232 @@
+"""
+Search Cache Service for NutriCoach
+TTL cache for external nutrition lookups with negative caching
+"""
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+import json
+import logging
+import threading
+import time
+
+from flask import current_app
+
+from extensions import get_redis
+from services.nutrition_catalog import normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+class SearchCache:
+    """Shared cache for Open Food Facts / Wikipedia responses.
+
+    Entries live in Redis so every worker shares them; when Redis is not
+    reachable the cache falls back to a bounded in-process LRU. Empty results
+    ("not found") are cached with a shorter TTL than real hits.
+    """
+
+    KEY_PREFIX = 'nutricoach:search:'
+    INDEX_KEY = 'nutricoach:search:index'
+    STATS_KEY = 'nutricoach:search:stats'
+    REDIS_RETRY_SECONDS = 30  # back-off after a Redis error before trying again
+    STATS_FLUSH_SECONDS = 5  # counters are summed in-process and written to Redis at most this often
+
+    def __init__(self, ttl: int, negative_ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+
+        self._local = OrderedDict()  # key -> (expires_at, payload)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'negative_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        self._pending = {}  # counter -> increments not yet written to Redis
+        self._flushed_at = time.monotonic()
+        self._redis_down_until = 0
+
+    @classmethod
+    def get_instance(cls) -> 'SearchCache':
+        """Get the cache bound to the current app"""
+        cache = current_app.extensions.get('search_cache')
+        if cache is None:
+            cache = cls(
+                ttl=current_app.config.get('SEARCH_CACHE_TTL', 24 * 3600),
+                negative_ttl=current_app.config.get('SEARCH_CACHE_NEGATIVE_TTL', 15 * 60),
+                max_entries=current_app.config.get('SEARCH_CACHE_MAX_ENTRIES', 10000)
+            )
+            current_app.extensions['search_cache'] = cache
+        return cache
+
+    @staticmethod
+    def make_key(namespace: str, query: str) -> str:
+        return f"{SearchCache.KEY_PREFIX}{namespace}:{normalize_query(query)}"
+
+    def get(self, namespace: str, query: str) -> Tuple[bool, Any]:
+        """Return (found, value) for a cached lookup"""
+        key = self.make_key(namespace, query)
+        payload = self._redis_get(key)
+        if payload is None:
+            payload = self._local_get(key)
+
+        if payload is None:
+            self._count('misses')
+            return False, None
+
+        value = json.loads(payload)
+        self._count('hits' if value else 'negative_hits')
+        return True, value
+
+    def set(self, namespace: str, query: str, value: Any):
+        """Store a lookup result; empty results use the negative TTL"""
+        key = self.make_key(namespace, query)
+        ttl = self.ttl if value else self.negative_ttl
+        payload = json.dumps(value)
+
+        if not self._redis_set(key, payload, ttl):
+            self._local_set(key, payload, ttl)
+        self._count('stores')
+
+    def get_or_fetch(self, namespace: str, query: str, fetch: Callable[[], Any]) -> Any:
+        """Return the cached value or call fetch() and cache its result.
+
+        Exceptions raised by fetch() propagate and nothing is cached, so
+        transient network errors are never stored as "not found".
+        """
+        found, value = self.get(namespace, query)
+        if found:
+            return value
+
+        value = fetch()
+        self.set(namespace, query, value)
+        return value
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        self._flush_counts()
+        redis = self._redis()
+        if redis is not None:
+            try:
+                counters = redis.hgetall(self.STATS_KEY)
+                stats = {k.decode(): int(v) for k, v in counters.items()}
+                stats['size'] = redis.zcard(self.INDEX_KEY)
+                stats['backend'] = 'redis'
+                return stats
+            except Exception as e:
+                self._redis_failed(e)
+
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._local)
+        stats['backend'] = 'local'
+        return stats
+
+    def clear(self):
+        """Drop all cached lookups and reset the counters"""
+        with self._lock:
+            self._local.clear()
+            self._stats = dict.fromkeys(self._stats, 0)
+            self._pending.clear()
+
+        redis = self._redis()
+        if redis is not None:
+            try:
+                keys = redis.zrange(self.INDEX_KEY, 0, -1)
+                if keys:
+                    redis.delete(*keys)
+                redis.delete(self.INDEX_KEY, self.STATS_KEY)
+            except Exception as e:
+                self._redis_failed(e)
+
+    # Redis backend
+
+    def _redis(self):
+        if time.monotonic() < self._redis_down_until:
+            return None
+        return get_redis()
+
+    def _redis_failed(self, error: Exception):
+        logger.warning(f"Search cache Redis unavailable, using local cache: {error}")
+        self._redis_down_until = time.monotonic() + self.REDIS_RETRY_SECONDS
+
+    def _redis_get(self, key: str):
+        redis = self._redis()
+        if redis is None:
+            return None
+        try:
+            return redis.get(key)
+        except Exception as e:
+            self._redis_failed(e)
+            return None
+
+    def _redis_set(self, key: str, payload: str, ttl: int) -> bool:
+        redis = self._redis()
+        if redis is None:
+            return False
+        try:
+            now = time.time()
+            pipe = redis.pipeline()
+            pipe.set(key, payload, ex=ttl)
+            pipe.zadd(self.INDEX_KEY, {key: now})
+            # Index entries older than the longest TTL point at expired keys
+            pipe.zremrangebyscore(self.INDEX_KEY, '-inf', now - max(self.ttl, self.negative_ttl))
+            pipe.zcard(self.INDEX_KEY)
+            size = pipe.execute()[-1]
+
+            if size > self.max_entries:
+                evicted = redis.zpopmin(self.INDEX_KEY, size - self.max_entries)
+                if evicted:
+                    redis.delete(*[member for member, _ in evicted])
+                    self._count('evictions', len(evicted))
+            return True
+        except Exception as e:
+            self._redis_failed(e)
+            return False
+
+    # In-process fallback
+
+    def _local_get(self, key: str):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at < time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return payload
+
+    def _local_set(self, key: str, payload: str, ttl: int):
+        with self._lock:
+            self._local[key] = (time.monotonic() + ttl, payload)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._lock:
+            self._stats[counter] += amount
+            self._pending[counter] = self._pending.get(counter, 0) + amount
+            due = time.monotonic() - self._flushed_at >= self.STATS_FLUSH_SECONDS
+        if due:
+            self._flush_counts()
+
+    def _flush_counts(self):
+        """Write the pending counter increments to Redis in one round trip"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushed_at = time.monotonic()
+        if not pending:
+            return
+
+        redis = self._redis()
+        if redis is None:
+            return
+        try:
+            pipe = redis.pipeline()
+            for counter, amount in pending.items():
+                pipe.hincrby(self.STATS_KEY, counter, amount)
+            pipe.execute()
+        except Exception as e:
+            self._redis_failed(e)
@@ -0,0 +1,78 @@
+"""
+Server-Sent Events helpers for NutriCoach
+Frame formatting and a token writer that coalesces small chunks into fewer frames
+"""
+
+from typing import Dict, Iterable, Iterator, List, Optional
+import json
+import time
+
+from flask import Response, current_app
+
+
+def sse_event(data: Dict, event: str = None, event_id: str = None) -> str:
+    """Format one text/event-stream frame"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def sse_response(frames: Iterable[str]) -> Response:
+    """Streaming response with the headers proxies need to pass frames through unbuffered"""
+    response = Response(frames, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+class CoalescingSSEWriter:
+    """Turns a stream of text chunks into {'content': ...} frames, several chunks per frame.
+
+    The first chunk goes out at once so the reply starts appearing
+    immediately; after that, chunks are buffered until flush_interval
+    seconds have passed since the last frame or flush_bytes have built up.
+    The window is checked as chunks arrive, so a slow model still gets one
+    frame per chunk. The complete text is available from .text.
+    """
+
+    def __init__(self, chunks: Iterable[str], flush_interval: float = None, flush_bytes: int = None):
+        config = current_app.config
+        self.chunks = chunks
+        self.flush_interval = config.get('COACH_STREAM_FLUSH_INTERVAL', 0.05) if flush_interval is None else flush_interval
+        self.flush_bytes = config.get('COACH_STREAM_FLUSH_BYTES', 512) if flush_bytes is None else flush_bytes
+        self.frames_sent = 0
+        self._parts: List[str] = []
+
+    @property
+    def text(self) -> str:
+        return ''.join(self._parts)
+
+    def __iter__(self) -> Iterator[str]:
+        for batch in self.batches():
+            self.frames_sent += 1
+            yield sse_event({'content': batch})
+
+    def batches(self) -> Iterator[str]:
+        """The coalesced text batches themselves, for callers that publish them elsewhere"""
+        pending: List[str] = []
+        pending_bytes = 0
+        last_flush: Optional[float] = None
+
+        for chunk in self.chunks:
+            if not chunk:
+                continue
+            self._parts.append(chunk)
+            pending.append(chunk)
+            pending_bytes += len(chunk)
+
+            now = time.monotonic()
+            if last_flush is None or now - last_flush >= self.flush_interval or pending_bytes >= self.flush_bytes:
+                yield ''.join(pending)
+                pending, pending_bytes, last_flush = [], 0, now
+
+        if pending:
+            yield ''.join(pending)
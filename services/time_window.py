@@ -0,0 +1,31 @@
+"""
+Time Window Helpers for NutriCoach
+Turn day ranges into half-open [start, end) datetime predicates on a timestamp
+column, so per-user time-series queries can use the (user_id, timestamp)
+indexes instead of evaluating date() on every row
+"""
+
+from datetime import date, datetime, time, timedelta
+from typing import Tuple
+
+from sqlalchemy import and_
+
+
+def day_bounds(start: date, end: date) -> Tuple[datetime, datetime]:
+    """Start of day start and start of the day after end: the half-open range covering start..end"""
+    return datetime.combine(start, time.min), datetime.combine(end + timedelta(days=1), time.min)
+
+
+def within_days(column, start: date, end: date):
+    """Predicate for column falling on a (UTC) day between start and end, inclusive.
+
+    Equivalent to func.date(column) between start and end, but compares the
+    bare column, so the database can range-scan an index on it.
+    """
+    lower, upper = day_bounds(start, end)
+    return and_(column >= lower, column < upper)
+
+
+def on_day(column, day: date):
+    """Predicate for column falling on the given (UTC) day"""
+    return within_days(column, day, day)
@@ -7,6 +7,8 @@ Creates sample data for development and testing.
 from app import create_app
 from extensions import db
 from models import User, Profile, Settings, FoodItem, FoodLog, WeighIn, WaterIntake
+from services.nutrition_rollup import NutritionRollup
+from services.recommendations import RecommendationService
 from datetime import datetime, timedelta
 import random
 
@@ -121,6 +123,7 @@ def create_sample_users():
         profile.set_equipment(profile_data['equipment'])
         
         db.session.add(profile)
+        RecommendationService.record_targets(profile)
         
         # Create settings
         settings = Settings(
@@ -305,6 +308,8 @@ def create_sample_food_logs(users):
                 )
                 
                 db.session.add(log)
+                # The dashboard, analytics and coach tools read the daily totals
+                NutritionRollup.add(log)
         
         print(f"Created food logs for user: {user.username}")
 
@@ -0,0 +1,92 @@
+import pytest
+from sqlalchemy import event
+from extensions import db
+from models import User, WeighIn
+from services import coach_context
+from services.coach_context import CoachContext
+
+
+@pytest.fixture(autouse=True)
+def clear_snapshots():
+    # Each test gets a fresh database, so user ids repeat
+    coach_context._snapshots.clear()
+    yield
+
+
+@pytest.fixture
+def built_sections(monkeypatch):
+    """Record which sections are rebuilt."""
+    built = []
+    for section, builder in list(coach_context._BUILDERS.items()):
+        def counting(user_id, section=section, builder=builder):
+            built.append(section)
+            return builder(user_id)
+        monkeypatch.setitem(coach_context._BUILDERS, section, counting)
+    return built
+
+
+def _user_id():
+    return User.query.filter_by(username='testuser').first().id
+
+
+class TestCoachContext:
+
+    def test_unchanged_context_is_served_without_queries(self, app, user):
+        """Test a second build reuses the snapshot without touching the database."""
+        with app.app_context():
+            user_id = _user_id()
+            first = CoachContext.build(user_id)
+            assert 'Name: Test User' in first
+
+            statements = []
+            engine = db.engine
+
+            def count(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement)
+
+            event.listen(engine, 'before_cursor_execute', count)
+            try:
+                assert CoachContext.build(user_id) == first
+            finally:
+                event.remove(engine, 'before_cursor_execute', count)
+            assert statements == []
+
+    def test_only_changed_section_is_rebuilt(self, app, user, built_sections):
+        """Test committing a weigh-in rebuilds just the weight section."""
+        with app.app_context():
+            user_id = _user_id()
+            CoachContext.build(user_id)
+            del built_sections[:]
+
+            db.session.add(WeighIn(user_id=user_id, weight_kg=71.5))
+            db.session.commit()
+            context = CoachContext.build(user_id)
+
+            assert built_sections == ['weight']
+            assert '71.5kg' in context
+
+    def test_rolled_back_write_keeps_snapshot(self, app, user, built_sections):
+        """Test a write that is rolled back does not invalidate anything."""
+        with app.app_context():
+            user_id = _user_id()
+            CoachContext.build(user_id)
+            del built_sections[:]
+
+            db.session.add(WeighIn(user_id=user_id, weight_kg=90.0))
+            db.session.flush()
+            db.session.rollback()
+            CoachContext.build(user_id)
+
+            assert built_sections == []
+
+    def test_explicit_invalidation_after_bulk_delete(self, app, user, built_sections):
+        """Test invalidate() covers writes that bypass the session hooks."""
+        with app.app_context():
+            user_id = _user_id()
+            CoachContext.build(user_id)
+            del built_sections[:]
+
+            CoachContext.invalidate(user_id, 'memory')
+            CoachContext.build(user_id)
+
+            assert built_sections == ['memory']
@@ -0,0 +1,129 @@
+import pytest
+from extensions import db
+from models import CoachMemory, CoachMessage, User
+from services import coach_context
+from services.coach_context import CoachContext
+from services.coach_memory import CoachMemoryService, build_prompt, estimate_tokens
+from services.ollama_client import OllamaClient
+
+
+class _FakeSummaryClient:
+    def __init__(self, summary='- Wants to lose 5kg\n- Dislikes fish'):
+        self.summary = summary
+        self.calls = []
+
+    def complete(self, messages, model, system_prompt=None, max_tokens=None, priority=None):
+        self.calls.append(messages[-1]['content'])
+        return self.summary
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    client = _FakeSummaryClient()
+    monkeypatch.setattr(OllamaClient, 'from_user_settings', classmethod(lambda cls, user_id=None: client))
+    monkeypatch.setattr(OllamaClient, 'get_user_models', staticmethod(
+        lambda user_id=None: {'chat_model': 'llama3', 'vision_model': None, 'system_prompt': None}))
+    return client
+
+
+def _user_id():
+    return User.query.filter_by(username='testuser').first().id
+
+
+def _add_messages(user_id, count, content='message {}'):
+    for i in range(count):
+        db.session.add(CoachMessage(user_id=user_id, role='user' if i % 2 == 0 else 'assistant',
+                                    content=content.format(i)))
+    db.session.commit()
+
+
+class TestCoachMemory:
+
+    def test_estimate_tokens(self):
+        """Test the estimate is about four characters per token."""
+        assert estimate_tokens('') == 0
+        assert estimate_tokens('abcd') == 1
+        assert estimate_tokens('abcde') == 2
+        assert estimate_tokens('x' * 4000) == 1000
+
+    def test_prompt_keeps_newest_turns_within_budget(self, app, user):
+        """Test older turns are dropped first and the new message is always sent."""
+        with app.app_context():
+            user_id = _user_id()
+            _add_messages(user_id, 20, content='turn {} ' + 'x' * 200)
+
+            system, messages, stats = build_prompt(user_id, 'You are a coach.', 'Name: Test', 'What now?', budget=400)
+
+            assert stats['prompt_tokens'] <= 400
+            assert messages[-1] == {'role': 'user', 'content': 'What now?'}
+            history = [m['content'] for m in messages[:-1]]
+            assert 0 < len(history) < 20
+            assert history[-1].startswith('turn 19 ')
+            assert 'Name: Test' in system
+
+    def test_window_start_moves_in_blocks(self, app, user):
+        """Test trimming drops whole blocks of old turns, keeping the prompt prefix stable."""
+        with app.app_context():
+            app.config['COACH_MEMORY_BATCH'] = 4
+            user_id = _user_id()
+            _add_messages(user_id, 12, content='turn {} ' + 'x' * 200)
+
+            starts = []
+            for i in range(12, 16):
+                _, messages, _ = build_prompt(user_id, 'You are a coach.', '', 'Next?', budget=400)
+                starts.append(messages[0]['content'].split()[1])
+                _add_messages(user_id, 1, content=f'turn {i} ' + 'x' * 200)
+
+            # Without blocks the oldest kept turn would change on every new message
+            assert starts[0] == starts[1] == starts[2] != starts[3]
+
+    def test_oversized_context_is_truncated(self, app, user):
+        """Test a context larger than the budget is cut rather than overflowing it."""
+        with app.app_context():
+            system, messages, stats = build_prompt(_user_id(), 'You are a coach.', 'y' * 10000, 'Hi', budget=300)
+
+            assert stats['context_truncated'] is True
+            assert stats['prompt_tokens'] <= 300
+            assert messages == [{'role': 'user', 'content': 'Hi'}]
+
+    def test_summarize_folds_older_messages(self, app, user, fake_client):
+        """Test older messages are folded into the summary and leave the prompt."""
+        with app.app_context():
+            app.config.update(COACH_MEMORY_KEEP_RECENT=4, COACH_MEMORY_BATCH=4)
+            user_id = _user_id()
+            _add_messages(user_id, 10)
+
+            assert CoachMemoryService.summarize(user_id) is True
+
+            memory = CoachMemory.query.filter_by(user_id=user_id).first()
+            folded = CoachMessage.query.filter_by(user_id=user_id).order_by(CoachMessage.id).all()[5]
+            assert memory.summary == fake_client.summary
+            assert memory.summarized_through_id == folded.id
+            assert memory.message_count == 6
+            assert 'message 0' in fake_client.calls[0] and 'message 6' not in fake_client.calls[0]
+
+            _, messages, _ = build_prompt(user_id, 'You are a coach.', '', 'Hi', budget=2000)
+            assert [m['content'] for m in messages[:-1]] == ['message 6', 'message 7', 'message 8', 'message 9']
+
+    def test_summarize_waits_for_a_full_batch(self, app, user, fake_client):
+        """Test the model is not called until enough messages can be folded."""
+        with app.app_context():
+            app.config.update(COACH_MEMORY_KEEP_RECENT=6, COACH_MEMORY_BATCH=6)
+            user_id = _user_id()
+            _add_messages(user_id, 10)
+
+            assert CoachMemoryService.summarize(user_id) is False
+            assert fake_client.calls == []
+
+    def test_summary_is_part_of_the_context(self, app, user, fake_client):
+        """Test a new summary invalidates and appears in the coach context."""
+        with app.app_context():
+            coach_context._snapshots.clear()
+            app.config.update(COACH_MEMORY_KEEP_RECENT=2, COACH_MEMORY_BATCH=2)
+            user_id = _user_id()
+            _add_messages(user_id, 4)
+            assert 'No earlier conversations' in CoachContext.build(user_id)
+
+            CoachMemoryService.summarize(user_id)
+
+            assert 'Dislikes fish' in CoachContext.build(user_id)
@@ -0,0 +1,107 @@
+import json
+import threading
+import time
+from models import CoachMessage, User
+from services.coach_streams import CoachStreams, MIN_POLL_MS, _RedisStream
+
+
+def _user_id():
+    return User.query.filter_by(username='testuser').first().id
+
+
+def _parse(frame):
+    fields = dict(line.split(': ', 1) for line in frame.strip().split('\n'))
+    return fields.get('id'), json.loads(fields['data'])
+
+
+def _iter_chunks(chunks):
+    yield from chunks
+
+
+def _wait_for_message(user_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        message = CoachMessage.query.filter_by(user_id=user_id, role='assistant').first()
+        if message:
+            return message
+        time.sleep(0.02)
+    raise AssertionError('assistant message was not saved')
+
+
+class TestCoachStreams:
+
+    def test_reply_is_published_then_saved(self, app, user):
+        """Test a reply streams to the client and is saved once generation finishes."""
+        with app.app_context():
+            app.config['COACH_STREAM_FLUSH_INTERVAL'] = 0
+            user_id = _user_id()
+
+            generation_id = CoachStreams.start(user_id, _iter_chunks(['Eat', ' more', ' greens']))
+            payloads = [_parse(frame)[1] for frame in CoachStreams.events(user_id, generation_id)]
+
+            assert ''.join(p.get('content', '') for p in payloads) == 'Eat more greens'
+            assert payloads[-1]['done'] is True
+            message = _wait_for_message(user_id)
+            assert message.content == 'Eat more greens'
+            assert payloads[-1]['message_id'] == message.id
+
+    def test_resume_after_last_event_id(self, app, user):
+        """Test a reconnecting client only receives what it has not seen yet."""
+        gate = threading.Event()
+
+        def chunks():
+            yield 'First'
+            gate.wait(5)
+            yield ' second'
+
+        with app.app_context():
+            app.config['COACH_STREAM_FLUSH_INTERVAL'] = 0
+            user_id = _user_id()
+            generation_id = CoachStreams.start(user_id, chunks(), 'msg-1')
+
+            # Client reads up to the first token, then drops
+            events = CoachStreams.events(user_id, generation_id)
+            for frame in events:
+                last_event_id, payload = _parse(frame)
+                if payload.get('content'):
+                    break
+            events.close()
+            gate.set()
+
+            resumed_id, after = CoachStreams.parse_event_id(last_event_id)
+            assert resumed_id == generation_id
+            assert CoachStreams.generation_for_request(user_id, 'msg-1') == generation_id
+
+            payloads = [_parse(frame)[1] for frame in CoachStreams.events(user_id, generation_id, after)]
+            assert [p.get('content') for p in payloads if 'content' in p] == [' second']
+            assert _wait_for_message(user_id).content == 'First second'
+
+    def test_unknown_generation_is_not_resumable(self, app, user):
+        """Test an expired or unknown reply reports that it cannot be resumed."""
+        with app.app_context():
+            assert CoachStreams.exists(_user_id(), 'missing') is False
+
+    def test_request_id_finds_only_its_own_generation(self, app, user):
+        """Test a client that lost its connection before any frame can only resume the reply it asked for."""
+        with app.app_context():
+            user_id = _user_id()
+            earlier = CoachStreams.start(user_id, _iter_chunks(['Earlier reply']), 'msg-1')
+            CoachStreams.start(user_id, _iter_chunks(['Later reply']))
+
+            assert CoachStreams.generation_for_request(user_id, 'msg-1') == earlier
+            assert CoachStreams.generation_for_request(user_id, 'msg-2') is None
+            assert CoachStreams.generation_for_request(user_id + 1, 'msg-1') is None
+
+    def test_redis_read_always_blocks(self):
+        """Test an idle Redis read waits on XREAD BLOCK instead of polling without one."""
+        calls = []
+
+        class _Redis:
+            def xread(self, streams, count=None, block=None):
+                calls.append(block)
+                return []
+
+        stream = _RedisStream(_Redis(), 'nutricoach:coach:stream:test')
+        assert stream.read('0', 0) == []
+        assert stream.read('0', 15) == []
+        assert calls == [MIN_POLL_MS, 15000]
@@ -0,0 +1,120 @@
+import json
+import pytest
+from extensions import db
+from models import FoodLog, User, WeighIn
+from services import coach_tools
+from services.coach_tools import CoachTools
+from services.ollama_client import OllamaBusyError
+
+
+@pytest.fixture(autouse=True)
+def clear_results():
+    # Each test gets a fresh database, so user ids repeat
+    coach_tools._results.clear()
+    yield
+
+
+class _FakeToolClient:
+    """Calls get_top_foods on the first request, then answers with text."""
+
+    def __init__(self, capabilities=('completion', 'tools')):
+        self.capabilities = list(capabilities)
+        self.requests = []
+
+    def model_capabilities(self, model):
+        return self.capabilities
+
+    def chat(self, messages, model, system_prompt=None, stream=False, priority=None, tools=None, on_tool_calls=None):
+        self.requests.append({'messages': list(messages), 'tools': tools})
+
+        def chunks():
+            if len(self.requests) == 1:
+                on_tool_calls([{'function': {'name': 'get_top_foods', 'arguments': {'days': 7}}}])
+                return
+            yield 'You eat '
+            yield 'a lot of oats.'
+        return chunks()
+
+
+class _BusyToolClient(_FakeToolClient):
+    """Calls a tool, then finds the host saturated for the follow-up request."""
+
+    def chat(self, messages, model, system_prompt=None, stream=False, priority=None, tools=None, on_tool_calls=None):
+        if self.requests:
+            raise OllamaBusyError('http://ollama:11434', 7)
+        return super().chat(messages, model, system_prompt, stream, priority, tools, on_tool_calls)
+
+
+def _user_id():
+    return User.query.filter_by(username='testuser').first().id
+
+
+class TestCoachTools:
+
+    def test_tool_results_are_sent_back_to_the_model(self, app, user):
+        """Test a tool call is executed server-side and the model then answers."""
+        with app.app_context():
+            user_id = _user_id()
+            db.session.add(FoodLog(user_id=user_id, custom_name='Oats', meal='breakfast', grams=60,
+                                   calories=230, protein_g=8, carbs_g=40, fat_g=4, source='manual'))
+            db.session.commit()
+            client = _FakeToolClient()
+
+            reply = ''.join(CoachTools.chat(client, user_id, 'llama3', 'Be brief.',
+                                            [{'role': 'user', 'content': 'What do I eat most?'}]))
+
+            assert reply == 'You eat a lot of oats.'
+            assert len(client.requests) == 2
+            tool_message = client.requests[1]['messages'][-1]
+            assert tool_message['role'] == 'tool' and tool_message['tool_name'] == 'get_top_foods'
+            assert json.loads(tool_message['content'])['foods'][0]['name'] == 'Oats'
+
+    def test_busy_host_ends_reply_with_retry_note(self, app, user):
+        """Test a tool round refused by a saturated host ends the reply with a retry message instead of failing."""
+        with app.app_context():
+            client = _BusyToolClient()
+
+            reply = ''.join(CoachTools.chat(client, _user_id(), 'llama3', 'Be brief.',
+                                            [{'role': 'user', 'content': 'What do I eat most?'}]))
+
+            assert reply == coach_tools.BUSY_MESSAGE.format(retry_after=7)
+            assert len(client.requests) == 1
+
+    def test_results_are_cached_until_the_data_changes(self, app, user, monkeypatch):
+        """Test a repeated call is served from cache and a new weigh-in invalidates it."""
+        calls = []
+        weight_trend, sections, per_user = coach_tools._TOOLS['get_weight_trend']
+
+        def counting(user_id, arguments):
+            calls.append(arguments)
+            return weight_trend(user_id, arguments)
+        monkeypatch.setitem(coach_tools._TOOLS, 'get_weight_trend', (counting, sections, per_user))
+
+        with app.app_context():
+            user_id = _user_id()
+            first = CoachTools.execute(user_id, 'get_weight_trend', {'days': 30})
+            assert CoachTools.execute(user_id, 'get_weight_trend', {'days': 30}) == first
+            assert len(calls) == 1
+
+            db.session.add(WeighIn(user_id=user_id, weight_kg=68.2))
+            db.session.commit()
+            updated = CoachTools.execute(user_id, 'get_weight_trend', {'days': 30})
+
+            assert len(calls) == 2
+            assert updated['latest']['weight_kg'] == 68.2
+
+    def test_unknown_tool_and_bad_arguments(self, app, user):
+        """Test invalid calls return an error for the model instead of failing the reply."""
+        with app.app_context():
+            user_id = _user_id()
+            assert 'error' in CoachTools.execute(user_id, 'drop_tables', {})
+            assert 'error' in CoachTools.execute(user_id, 'get_daily_summary', {'date': 'yesterday'})
+
+    def test_only_used_with_tool_capable_models(self, app):
+        """Test models without tool support, and the generate path, keep the full context."""
+        with app.app_context():
+            assert CoachTools.available(_FakeToolClient(), 'llama3') is True
+            assert CoachTools.available(_FakeToolClient(['completion']), 'gemma') is False
+
+            app.config['COACH_KV_REUSE'] = 'context'
+            assert CoachTools.available(_FakeToolClient(), 'llama3') is False
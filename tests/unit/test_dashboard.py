@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from extensions import db
+from models import FoodLog, User
+from services.analytics import AnalyticsService
+from services.dashboard import DashboardService
+from services.nutrition_rollup import NutritionRollup
+from services.recommendations import RecommendationService
+
+
+def _user_id():
+    return User.query.filter_by(username='testuser').first().id
+
+
+def _log(user_id, name, meal, calories, days_ago=0):
+    log = FoodLog(user_id=user_id, custom_name=name, meal=meal, grams=100, calories=calories,
+                  protein_g=calories / 20, carbs_g=calories / 10, fat_g=calories / 40, source='manual',
+                  logged_at=datetime.utcnow() - timedelta(days=days_ago))
+    db.session.add(log)
+    NutritionRollup.add(log)
+    db.session.commit()
+
+
+class TestDashboardService:
+
+    def test_matches_the_individual_services(self, app, user):
+        """Test every section equals what the separate service methods return."""
+        with app.app_context():
+            user_id = _user_id()
+            _log(user_id, 'Oats', 'breakfast', 300)
+            _log(user_id, 'Rice', 'lunch', 600)
+            _log(user_id, 'Oats', 'breakfast', 320, days_ago=1)
+            _log(user_id, 'Pasta', 'dinner', 800, days_ago=3)
+            _log(user_id, 'Cake', 'snack', 400, days_ago=12)
+
+            dashboard = DashboardService.build(user_id, days=7, top_foods=5)
+
+            assert dashboard == {
+                'today': RecommendationService.get_daily_summary(user_id),
+                'weekly': RecommendationService.get_weekly_summary(user_id),
+                'meal_distribution': AnalyticsService.get_meal_distribution(user_id, 7),
+                'macro_distribution': AnalyticsService.get_macro_distribution(user_id, 7),
+                'streaks': AnalyticsService.get_logging_streaks(user_id),
+                'top_foods': AnalyticsService.get_top_foods(user_id, 7, 5)
+            }
+            assert dashboard['today']['totals']['calories'] == 900
+            assert dashboard['top_foods'][0]['name'] == 'Oats'
+
+    def test_uses_a_fixed_number_of_queries(self, app, user):
+        """Test the aggregation runs four queries however many logs there are."""
+        with app.app_context():
+            user_id = _user_id()
+            RecommendationService.record_targets(db.session.get(User, user_id).profile)
+            for days_ago in range(10):
+                _log(user_id, 'Oats', 'breakfast', 300, days_ago=days_ago)
+                _log(user_id, 'Rice', 'lunch', 600, days_ago=days_ago)
+
+            statements = []
+
+            def count(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement)
+            event.listen(db.engine, 'before_cursor_execute', count)
+            try:
+                DashboardService.build(user_id)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', count)
+
+            # Targets, rollup rows, logged dates and top foods
+            assert len(statements) == 4
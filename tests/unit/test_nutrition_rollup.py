@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+from extensions import db
+from models import DailyNutrition, FoodLog, User
+from services.analytics import AnalyticsService
+from services.nutrition_rollup import NutritionRollup
+from services.recommendations import RecommendationService
+
+
+def _user_id():
+    return User.query.filter_by(username='testuser').first().id
+
+
+def _log(user_id, meal='lunch', calories=200, protein_g=10, logged_at=None, rollup=True):
+    log = FoodLog(user_id=user_id, custom_name='Rice', meal=meal, grams=150, calories=calories,
+                  protein_g=protein_g, carbs_g=40, fat_g=2, source='manual', logged_at=logged_at)
+    db.session.add(log)
+    if rollup:
+        NutritionRollup.add(log)
+    db.session.commit()
+    return log
+
+
+class TestNutritionRollup:
+
+    def test_writes_keep_rollup_in_step(self, app, user):
+        """Test adding and deleting logs updates the day's row in the same transaction."""
+        with app.app_context():
+            user_id = _user_id()
+            first = _log(user_id, calories=200)
+            _log(user_id, calories=300)
+            _log(user_id, meal='dinner', calories=500)
+
+            row = DailyNutrition.query.filter_by(user_id=user_id, meal='lunch').one()
+            assert row.log_count == 2 and row.calories == 500
+            assert row.date == first.logged_at.date()
+
+            NutritionRollup.remove(first)
+            db.session.delete(first)
+            db.session.commit()
+
+            db.session.refresh(row)
+            assert row.log_count == 1 and row.calories == 300
+            assert NutritionRollup.check(user_id) == []
+
+    def test_summaries_read_from_rollup(self, app, user):
+        """Test the daily, weekly and trend summaries match the logged values."""
+        with app.app_context():
+            user_id = _user_id()
+            yesterday = datetime.utcnow() - timedelta(days=1)
+            _log(user_id, meal='breakfast', calories=400, protein_g=20)
+            _log(user_id, meal='lunch', calories=600, protein_g=30)
+            _log(user_id, meal='lunch', calories=700, logged_at=yesterday)
+
+            today = RecommendationService.get_daily_summary(user_id)
+            assert today['totals']['calories'] == 1000
+            assert today['totals']['protein_g'] == 50
+            assert today['totals']['meal_breakdown']['lunch'] == {'calories': 600, 'count': 1}
+            assert today['totals']['meal_breakdown']['dinner'] == {'calories': 0, 'count': 0}
+
+            trends = AnalyticsService.get_nutrition_trends(user_id, 7)
+            assert trends['calories'][-2:] == [700, 1000]
+
+            meals = AnalyticsService.get_meal_distribution(user_id, 7)
+            assert dict(zip(meals['labels'], meals['counts'])) == {'Breakfast': 1, 'Lunch': 2}
+
+            assert AnalyticsService.get_logging_streaks(user_id)['current_streak'] == 2
+
+    def test_check_finds_drift_and_rebuild_backfills(self, app, user):
+        """Test logs written without the rollup are reported and a rebuild fills them in."""
+        with app.app_context():
+            user_id = _user_id()
+            _log(user_id, calories=250)
+            _log(user_id, meal='snack', calories=150, rollup=False)
+
+            [mismatch] = NutritionRollup.check(user_id)
+            assert mismatch['meal'] == 'snack' and mismatch['actual'] is None
+
+            assert NutritionRollup.rebuild(user_id) == 2
+            assert NutritionRollup.check() == []
+            assert RecommendationService.get_daily_summary(user_id)['totals']['calories'] == 400
@@ -0,0 +1,241 @@
+import pytest
+import time
+from datetime import datetime, timedelta
+from models import FoodItem
+from extensions import db
+from services.nutrition_search import NutritionSearch
+
+
+def _off_product(name, code, calories=89):
+    return {
+        'source': 'openfoodfacts',
+        'title': f"{name} Acme",
+        'name': name,
+        'brand': 'Acme',
+        'url': f"https://world.openfoodfacts.org/product/{code}",
+        'snippet': 'Brand: Acme',
+        'nutrition': {'calories_per_100g': calories, 'protein_per_100g': 1.1},
+        'barcode': code,
+        'image_url': ''
+    }
+
+
+class TestNutritionCatalog:
+
+    def test_search_results_are_catalogued(self, app, monkeypatch):
+        """Test remote results are upserted into FoodItem and served locally afterwards."""
+        with app.app_context():
+            search = NutritionSearch()
+            products = [_off_product(f'Banana {i}', f'00{i}') for i in range(3)]
+            monkeypatch.setattr(search, 'search_openfoodfacts', lambda q, **kw: products)
+            monkeypatch.setattr(search, 'search_wikipedia', lambda q, **kw: [])
+
+            first = search.search_food('Banana')
+            assert len(first) == 3
+            assert FoodItem.query.filter_by(source='openfoodfacts').count() == 3
+
+            def fail(query, **kwargs):
+                raise AssertionError('catalog hit should not reach the network')
+
+            monkeypatch.setattr(search, 'search_openfoodfacts', fail)
+            monkeypatch.setattr(search, 'search_wikipedia', fail)
+
+            second = search.search_food('  banana ')
+            assert sorted(r['barcode'] for r in second) == ['000', '001', '002']
+            assert second[0]['nutrition']['calories_per_100g'] == 89
+
+    def test_catalog_prefers_exact_and_word_matches(self, app):
+        """Test exact and prefix matches rank first and substrings inside words do not match."""
+        with app.app_context():
+            catalog = NutritionSearch().catalog
+            catalog.upsert_results([_off_product(name, code) for name, code in
+                                    [('Rice', '1'), ('Brown rice', '2'), ('Rice cakes', '3'),
+                                     ('Licorice', '4'), ('Price saver beans', '5')]])
+            # Refreshed most recently, but only a substring match
+            FoodItem.query.filter_by(barcode='4').first().refreshed_at = datetime.utcnow() + timedelta(minutes=5)
+            db.session.commit()
+
+            results, _ = catalog.search('rice')
+
+            assert [r['barcode'] for r in results] == ['1', '3', '2']
+
+    def test_upsert_updates_existing_barcode(self, app):
+        """Test re-fetching a product updates the existing row instead of duplicating it."""
+        with app.app_context():
+            search = NutritionSearch()
+            search.catalog.upsert_results([_off_product('Oat Milk', '123', calories=40)])
+            search.catalog.upsert_results([_off_product('Oat Milk', '123', calories=45)])
+
+            items = FoodItem.query.filter_by(barcode='123').all()
+            assert len(items) == 1
+            assert items[0].get_nutrition()['calories_per_100g'] == 45
+
+    def test_stale_barcode_served_and_refresh_scheduled(self, app, monkeypatch):
+        """Test stale entries are still returned while a refresh is scheduled."""
+        with app.app_context():
+            search = NutritionSearch()
+            search.catalog.upsert_results([_off_product('Granola', '456')])
+            item = FoodItem.query.filter_by(barcode='456').first()
+            item.refreshed_at = datetime.utcnow() - timedelta(days=30)
+            db.session.commit()
+
+            scheduled = []
+            monkeypatch.setattr(search.catalog, 'schedule_refresh', lambda **kw: scheduled.append(kw))
+
+            result = search.search_barcode('456')
+            assert result['barcode'] == '456'
+            assert scheduled == [{'barcode': '456'}]
+
+
+class TestSearchFanOut:
+
+    def test_sources_are_queried_concurrently(self, app, monkeypatch):
+        """Test both sources run in parallel rather than back to back."""
+        with app.app_context():
+            search = NutritionSearch()
+
+            def slow_off(query, **kwargs):
+                time.sleep(0.3)
+                return [_off_product('Lentil', '777')]
+
+            def slow_wiki(query, **kwargs):
+                time.sleep(0.3)
+                return [{'source': 'wikipedia', 'title': 'Lentil', 'url': '', 'snippet': '', 'nutrition': None}]
+
+            monkeypatch.setattr(search, 'search_openfoodfacts', slow_off)
+            monkeypatch.setattr(search, 'search_wikipedia', slow_wiki)
+
+            started = time.monotonic()
+            results = search.fetch_food('lentil')
+            assert time.monotonic() - started < 0.55
+            assert [r['source'] for r in results] == ['openfoodfacts', 'wikipedia']
+
+    def test_deadline_returns_partial_results(self, app, monkeypatch):
+        """Test a slow source is abandoned at the deadline and the rest is returned."""
+        with app.app_context():
+            app.config['NUTRITION_SEARCH_DEADLINE'] = 0.2
+            search = NutritionSearch()
+
+            def slow_wiki(query, **kwargs):
+                time.sleep(1)
+                return []
+
+            monkeypatch.setattr(search, 'search_openfoodfacts', lambda q, **kw: [_off_product('Quinoa', '888')])
+            monkeypatch.setattr(search, 'search_wikipedia', slow_wiki)
+
+            started = time.monotonic()
+            results = search.fetch_food('quinoa')
+            assert time.monotonic() - started < 0.6
+            assert [r['barcode'] for r in results] == ['888']
+
+
+class _FakeResponse:
+
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self._payload = payload or {}
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f"HTTP {self.status_code}")
+
+
+class TestSearchCache:
+
+    def test_unknown_barcode_is_negatively_cached(self, app, monkeypatch):
+        """Test a not-found barcode is cached so repeat lookups skip the network."""
+        with app.app_context():
+            app.config['DISABLE_EXTERNAL_CALLS'] = False
+            search = NutritionSearch()
+            search.cache.clear()
+
+            calls = []
+
+            def fake_get(url, **kwargs):
+                calls.append(url)
+                return _FakeResponse(200, {'status': 0})
+
+            monkeypatch.setattr('services.nutrition_search.requests.get', fake_get)
+
+            assert search.search_barcode('999') is None
+            assert search.search_barcode('999') is None
+            assert len(calls) == 1
+
+            stats = search.cache.stats()
+            assert stats['negative_hits'] == 1
+            assert stats['misses'] == 1
+
+    def test_errors_are_not_cached(self, app, monkeypatch):
+        """Test transport errors are retried instead of cached as misses."""
+        with app.app_context():
+            app.config['DISABLE_EXTERNAL_CALLS'] = False
+            search = NutritionSearch()
+            search.cache.clear()
+
+            calls = []
+
+            def fake_get(url, **kwargs):
+                calls.append(url)
+                return _FakeResponse(503)
+
+            monkeypatch.setattr('services.nutrition_search.requests.get', fake_get)
+
+            assert search.search_openfoodfacts('Rice') == []
+            assert search.search_openfoodfacts('rice') == []
+            assert len(calls) == 2
+
+    def test_local_cache_is_bounded(self, app):
+        """Test the in-process fallback evicts the oldest entries past max_entries."""
+        with app.app_context():
+            from services.search_cache import SearchCache
+
+            cache = SearchCache(ttl=60, negative_ttl=10, max_entries=2)
+            for name in ['a', 'b', 'c']:
+                cache._local_set(cache.make_key('test', name), '[1]', 60)
+
+            assert len(cache._local) == 2
+            assert cache._local_get(cache.make_key('test', 'a')) is None
+
+    def test_counters_are_flushed_in_batches(self, app, monkeypatch):
+        """Test hit and miss counters reach Redis in one pipelined write instead of one call per lookup."""
+        from services import search_cache
+        from services.search_cache import SearchCache
+
+        writes = []
+
+        class _Pipeline:
+            def __init__(self):
+                self.commands = []
+
+            def hincrby(self, key, field, amount):
+                self.commands.append((field, amount))
+
+            def execute(self):
+                writes.append(dict(self.commands))
+
+        class _Redis:
+            def get(self, key):
+                return b'[1]'
+
+            def pipeline(self):
+                return _Pipeline()
+
+            def hgetall(self, key):
+                return {}
+
+            def zcard(self, key):
+                return 0
+
+        monkeypatch.setattr(search_cache, 'get_redis', lambda: _Redis())
+        with app.app_context():
+            cache = SearchCache(ttl=60, negative_ttl=10, max_entries=2)
+            for _ in range(3):
+                assert cache.get('test', 'oats') == (True, [1])
+            assert writes == []
+
+            cache.stats()
+            assert writes == [{'hits': 3}]
+
@@ -0,0 +1,637 @@
+import json
+import threading
+import time
+import pytest
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from sqlalchemy import event
+from extensions import db
+from models import GlobalSettings, Settings, User
+from services.http_pool import get_session, get_timeout, pool_stats
+from services.ollama_client import (
+    AdmissionController, OllamaBusyError, OllamaClient, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE,
+    PRIORITY_VISION, get_admission_controller, get_pull_controller
+)
+from services.ollama_health import OllamaHealth
+from services.model_warmup import ModelWarmup
+from services.ollama_pool import OllamaPool, PooledOllamaClient
+from services import model_pulls
+from services.model_pulls import ModelPulls
+from services.coach_prompt_cache import CoachPromptCache
+from services.ollama_metrics import record_timings, reset_timings, timing_stats
+
+
+class _TagsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    paths = []
+    bodies = []
+
+    def do_GET(self):
+        self._reply(b'{"models": [{"name": "llava"}]}')
+
+    def do_POST(self):
+        self.bodies.append(json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0)))))
+        if self.path == '/api/pull':
+            # Streamed progress, one JSON object per line
+            self._reply(b'{"status": "pulling manifest"}\n'
+                        b'{"status": "downloading", "total": 200, "completed": 50}\n'
+                        b'{"status": "success"}\n')
+        elif self.path == '/api/generate' and self.bodies[-1].get('stream'):
+            self._reply(b'{"response": "Hello", "done": false}\n'
+                        b'{"response": "", "done": true, "context": [1, 2, 3], "prompt_eval_count": 12,'
+                        b' "prompt_eval_duration": 6000000, "eval_count": 4, "eval_duration": 2000000}\n')
+        else:
+            self._reply(b'{"status": "success"}')
+
+    def _reply(self, body):
+        self.paths.append(self.path)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def ollama_server():
+    """Minimal local server answering /api/tags over keep-alive connections."""
+    _TagsHandler.paths = []
+    _TagsHandler.bodies = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _TagsHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+class TestPooledSessions:
+
+    def test_clients_share_session_per_base_url(self, app):
+        """Test clients for the same host reuse one session regardless of trailing slash."""
+        with app.app_context():
+            first = OllamaClient('http://ollama.test:11434')
+            second = OllamaClient('http://ollama.test:11434/')
+            other = OllamaClient('http://other.test:11434')
+
+            assert first.session is second.session
+            assert first.session is not other.session
+            assert first.session is get_session('http://ollama.test:11434')
+
+    def test_connection_is_reused(self, app, ollama_server):
+        """Test repeated calls go over one keep-alive connection."""
+        with app.app_context():
+            for _ in range(3):
+                assert OllamaClient(ollama_server).test_connection() is True
+
+            stats = pool_stats()[ollama_server]
+            assert stats['requests_sent'] == 3
+            assert stats['connections_opened'] == 1
+            assert stats['idle_connections'] == 1
+
+    def test_separate_connect_and_read_timeouts(self, app):
+        """Test timeouts come from config, with an overridable read timeout."""
+        with app.app_context():
+            app.config.update(OLLAMA_CONNECT_TIMEOUT=2, OLLAMA_READ_TIMEOUT=90)
+
+            assert get_timeout() == (2, 90)
+            assert get_timeout(10) == (2, 10)
+
+
+@pytest.fixture
+def query_count(app):
+    """Count SQL statements executed against the test database."""
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', count)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', count)
+
+
+@pytest.fixture(autouse=True)
+def clear_user_config(app):
+    with app.app_context():
+        OllamaClient.invalidate_user_config()
+        OllamaPool.invalidate()
+    yield
+
+
+def _user_id(username='testuser'):
+    return User.query.filter_by(username=username).first().id
+
+
+class TestUserConfigResolution:
+
+    def test_client_and_models_share_one_lookup(self, app, user, query_count):
+        """Test URL and models are resolved once and reused across requests."""
+        with app.app_context():
+            user_id = _user_id()
+            del query_count[:]
+
+            client = OllamaClient.from_user_settings(user_id)
+            models = OllamaClient.get_user_models(user_id)
+            first_lookup = len(query_count)
+
+            assert client.base_url == 'http://localhost:11434'
+            assert models['chat_model'] == app.config['DEFAULT_CHAT_MODEL']
+            assert 0 < first_lookup <= 3
+
+        with app.app_context():
+            OllamaClient.from_user_settings(user_id)
+            OllamaClient.get_user_models(user_id)
+            assert len(query_count) == first_lookup
+
+    def test_saving_settings_invalidates(self, app, user):
+        """Test invalidate_user_config makes saved settings visible immediately."""
+        with app.app_context():
+            user_id = _user_id()
+            assert OllamaClient.get_user_models(user_id)['vision_model'] == app.config['DEFAULT_VISION_MODEL']
+
+            settings = Settings.query.filter_by(user_id=user_id).first()
+            settings.vision_model = 'llava:13b'
+            settings.ollama_url = 'http://gpu-box:11434'
+            db.session.commit()
+            OllamaClient.invalidate_user_config(user_id)
+
+            assert OllamaClient.get_user_models(user_id)['vision_model'] == 'llava:13b'
+            assert OllamaClient.from_user_settings(user_id).base_url == 'http://gpu-box:11434'
+
+    def test_falls_back_to_admin_settings(self, app):
+        """Test users without settings inherit the admin's URL and models."""
+        with app.app_context():
+            admin = User(username='admin', is_admin=True)
+            admin.set_password('adminpass123')
+            member = User(username='member')
+            member.set_password('memberpass123')
+            db.session.add_all([admin, member])
+            db.session.commit()
+            db.session.add(Settings(user_id=admin.id, ollama_url='http://admin-box:11434', chat_model='mistral'))
+            db.session.commit()
+
+            config = OllamaClient.resolve_user_config(member.id)
+            assert config['ollama_url'] == 'http://admin-box:11434'
+            assert config['chat_model'] == 'mistral'
+            assert config['vision_model'] == app.config['DEFAULT_VISION_MODEL']
+
+
+class TestOllamaHealth:
+
+    def test_probe_records_status_latency_and_models(self, app, ollama_server):
+        """Test a probe stores availability, latency and the host's models."""
+        with app.app_context():
+            status = OllamaHealth.probe(ollama_server)
+
+            assert status['available'] is True
+            assert status['models'] == ['llava']
+            assert status['latency_ms'] is not None
+            assert OllamaHealth.get_status(ollama_server + '/')['models'] == ['llava']
+
+    def test_cached_status_is_read_without_probing(self, app, ollama_server, monkeypatch):
+        """Test hot paths read the recorded status instead of calling Ollama."""
+        with app.app_context():
+            OllamaHealth.probe(ollama_server)
+
+            def fail(*args, **kwargs):
+                raise AssertionError('cached status should not trigger a probe')
+
+            monkeypatch.setattr(OllamaHealth, 'probe', staticmethod(fail))
+            assert OllamaHealth.is_available(ollama_server) is True
+
+    def test_unreachable_host_is_recorded_down(self, app):
+        """Test a refused connection is cached as unavailable with its error."""
+        with app.app_context():
+            url = 'http://127.0.0.1:9'
+
+            assert OllamaHealth.is_available(url) is False
+            assert OllamaHealth.get_status(url)['error']
+
+    def test_probe_does_not_use_connect_retries(self, app):
+        """Test an inline probe of a down host is one attempt, not the pooled retries with backoff."""
+        with app.app_context():
+            app.config.update(OLLAMA_CONNECT_RETRIES=3, OLLAMA_RETRY_BACKOFF=1)
+            started = time.monotonic()
+
+            assert OllamaHealth.is_available('http://127.0.0.1:7') is False
+            assert time.monotonic() - started < 1
+
+
+class TestModelListCache:
+
+    def test_listing_is_cached_per_base_url(self, app, ollama_server):
+        """Test a fresh listing is served without calling Ollama again."""
+        with app.app_context():
+            assert OllamaClient(ollama_server).list_models()[0]['name'] == 'llava'
+            assert OllamaClient(ollama_server + '/').list_models()[0]['name'] == 'llava'
+
+            assert _TagsHandler.paths == ['/api/tags']
+
+    def test_stale_listing_served_while_revalidating(self, app, ollama_server):
+        """Test a stale listing is returned immediately and refreshed in the background."""
+        with app.app_context():
+            app.config['OLLAMA_MODELS_CACHE_TTL'] = 0
+            client = OllamaClient(ollama_server)
+            client.list_models()
+
+            assert client.list_models()[0]['name'] == 'llava'
+            for _ in range(50):
+                if len(_TagsHandler.paths) == 2:
+                    break
+                time.sleep(0.02)
+            assert _TagsHandler.paths == ['/api/tags', '/api/tags']
+
+    def test_pull_invalidates_listing(self, app, ollama_server):
+        """Test pulling a model drops the cached listing for that host."""
+        with app.app_context():
+            client = OllamaClient(ollama_server)
+            client.list_models()
+
+            assert client.pull_model('mistral') is True
+            client.list_models()
+            assert _TagsHandler.paths == ['/api/tags', '/api/pull', '/api/tags']
+
+    def test_capabilities_are_cached_and_revalidated(self, app, ollama_server):
+        """Test /api/show is asked once per model, even when Ollama reports no capabilities, then refreshed in the background."""
+        with app.app_context():
+            client = OllamaClient(ollama_server)
+            assert client.model_capabilities('llama3') is None
+            assert OllamaClient(ollama_server + '/').model_capabilities('llama3') is None
+            assert _TagsHandler.paths == ['/api/show']
+
+            app.config['OLLAMA_MODELS_CACHE_TTL'] = 0
+            assert client.model_capabilities('llama3') is None
+            for _ in range(50):
+                if len(_TagsHandler.paths) == 2:
+                    break
+                time.sleep(0.02)
+            assert _TagsHandler.paths == ['/api/show', '/api/show']
+
+
+class TestModelWarmup:
+
+    @pytest.mark.parametrize('spec,hour,active', [
+        ('6-23', 5, False),
+        ('6-23', 10, True),
+        ('22-2', 23, True),
+        ('22-2', 1, True),
+        ('22-2', 12, False),
+        ('', 3, True)
+    ])
+    def test_active_hours(self, app, spec, hour, active):
+        """Test active-hour windows, including ones that wrap past midnight."""
+        with app.app_context():
+            app.config['OLLAMA_ACTIVE_HOURS'] = spec
+            assert ModelWarmup.in_active_hours(datetime(2024, 1, 1, hour)) is active
+
+    def test_warm_all_loads_available_models_with_keep_alive(self, app, ollama_server):
+        """Test configured models present on the host are preloaded with keep_alive."""
+        with app.app_context():
+            app.config.update(
+                OLLAMA_URL=ollama_server,
+                DEFAULT_CHAT_MODEL='llama2',  # not on the server, skipped
+                DEFAULT_VISION_MODEL='llava',
+                OLLAMA_KEEP_ALIVE='45m'
+            )
+
+            assert ModelWarmup.warm_all() == 1
+            assert _TagsHandler.bodies == [{'model': 'llava', 'keep_alive': '45m'}]
+
+    def test_targets_cover_every_pool_host(self, app, user):
+        """Test each pooled model is warmed on both pool hosts, and a user's own host keeps its model."""
+        with app.app_context():
+            app.config.update(OLLAMA_URL='http://localhost:11434', DEFAULT_CHAT_MODEL='llama2',
+                              DEFAULT_VISION_MODEL='llava')
+            hosts = ['http://warm-a:11434', 'http://warm-b:11434']
+            setting = GlobalSettings(key='ollama_pool', category='ollama')
+            setting.set_value(hosts)
+            db.session.add(setting)
+            settings = Settings.query.filter_by(user_id=_user_id()).first()
+            settings.ollama_url = 'http://my-own-box:11434'
+            settings.chat_model = 'mistral'
+            db.session.commit()
+
+            targets = ModelWarmup.targets()
+            for host in hosts:
+                assert (host, 'llama2') in targets
+                assert (host, 'llava') in targets
+                assert (host, 'mistral') not in targets
+            assert ('http://my-own-box:11434', 'mistral') in targets
+
+    def test_chat_sends_keep_alive(self, app, ollama_server):
+        """Test chat requests carry an explicit keep_alive."""
+        with app.app_context():
+            app.config['OLLAMA_KEEP_ALIVE'] = '45m'
+            list(OllamaClient(ollama_server).chat([{'role': 'user', 'content': 'hi'}], 'llama2'))
+
+            assert _TagsHandler.bodies[0]['keep_alive'] == '45m'
+
+
+class TestAdmissionControl:
+
+    def _hold(self, controller, priority, order, hold=0.1):
+        with controller.slot(priority):
+            order.append(priority)
+            time.sleep(hold)
+
+    def test_queued_requests_admitted_by_priority(self):
+        """Test waiting chat requests are admitted ahead of earlier background ones."""
+        controller = AdmissionController('http://ollama.test', max_concurrent=1, max_queue=4, queue_timeout=5)
+        order = []
+
+        controller.acquire(PRIORITY_INTERACTIVE)  # occupy the only slot
+        threads = []
+        for priority in (PRIORITY_BACKGROUND, PRIORITY_VISION, PRIORITY_INTERACTIVE):
+            thread = threading.Thread(target=self._hold, args=(controller, priority, order, 0.01))
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.05)  # make arrival order deterministic
+
+        assert controller.stats()['queue_depth'] == 3
+        controller.release()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert order == [PRIORITY_INTERACTIVE, PRIORITY_VISION, PRIORITY_BACKGROUND]
+        assert controller.stats()['admitted'] == 4
+
+    def test_full_queue_rejects_with_retry_after(self):
+        """Test a full queue raises immediately with a retry-after hint."""
+        controller = AdmissionController('http://ollama.test', max_concurrent=1, max_queue=0, queue_timeout=5)
+        controller.acquire(PRIORITY_VISION)
+
+        started = time.monotonic()
+        with pytest.raises(OllamaBusyError) as excinfo:
+            controller.acquire(PRIORITY_INTERACTIVE)
+        assert time.monotonic() - started < 0.1
+        assert excinfo.value.retry_after >= 1
+        assert controller.stats()['rejected'] == 1
+
+    def test_wait_times_out(self):
+        """Test a queued request gives up after queue_timeout and leaves the queue."""
+        controller = AdmissionController('http://ollama.test', max_concurrent=1, max_queue=2, queue_timeout=0.1)
+        controller.acquire(PRIORITY_INTERACTIVE)
+
+        with pytest.raises(OllamaBusyError):
+            controller.acquire(PRIORITY_BACKGROUND)
+        stats = controller.stats()
+        assert stats['timed_out'] == 1
+        assert stats['queue_depth'] == 0
+
+    def test_abandoned_chat_stream_releases_slot(self, app, ollama_server):
+        """Test closing a chat stream early frees its admission slot."""
+        with app.app_context():
+            client = OllamaClient(ollama_server)
+            controller = get_admission_controller(ollama_server)
+
+            chunks = client.chat([{'role': 'user', 'content': 'hi'}], 'llama2', stream=True)
+            assert controller.stats()['active'] == 1
+            chunks.close()
+            assert controller.stats()['active'] == 0
+
+
+def _record_health(host, models, available=True):
+    OllamaHealth._store(host, {
+        'base_url': host, 'available': available, 'latency_ms': 1.0, 'models': models,
+        'error': None, 'checked_at': datetime.utcnow().isoformat(), 'checked_at_ts': time.time()
+    })
+
+
+class TestOllamaPool:
+
+    def test_routes_to_least_outstanding_host(self, app):
+        """Test a new request goes to the host with fewer requests in flight."""
+        with app.app_context():
+            hosts = ['http://lor-a:11434', 'http://lor-b:11434']
+            for host in hosts:
+                _record_health(host, ['llama2'])
+            pool = OllamaPool(hosts)
+
+            with pool.track(hosts[0]):
+                assert pool.pick('llama2') == hosts[1]
+                with pool.track(hosts[1]), pool.track(hosts[1]):
+                    assert pool.pick('llama2') == hosts[0]
+            assert pool.stats()[hosts[0]]['outstanding'] == 0
+
+    def test_only_hosts_with_the_model_are_used(self, app):
+        """Test selection is limited to hosts whose model list has the model."""
+        with app.app_context():
+            hosts = ['http://model-a:11434', 'http://model-b:11434', 'http://model-c:11434']
+            _record_health(hosts[0], ['llama2'])
+            _record_health(hosts[1], ['llava:latest'])
+            _record_health(hosts[2], ['llava'], available=False)
+            pool = OllamaPool(hosts)
+
+            assert pool.candidates('llava') == [hosts[1]]
+            # Nobody has it yet: any reachable host rather than none
+            assert sorted(pool.candidates('mistral')) == hosts[:2]
+
+    def test_failed_host_cools_down_and_request_fails_over(self, app, ollama_server, tmp_path):
+        """Test an unreachable host is skipped after a failure and vision retries elsewhere."""
+        with app.app_context():
+            app.config['OLLAMA_CONNECT_RETRIES'] = 0
+            dead = 'http://127.0.0.1:1'  # not yet known to the health prober
+            pool = OllamaPool([dead, ollama_server])
+            image = tmp_path / 'meal.jpg'
+            image.write_bytes(b'jpeg')
+
+            result = PooledOllamaClient(pool).vision_analyze(str(image), 'llava')
+
+            assert result is not None
+            assert _TagsHandler.bodies[0]['model'] == 'llava'
+            assert pool.in_cooldown(dead)
+            assert pool.stats()[dead]['failures'] >= 1
+            assert pool.pick('llava') == ollama_server
+
+    def test_stream_fails_over_from_unreachable_host(self, app, ollama_server):
+        """Test a refused connection puts the host in cooldown and the stream opens on the next one."""
+        with app.app_context():
+            app.config['OLLAMA_CONNECT_RETRIES'] = 0
+            dead = 'http://127.0.0.1:2'
+            pool = OllamaPool([dead, ollama_server])
+            client = PooledOllamaClient(pool)
+
+            chunks = client.generate('hi', 'llama2')
+            assert pool.in_cooldown(dead)
+            assert pool.stats()[ollama_server]['outstanding'] == 1
+            assert list(chunks) == ['Hello']
+            assert pool.stats()[dead]['outstanding'] == 0
+            assert pool.stats()[ollama_server]['outstanding'] == 0
+
+    def test_stream_with_no_reachable_host_yields_error(self, app):
+        """Test a chat with every pool host down is an error message, not an exception."""
+        with app.app_context():
+            app.config['OLLAMA_CONNECT_RETRIES'] = 0
+            pool = OllamaPool(['http://127.0.0.1:3', 'http://127.0.0.1:4'])
+
+            chunks = list(PooledOllamaClient(pool).chat([{'role': 'user', 'content': 'hi'}], 'llama2', stream=True))
+            assert len(chunks) == 1
+            assert chunks[0].startswith('Error communicating with AI')
+            assert all(pool.in_cooldown(host) for host in pool.hosts)
+
+    def test_from_user_settings_returns_pooled_client(self, app, user):
+        """Test users on the stock URL get the pool; a custom URL outside it is kept."""
+        with app.app_context():
+            setting = GlobalSettings(key='ollama_pool', category='ollama')
+            setting.set_value(['http://pool-a:11434', 'http://pool-b:11434'])
+            db.session.add(setting)
+            db.session.commit()
+            user_id = _user_id()
+
+            client = OllamaClient.from_user_settings(user_id)
+            assert isinstance(client, PooledOllamaClient)
+            assert client.base_url in client.pool.hosts
+
+            settings = Settings.query.filter_by(user_id=user_id).first()
+            settings.ollama_url = 'http://my-own-box:11434'
+            db.session.commit()
+            OllamaClient.invalidate_user_config(user_id)
+
+            client = OllamaClient.from_user_settings(user_id)
+            assert not isinstance(client, PooledOllamaClient)
+            assert client.base_url == 'http://my-own-box:11434'
+
+
+class TestModelPulls:
+
+    def _wait_for(self, base_url, model, timeout=5):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            progress = ModelPulls.get_progress(base_url, model)
+            if progress['status'] not in model_pulls.ACTIVE_STATUSES:
+                return progress
+            time.sleep(0.02)
+        raise AssertionError('pull did not finish')
+
+    def test_pull_streams_progress_events(self, app, ollama_server):
+        """Test pull_model reports each streamed event and succeeds on the final one."""
+        with app.app_context():
+            events = []
+            assert OllamaClient(ollama_server).pull_model('mistral', on_progress=events.append) is True
+            assert [event['status'] for event in events] == ['pulling manifest', 'downloading', 'success']
+            assert _TagsHandler.bodies[-1] == {'name': 'mistral', 'stream': True}
+
+    def test_pull_holds_pull_slot(self, app, ollama_server):
+        """Test a pull shows as active on the host's pull queue, not its generation queue, until it ends."""
+        with app.app_context():
+            pulls = get_pull_controller(ollama_server)
+            generation = get_admission_controller(ollama_server)
+            admitted = pulls.stats()['admitted']
+            active = []
+            assert OllamaClient(ollama_server).pull_model(
+                'mistral', on_progress=lambda event: active.append(
+                    (pulls.stats()['active'], generation.stats()['active']))) is True
+            assert active == [(1, 0), (1, 0), (1, 0)]
+            assert pulls.stats()['active'] == 0
+            assert pulls.stats()['admitted'] == admitted + 1
+
+    def test_pull_on_saturated_host_raises_busy(self, app, ollama_server, monkeypatch):
+        """Test a pull is refused with OllamaBusyError when the host has no pull slot to give."""
+        controller = AdmissionController(ollama_server, max_concurrent=1, max_queue=0, queue_timeout=0.1)
+        monkeypatch.setattr('services.ollama_client.get_pull_controller', lambda base_url: controller)
+        controller.acquire(PRIORITY_BACKGROUND)
+        with app.app_context():
+            with pytest.raises(OllamaBusyError):
+                OllamaClient(ollama_server).pull_model('mistral')
+        assert '/api/pull' not in _TagsHandler.paths
+
+    def test_pull_renews_claim_on_progress(self, app, ollama_server, monkeypatch):
+        """Test a running pull renews its claim each time it records progress."""
+        refreshed = []
+        monkeypatch.setattr(ModelPulls, '_refresh_claim', staticmethod(refreshed.append))
+        with app.app_context():
+            app.config['OLLAMA_PULL_PROGRESS_INTERVAL'] = 0
+            model_pulls._run_pull(app, ollama_server, 'gemma')
+            assert ModelPulls.get_progress(ollama_server, 'gemma')['status'] == model_pulls.STATUS_COMPLETE
+        assert refreshed == [ModelPulls._key(ollama_server, 'gemma')] * 3
+
+    def test_background_pull_records_progress(self, app, ollama_server):
+        """Test a started pull runs off the request thread and ends complete."""
+        with app.app_context():
+            app.config['OLLAMA_PULL_PROGRESS_INTERVAL'] = 0
+            progress, started = ModelPulls.start(ollama_server, 'phi3')
+            assert started is True
+            assert progress['status'] == model_pulls.STATUS_PENDING
+
+            progress = self._wait_for(ollama_server, 'phi3')
+            assert progress['status'] == model_pulls.STATUS_COMPLETE
+            assert progress['total'] == 200
+            assert progress['percent'] == 100.0
+
+    def test_duplicate_pull_is_joined(self, app, monkeypatch):
+        """Test a second request for a running pull returns it instead of starting another."""
+        submitted = []
+
+        class _Executor:
+            def submit(self, *args):
+                submitted.append(args)
+
+        monkeypatch.setattr(model_pulls, '_get_pull_executor', lambda: _Executor())
+        with app.app_context():
+            host = 'http://pull-dedupe:11434'
+            first, started = ModelPulls.start(host, 'llava')
+            second, started_again = ModelPulls.start(host + '/', 'llava')
+
+            assert started is True
+            assert started_again is False
+            assert second['started_at'] == first['started_at']
+            assert len(submitted) == 1
+
+
+class TestPromptReuse:
+
+    def test_timings_are_aggregated(self):
+        """Test prompt-eval and eval durations are summed and averaged per host, model and kind."""
+        reset_timings()
+        for prompt_tokens in (100, 20):
+            record_timings('http://ollama:11434/', 'llama3', 'chat', {
+                'prompt_eval_count': prompt_tokens, 'prompt_eval_duration': prompt_tokens * 1_000_000,
+                'eval_count': 10, 'eval_duration': 50_000_000
+            })
+        record_timings('http://ollama:11434', 'llama3', 'chat', {'status': 'success'})
+
+        [stats] = timing_stats()
+        assert stats['host'] == 'http://ollama:11434'
+        assert stats['requests'] == 2
+        assert stats['avg_prompt_tokens'] == 60
+        assert stats['avg_prompt_eval_ms'] == 60
+        assert stats['eval_tokens_per_second'] == 200
+
+    def test_generate_continues_from_cached_context(self, app, ollama_server):
+        """Test the next turn sends only the new message plus the returned context."""
+        with app.app_context():
+            reset_timings()
+            client = OllamaClient(ollama_server)
+            history = [{'role': 'user', 'content': 'I want more protein'},
+                       {'role': 'assistant', 'content': 'Try eggs'}]
+
+            first = ''.join(CoachPromptCache.chat(client, 1, 'llama3', 'Be brief.', history + [
+                {'role': 'user', 'content': 'And lunch?'}]))
+            ''.join(CoachPromptCache.chat(client, 1, 'llama3', 'Be brief.', [
+                {'role': 'user', 'content': 'Thanks'}]))
+
+            cold, warm = _TagsHandler.bodies
+            assert first == 'Hello'
+            assert 'User: I want more protein' in cold['system'] and 'context' not in cold
+            assert warm['context'] == [1, 2, 3] and 'system' not in warm
+            assert warm['prompt'] == 'Thanks'
+            assert {s['kind'] for s in timing_stats()} == {'generate', 'generate_context'}
+
+    def test_changed_context_starts_over(self, app, ollama_server):
+        """Test a different system prompt or a cleared history does not reuse the context."""
+        with app.app_context():
+            client = OllamaClient(ollama_server)
+            message = [{'role': 'user', 'content': 'Hi'}]
+
+            ''.join(CoachPromptCache.chat(client, 2, 'llama3', 'Weight: 80kg', message))
+            ''.join(CoachPromptCache.chat(client, 2, 'llama3', 'Weight: 79kg', message))
+            CoachPromptCache.invalidate(2)
+            ''.join(CoachPromptCache.chat(client, 2, 'llama3', 'Weight: 79kg', message))
+
+            assert all('context' not in body for body in _TagsHandler.bodies)
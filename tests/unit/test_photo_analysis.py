@@ -0,0 +1,189 @@
+import json
+import time
+import pytest
+from api.routes import _analyze_food_photo
+from extensions import db
+from models import Notification, Photo, User
+from services.nutrition_search import NutritionSearch
+from services.ollama_client import OllamaClient
+from services.ollama_health import OllamaHealth
+from services.photo_jobs import PhotoAnalysisJobs
+from services.search_cache import SearchCache
+
+
+class _FakeResponse:
+
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self._payload = payload or {}
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f"HTTP {self.status_code}")
+
+
+class _FakeVisionClient:
+    base_url = 'http://ollama.test'
+
+    def __init__(self, items):
+        self.items = items
+
+    def is_available(self):
+        return True
+
+    def vision_analyze(self, image_path, model, prompt=None):
+        return json.dumps(self.items)
+
+
+@pytest.fixture
+def vision_items(monkeypatch):
+    """Stub the Ollama vision call to return two food items."""
+    items = [
+        {'name': 'oatmeal', 'portion_grams': 150, 'confidence': 0.9},
+        {'name': 'blueberries', 'portion_grams': 50, 'confidence': 0.8}
+    ]
+    client = _FakeVisionClient(items)
+    monkeypatch.setattr(OllamaHealth, 'is_available', staticmethod(lambda base_url: True))
+    monkeypatch.setattr(OllamaClient, 'from_user_settings', classmethod(lambda cls, user_id=None: client))
+    monkeypatch.setattr(OllamaClient, 'get_user_models', staticmethod(
+        lambda user_id=None: {'chat_model': 'llama2', 'vision_model': 'llava', 'system_prompt': None}
+    ))
+    return items
+
+
+@pytest.fixture
+def outbound_requests(app, monkeypatch):
+    """Count nutrition HTTP requests; Open Food Facts answers, Wikipedia 404s.
+
+    The search cache is bypassed so the count reflects how often the
+    pipeline searches, not how well repeats are cached.
+    """
+    app.config['DISABLE_EXTERNAL_CALLS'] = False
+    monkeypatch.setattr(SearchCache, 'get', lambda self, namespace, query: (False, None))
+    calls = []
+
+    def fake_get(url, params=None, **kwargs):
+        calls.append(url)
+        if 'search.pl' in url:
+            product = {
+                'product_name': params['search_terms'].title(),
+                'brands': 'Acme',
+                'code': f"code-{params['search_terms']}",
+                'nutriments': {'energy-kcal_100g': 200, 'proteins_100g': 10}
+            }
+            return _FakeResponse(200, {'products': [product]})
+        return _FakeResponse(404)
+
+    monkeypatch.setattr('services.nutrition_search.requests.get', fake_get)
+    return calls
+
+
+class TestPhotoAnalysisPipeline:
+
+    def test_one_search_per_detected_item(self, app, vision_items, outbound_requests):
+        """Test each vision item costs one search (Open Food Facts + Wikipedia) per photo."""
+        with app.app_context():
+            candidates, meta = _analyze_food_photo('unused.jpg', photo_id=0)
+
+            assert meta['source'] == 'vision'
+            assert [c['name'] for c in candidates] == ['oatmeal', 'blueberries']
+            assert len(outbound_requests) == 2 * len(vision_items)
+
+    def test_nutrition_scaled_from_single_result(self, app, vision_items, outbound_requests):
+        """Test portion nutrition is derived from the one search result."""
+        with app.app_context():
+            candidates, _ = _analyze_food_photo('unused.jpg', photo_id=0)
+
+            oatmeal = candidates[0]
+            assert oatmeal['nutrition']['calories'] == pytest.approx(300)
+            assert oatmeal['nutrition']['protein_g'] == pytest.approx(15)
+            assert oatmeal['nutrition']['source'] == 'Oatmeal Acme'
+            assert oatmeal['search_results'][0]['barcode'] == 'code-oatmeal'
+
+    def test_items_enriched_concurrently(self, app, vision_items, monkeypatch):
+        """Test per-item searches overlap instead of running one after another."""
+        with app.app_context():
+            def slow_search(self, query):
+                time.sleep(0.3)
+                return []
+
+            monkeypatch.setattr(NutritionSearch, 'search_food', slow_search)
+
+            started = time.monotonic()
+            candidates, _ = _analyze_food_photo('unused.jpg', photo_id=0)
+            assert time.monotonic() - started < 0.55
+            assert len(candidates) == 2
+
+    def test_item_missing_deadline_gets_basic_estimate(self, app, vision_items, monkeypatch):
+        """Test a stalled lookup falls back to the basic estimate at the photo deadline."""
+        with app.app_context():
+            app.config['PHOTO_ENRICHMENT_DEADLINE'] = 0.2
+            off_result = {
+                'source': 'openfoodfacts', 'title': 'Oatmeal Acme',
+                'nutrition': {'calories_per_100g': 200}
+            }
+
+            def search(self, query):
+                if query == 'blueberries':
+                    time.sleep(1)
+                return [off_result]
+
+            monkeypatch.setattr(NutritionSearch, 'search_food', search)
+
+            started = time.monotonic()
+            candidates, _ = _analyze_food_photo('unused.jpg', photo_id=0)
+            assert time.monotonic() - started < 0.6
+
+            oatmeal, blueberries = candidates
+            assert oatmeal['nutrition']['source'] == 'Oatmeal Acme'
+            assert blueberries['nutrition']['source'] == 'Generic estimate'
+            assert blueberries['search_results'] == []
+
+
+def _make_photo():
+    owner = User.query.filter_by(username='testuser').first()
+    photo = Photo(user_id=owner.id, filepath='unused.jpg')
+    db.session.add(photo)
+    db.session.commit()
+    return photo
+
+
+class TestPhotoAnalysisJobs:
+
+    def test_job_completes_and_notifies(self, app, user, vision_items, outbound_requests):
+        """Test a queued job stores candidates in Photo.analysis and notifies the user."""
+        with app.app_context():
+            photo = _make_photo()
+
+            future = PhotoAnalysisJobs.submit(photo, _analyze_food_photo)
+            assert PhotoAnalysisJobs.get_status(photo)['status'] in ('pending', 'processing', 'complete')
+            future.result(timeout=10)
+
+            db.session.refresh(photo)
+            status = PhotoAnalysisJobs.get_status(photo)
+            assert status['status'] == 'complete'
+            assert status['job_id'] == photo.id
+            assert [c['name'] for c in status['candidates']] == ['oatmeal', 'blueberries']
+            assert photo.get_analysis()['vision_items'] == vision_items
+
+            notification = Notification.query.filter_by(user_id=photo.user_id, category='photo_analyzed').one()
+            assert notification.get_action_data() == {'photo_id': photo.id, 'food_count': 2}
+
+    def test_job_without_candidates_fails(self, app, user):
+        """Test an analysis that finds nothing is reported as failed with its warning."""
+        with app.app_context():
+            photo = _make_photo()
+
+            def analyze(filepath, photo_id, user_id):
+                return [], {'source': None, 'warning': 'No vision model configured', 'errors': []}
+
+            PhotoAnalysisJobs.submit(photo, analyze).result(timeout=10)
+
+            db.session.refresh(photo)
+            status = PhotoAnalysisJobs.get_status(photo)
+            assert status['status'] == 'failed'
+            assert status['warning'] == 'No vision model configured'
+            assert Notification.query.filter_by(category='photo_analyzed').count() == 0
@@ -0,0 +1,67 @@
+from datetime import datetime
+from extensions import db
+from models import FoodLog, User
+from services.analytics import AnalyticsService
+from services.nutrition_rollup import NutritionRollup
+from services.recommendations import RecommendationService
+from services.request_memo import memo_counts
+
+
+def _user_id():
+    return User.query.filter_by(username='testuser').first().id
+
+
+def _log(user_id, calories):
+    log = FoodLog(user_id=user_id, custom_name='Oats', meal='breakfast', grams=60, calories=calories,
+                  source='manual', logged_at=datetime.utcnow())
+    db.session.add(log)
+    NutritionRollup.add(log)
+    db.session.commit()
+
+
+class TestRequestMemo:
+
+    def test_quick_actions_compute_each_summary_once(self, app, user):
+        """Test the quick-actions sequence runs every summary and target calculation once."""
+        with app.app_context():
+            user_id = _user_id()
+        with app.test_request_context():
+            RecommendationService.get_daily_summary(user_id)
+            RecommendationService.get_weekly_summary(user_id)
+            RecommendationService.get_progress_insights(user_id)
+
+            counts = memo_counts()
+            assert counts['RecommendationService.calculate_daily_targets'] == {'calls': 2, 'runs': 1}
+            assert counts['RecommendationService.get_weekly_summary'] == {'calls': 2, 'runs': 1}
+            assert counts['RecommendationService.get_daily_summary'] == {'calls': 1, 'runs': 1}
+
+    def test_defaults_share_an_entry_and_arguments_do_not(self, app, user):
+        """Test omitted defaults match explicit ones while other arguments get their own entry."""
+        with app.app_context():
+            user_id = _user_id()
+        with app.test_request_context():
+            AnalyticsService.get_top_foods(user_id)
+            AnalyticsService.get_top_foods(user_id, 30, 10)
+            AnalyticsService.get_top_foods(user_id, days=7)
+
+            assert memo_counts()['AnalyticsService.get_top_foods'] == {'calls': 3, 'runs': 2}
+
+    def test_commit_clears_the_memo(self, app, user):
+        """Test a write committed during the request is seen by the next call."""
+        with app.app_context():
+            user_id = _user_id()
+        with app.test_request_context():
+            assert RecommendationService.get_daily_summary(user_id)['totals']['calories'] == 0
+            _log(user_id, 250)
+            assert RecommendationService.get_daily_summary(user_id)['totals']['calories'] == 250
+
+    def test_requests_do_not_share_results(self, app, user):
+        """Test each request and plain app contexts compute afresh."""
+        with app.app_context():
+            user_id = _user_id()
+            RecommendationService.calculate_daily_targets(user_id)
+            assert memo_counts() == {}
+        for _ in range(2):
+            with app.test_request_context():
+                RecommendationService.calculate_daily_targets(user_id)
+                assert memo_counts()['RecommendationService.calculate_daily_targets'] == {'calls': 1, 'runs': 1}
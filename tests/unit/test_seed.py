@@ -0,0 +1,31 @@
+from sqlalchemy import func
+from extensions import db
+from models import DailyNutrition, FoodLog, TargetHistory
+from services.nutrition_rollup import NutritionRollup
+from tests.seed import create_sample_food_logs, create_sample_users
+
+
+class TestSeed:
+
+    def test_seeded_logs_are_rolled_up(self, app):
+        """Test the seeded daily totals match the seeded food logs."""
+        with app.app_context():
+            users = create_sample_users()
+            create_sample_food_logs(users)
+            db.session.commit()
+
+            logged = db.session.query(func.count(FoodLog.id), func.sum(FoodLog.calories)).one()
+            rolled_up = db.session.query(func.sum(DailyNutrition.log_count), func.sum(DailyNutrition.calories)).one()
+            assert logged[0] > 0
+            assert tuple(rolled_up) == tuple(logged)
+            assert NutritionRollup.check() == []
+
+    def test_seeded_profiles_have_targets(self, app):
+        """Test every seeded profile starts with a recorded target history row."""
+        with app.app_context():
+            users = create_sample_users()
+            db.session.commit()
+
+            assert users
+            for user in users:
+                assert TargetHistory.query.filter_by(user_id=user.id).count() == 1
@@ -0,0 +1,38 @@
+import json
+from services.sse import CoalescingSSEWriter, sse_event
+
+
+def _contents(frames):
+    return [json.loads(frame[len('data: '):])['content'] for frame in frames]
+
+
+class TestCoalescingSSEWriter:
+
+    def test_first_chunk_is_sent_immediately(self, app):
+        """Test the first token gets its own frame and the rest are batched."""
+        with app.app_context():
+            writer = CoalescingSSEWriter(iter(['Hi', ' there', ',', ' friend']), flush_interval=60, flush_bytes=1024)
+            frames = list(writer)
+
+            assert _contents(frames) == ['Hi', ' there, friend']
+            assert writer.text == 'Hi there, friend'
+            assert writer.frames_sent == 2
+
+    def test_byte_threshold_flushes(self, app):
+        """Test a frame goes out once enough characters are buffered."""
+        with app.app_context():
+            writer = CoalescingSSEWriter(iter(['a', 'bb', 'cc', 'dd', 'e']), flush_interval=60, flush_bytes=4)
+
+            assert _contents(writer) == ['a', 'bbcc', 'dde']
+
+    def test_zero_interval_sends_every_chunk(self, app):
+        """Test a zero window degrades to one frame per chunk."""
+        with app.app_context():
+            writer = CoalescingSSEWriter(iter(['a', '', 'b', 'c']), flush_interval=0, flush_bytes=1024)
+
+            assert _contents(writer) == ['a', 'b', 'c']
+
+    def test_frames_are_event_stream_formatted(self):
+        """Test frames end with a blank line and carry optional id/event fields."""
+        assert sse_event({'done': True}) == 'data: {"done": true}\n\n'
+        assert sse_event({'n': 1}, event='progress', event_id='7') == 'id: 7\nevent: progress\ndata: {"n": 1}\n\n'
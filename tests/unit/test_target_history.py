@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+from extensions import db
+from models import Profile, TargetHistory, User
+from services.recommendations import RecommendationService
+
+
+def _profile():
+    user_id = User.query.filter_by(username='testuser').first().id
+    return Profile.query.filter_by(user_id=user_id).first()
+
+
+class TestTargetHistory:
+
+    def test_targets_are_recorded_only_when_they_change(self, app, user):
+        """Test re-recording unchanged targets adds nothing and a new weight adds a row."""
+        with app.app_context():
+            profile = _profile()
+            first = RecommendationService.record_targets(profile)
+            db.session.commit()
+            assert RecommendationService.record_targets(profile) is first
+
+            profile.weight_kg = 85
+            RecommendationService.record_targets(profile)
+            db.session.commit()
+
+            history = TargetHistory.query.filter_by(user_id=profile.user_id).order_by(TargetHistory.id).all()
+            assert len(history) == 2
+            assert history[1].protein_g > history[0].protein_g
+            assert RecommendationService.calculate_daily_targets(profile.user_id) == history[1].to_dict()
+
+    def test_past_days_use_the_targets_in_effect_then(self, app, user):
+        """Test a summary for an earlier day is compared with that day's targets."""
+        with app.app_context():
+            profile = _profile()
+            today = datetime.utcnow().date()
+            RecommendationService.record_targets(profile, datetime.utcnow() - timedelta(days=10))
+            db.session.commit()
+            before = RecommendationService.calculate_daily_targets(profile.user_id)
+
+            profile.goal_type = 'lose'
+            RecommendationService.record_targets(profile, datetime.utcnow() - timedelta(days=2))
+            db.session.commit()
+
+            by_day = RecommendationService.targets_by_day(profile.user_id, today - timedelta(days=20), today)
+            assert by_day[today - timedelta(days=20)] == before
+            assert by_day[today - timedelta(days=3)] == before
+            assert by_day[today - timedelta(days=2)]['calories'] == before['calories'] - 500
+
+            past = RecommendationService.get_daily_summary(profile.user_id, today - timedelta(days=5))
+            assert past['targets'] == before
+            assert RecommendationService.get_daily_summary(profile.user_id)['targets']['calories'] == before['calories'] - 500
+
+    def test_profiles_without_history_fall_back_and_backfill(self, app, user):
+        """Test targets are computed from the profile until the backfill records them."""
+        with app.app_context():
+            profile = _profile()
+            computed = RecommendationService.targets_for_profile(profile)
+            assert RecommendationService.calculate_daily_targets(profile.user_id) == computed
+
+            assert RecommendationService.backfill_targets() == 1
+            assert RecommendationService.backfill_targets() == 0
+
+            entry = TargetHistory.query.filter_by(user_id=profile.user_id).one()
+            assert entry.effective_from == profile.created_at
+            assert entry.to_dict() == computed
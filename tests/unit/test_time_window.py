@@ -0,0 +1,68 @@
+from datetime import date, datetime
+from sqlalchemy import func
+from extensions import db
+from models import CoachMessage, FoodLog, Notification, Photo, User, WaterIntake, WeighIn
+from services.analytics import AnalyticsService
+from services.time_window import day_bounds, on_day, within_days
+
+
+def _user_id():
+    return User.query.filter_by(username='testuser').first().id
+
+
+class TestTimeWindow:
+
+    def test_day_bounds_are_half_open(self):
+        """Test the range runs from midnight of the first day to midnight after the last."""
+        assert day_bounds(date(2024, 2, 28), date(2024, 2, 29)) == (datetime(2024, 2, 28), datetime(2024, 3, 1))
+        assert day_bounds(date(2024, 12, 31), date(2024, 12, 31)) == (datetime(2024, 12, 31), datetime(2025, 1, 1))
+
+    def test_matches_date_filter_at_the_edges(self, app, user):
+        """Test the range predicate selects the same rows as filtering on date()."""
+        with app.app_context():
+            user_id = _user_id()
+            for stamp in [datetime(2024, 3, 9, 23, 59, 59, 999999), datetime(2024, 3, 10), datetime(2024, 3, 11, 12),
+                          datetime(2024, 3, 12, 23, 59, 59), datetime(2024, 3, 13)]:
+                db.session.add(WeighIn(user_id=user_id, weight_kg=70, recorded_at=stamp))
+            db.session.commit()
+
+            start, end = date(2024, 3, 10), date(2024, 3, 12)
+            by_range = WeighIn.query.filter(WeighIn.user_id == user_id, within_days(WeighIn.recorded_at, start, end))
+            by_date = WeighIn.query.filter(WeighIn.user_id == user_id, func.date(WeighIn.recorded_at) >= start,
+                                           func.date(WeighIn.recorded_at) <= end)
+
+            assert {w.id for w in by_range} == {w.id for w in by_date}
+            assert by_range.count() == 3
+            assert WeighIn.query.filter(on_day(WeighIn.recorded_at, date(2024, 3, 13))).count() == 1
+
+    def test_analytics_keeps_todays_entries(self, app, user):
+        """Test entries logged today are inside the analytics windows."""
+        with app.app_context():
+            user_id = _user_id()
+            db.session.add(FoodLog(user_id=user_id, custom_name='Oats', meal='breakfast', grams=60,
+                                   calories=230, source='manual'))
+            db.session.add(WeighIn(user_id=user_id, weight_kg=70.5))
+            db.session.commit()
+
+            assert AnalyticsService.get_top_foods(user_id, 7)[0]['name'] == 'Oats'
+            assert AnalyticsService.get_weight_trends(user_id, 7)['weights'] == [70.5]
+
+    def test_export_includes_the_whole_last_day(self, app, user):
+        """Test an export to a date keeps that day's entries, not just those logged at midnight."""
+        with app.app_context():
+            user_id = _user_id()
+            for name, stamp in [('Before', datetime(2024, 3, 9, 23, 59)), ('First', datetime(2024, 3, 10)),
+                                ('Last', datetime(2024, 3, 12, 18, 30)), ('After', datetime(2024, 3, 13))]:
+                db.session.add(FoodLog(user_id=user_id, custom_name=name, meal='dinner', grams=100,
+                                       calories=200, source='manual', logged_at=stamp))
+            db.session.commit()
+
+            rows = AnalyticsService.export_data(user_id, date(2024, 3, 10), date(2024, 3, 12))
+            assert [row['Food'] for row in rows] == ['First', 'Last']
+
+    def test_time_series_tables_have_user_time_indexes(self):
+        """Test each per-user time-series table declares its (user_id, timestamp) index."""
+        for model, column in [(FoodLog, 'logged_at'), (WeighIn, 'recorded_at'), (WaterIntake, 'recorded_at'),
+                              (CoachMessage, 'created_at'), (Notification, 'created_at'), (Photo, 'created_at')]:
+            columns = [[c.name for c in index.columns] for index in model.__table__.indexes]
+            assert ['user_id', column] in columns